@@ -47,7 +47,7 @@ import HtmlContent from './HtmlContent';
 import DocumentManager from './DocumentManager';
 import ProjectSelector from './ProjectSelector';
 import ProjectForm from './ProjectForm';
-import { getAllTasks, deleteTask } from '../services/api';
+import { getAllTasks, deleteTask, getTaskDocuments } from '../services/api';
 import { useAuth } from '../contexts/AuthContext';
 import { useProject } from '../contexts/ProjectContext';
 
@@ -265,7 +265,9 @@ const Dashboard = () => {
         assignee_username: task.assignee_username,
         description: task.description,
         dependencies: task.dependencies || [],
-        documents: task.documents || [],
+        // Lists only carry a summary; the documents are loaded when a task is opened
+        document_count: task.document_summary?.count || 0,
+        documents: [],
         project: task.project,
         // CPM fields for critical path indicators
         is_critical: task.is_critical || false,
@@ -295,9 +297,21 @@ const Dashboard = () => {
     }
   }, [selectedProject, fetchTasks]);
 
+  const loadSelectedTaskDocuments = useCallback(async (taskId) => {
+    try {
+      const response = await getTaskDocuments(taskId);
+      setSelectedTask(prev => (prev && prev.id === taskId ? { ...prev, documents: response.data } : prev));
+    } catch (error) {
+      console.error('❌ Dashboard: Failed to fetch documents:', error);
+    }
+  }, []);
+
   const handleTaskClick = (task) => {
     setSelectedTask(task);
     setDetailsDialogOpen(true);
+    if (task.document_count > 0) {
+      loadSelectedTaskDocuments(task.id);
+    }
   };
 
   const handleAddTask = () => {
@@ -871,7 +885,10 @@ const Dashboard = () => {
                     <DocumentManager
                       taskId={selectedTask.id}
                       documents={selectedTask.documents}
-                      onDocumentsChange={fetchTasks}
+                      onDocumentsChange={() => {
+                        fetchTasks();
+                        loadSelectedTaskDocuments(selectedTask.id);
+                      }}
                     />
                   </Grid>
                 )}
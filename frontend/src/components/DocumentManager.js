@@ -29,7 +29,7 @@ import {
   Close,
   AttachFile,
 } from '@mui/icons-material';
-import { uploadDocument, deleteDocument } from '../services/api';
+import { uploadDocument, uploadDocumentChunked, deleteDocument } from '../services/api';
 
 const DocumentManager = ({ taskId, documents, onDocumentsChange }) => {
   const [uploading, setUploading] = useState(false);
@@ -49,9 +49,9 @@ const DocumentManager = ({ taskId, documents, onDocumentsChange }) => {
 
     try {
       const uploadPromises = Array.from(files).map(async (file) => {
-        // Validate file size (max 10MB)
-        if (file.size > 10 * 1024 * 1024) {
-          throw new Error(`File ${file.name} is too large. Maximum size is 10MB.`);
+        // Validate file size (max 100MB)
+        if (file.size > 100 * 1024 * 1024) {
+          throw new Error(`File ${file.name} is too large. Maximum size is 100MB.`);
         }
 
         // Validate file type
@@ -64,6 +64,10 @@ const DocumentManager = ({ taskId, documents, onDocumentsChange }) => {
           throw new Error(`File type ${file.type} is not supported. Only images and PDFs are allowed.`);
         }
 
+        // Large files go up in resumable chunks
+        if (file.size > 5 * 1024 * 1024) {
+          return uploadDocumentChunked(taskId, file, setUploadProgress);
+        }
         return uploadDocument(taskId, file);
       });
 
@@ -110,6 +114,18 @@ const DocumentManager = ({ taskId, documents, onDocumentsChange }) => {
   };
 
   const getFileIcon = (document) => {
+    // Thumbnails are a few KB; the original is only loaded when previewing
+    if (document.thumbnail_url) {
+      return (
+        <Box
+          component="img"
+          src={document.thumbnail_url}
+          alt={document.file_name}
+          loading="lazy"
+          sx={{ width: 32, height: 32, objectFit: 'cover', borderRadius: 0.5 }}
+        />
+      );
+    }
     if (document.is_image) {
       return <Image sx={{ color: '#4caf50' }} />;
     } else if (document.is_pdf) {
@@ -125,7 +141,7 @@ const DocumentManager = ({ taskId, documents, onDocumentsChange }) => {
       return (
         <Box sx={{ textAlign: 'center', p: 2 }}>
           <img
-            src={previewDocument.file}
+            src={previewDocument.download_url || previewDocument.file}
             alt={previewDocument.file_name}
             style={{
               maxWidth: '100%',
@@ -139,7 +155,7 @@ const DocumentManager = ({ taskId, documents, onDocumentsChange }) => {
       return (
         <Box sx={{ width: '100%', height: '70vh' }}>
           <iframe
-            src={previewDocument.file}
+            src={previewDocument.download_url || previewDocument.file}
             title={previewDocument.file_name}
             style={{
               width: '100%',
@@ -205,7 +221,7 @@ const DocumentManager = ({ taskId, documents, onDocumentsChange }) => {
         )}
 
         <Typography variant="caption" color="text.secondary" sx={{ display: 'block', mt: 0.5 }}>
-          Supported: Images (JPG, PNG, GIF, WebP, SVG) and PDF. Max 10MB per file.
+          Supported: Images (JPG, PNG, GIF, WebP, SVG) and PDF. Max 100MB per file.
         </Typography>
       </Box>
 
@@ -322,7 +338,7 @@ const DocumentManager = ({ taskId, documents, onDocumentsChange }) => {
         </DialogContent>
         <DialogActions sx={{ px: 3, py: 2 }}>
           <Button
-            href={previewDocument?.file}
+            href={previewDocument?.download_url || previewDocument?.file}
             download={previewDocument?.file_name}
             variant="outlined"
           >
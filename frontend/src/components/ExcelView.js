@@ -19,6 +19,7 @@ import {
   DialogTitle,
   DialogContent,
   DialogActions,
+  LinearProgress,
 } from '@mui/material';
 import {
   Download as DownloadIcon,
@@ -28,7 +29,7 @@ import {
   Delete as DeleteIcon,
 } from '@mui/icons-material';
 import { saveAs } from 'file-saver';
-import { getAllTasks, exportTasksToExcel, downloadSampleExcel, importTasksFromExcel, deleteTask } from '../services/api';
+import { getAllTasks, exportTasksToExcel, downloadSampleExcel, importTasksFromExcel, cancelImportJob, deleteTask } from '../services/api';
 
 const ExcelView = ({ projectId, onTaskUpdate }) => {
   const [tasks, setTasks] = useState([]);
@@ -39,6 +40,7 @@ const ExcelView = ({ projectId, onTaskUpdate }) => {
   const [selectedFile, setSelectedFile] = useState(null);
   const [importing, setImporting] = useState(false);
   const [importResult, setImportResult] = useState(null);
+  const [importJob, setImportJob] = useState(null);
 
   const fetchTasks = useCallback(async () => {
     if (!projectId) {
@@ -134,8 +136,10 @@ const ExcelView = ({ projectId, onTaskUpdate }) => {
       setImporting(true);
       setError('');
       setImportResult(null);
+      setImportJob(null);
       
-      const response = await importTasksFromExcel(projectId, selectedFile);
+      // The import runs in the background; importJob tracks its progress
+      const response = await importTasksFromExcel(projectId, selectedFile, setImportJob);
       
       setImportResult(response.data);
       setSuccess(`Successfully imported ${response.data.created_count} tasks!`);
@@ -160,6 +164,20 @@ const ExcelView = ({ projectId, onTaskUpdate }) => {
       // Don't auto-close on error - let user read and manually close
     } finally {
       setImporting(false);
+      setImportJob(null);
+    }
+  };
+
+  const handleCancelImport = async () => {
+    if (!importing) {
+      setImportDialogOpen(false);
+      return;
+    }
+    if (!importJob) return;
+    try {
+      await cancelImportJob(importJob);
+    } catch (err) {
+      console.error('Cancel failed:', err);
     }
   };
 
@@ -403,6 +421,24 @@ const ExcelView = ({ projectId, onTaskUpdate }) => {
               />
             </Button>
 
+            {importing && importJob && (
+              <Box sx={{ mt: 2 }}>
+                <LinearProgress
+                  variant={importJob.rows_total ? 'determinate' : 'indeterminate'}
+                  value={importJob.rows_total
+                    ? Math.min(100, (100 * (importJob.rows_parsed + importJob.rows_inserted)) / (2 * importJob.rows_total))
+                    : 0}
+                />
+                <Typography variant="caption" color="text.secondary">
+                  {importJob.status === 'queued'
+                    ? 'Waiting to start...'
+                    : `Read ${importJob.rows_parsed} of ${importJob.rows_total} rows, inserted ${importJob.rows_inserted}`}
+                  {importJob.error_count > 0 && ` (${importJob.error_count} errors)`}
+                  {importJob.cancel_requested && ' - cancelling...'}
+                </Typography>
+              </Box>
+            )}
+
             {importResult && (
               <Box sx={{ mt: 2 }}>
                 <Alert severity="success" sx={{ mb: 2 }}>
@@ -428,8 +464,8 @@ const ExcelView = ({ projectId, onTaskUpdate }) => {
           </Box>
         </DialogContent>
         <DialogActions>
-          <Button onClick={() => setImportDialogOpen(false)} disabled={importing}>
-            Cancel
+          <Button onClick={handleCancelImport} disabled={importing && (!importJob || importJob.cancel_requested)}>
+            {importing ? 'Cancel Import' : 'Cancel'}
           </Button>
           <Button
             onClick={handleImport}
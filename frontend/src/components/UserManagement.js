@@ -4,7 +4,7 @@ import {
   Container, Typography, Button, Table, TableBody, TableCell, TableContainer,
   TableHead, TableRow, Paper, IconButton, TextField, InputAdornment,
   Chip, Dialog, DialogTitle, DialogContent, DialogActions, Select,
-  MenuItem, FormControl, InputLabel, Alert, CircularProgress, Box
+  MenuItem, FormControl, InputLabel, Alert, CircularProgress, Box, LinearProgress
 } from '@mui/material';
 import {
   Add as AddIcon, Edit as EditIcon, Delete as DeleteIcon,
@@ -12,7 +12,7 @@ import {
   FileUpload as UploadIcon, Description as TemplateIcon,
   Email as EmailIcon, ArrowBack as ArrowBackIcon
 } from '@mui/icons-material';
-import { importUsersFromExcel, exportUsersToExcel, downloadUserSampleExcel } from '../services/api';
+import { importUsersFromExcel, cancelImportJob, exportUsersToExcel, downloadUserSampleExcel } from '../services/api';
 import api from '../services/api';
 import UserForm from './UserForm';
 import { saveAs } from 'file-saver';
@@ -33,6 +33,7 @@ const UserManagement = () => {
   const [selectedFile, setSelectedFile] = useState(null);
   const [importing, setImporting] = useState(false);
   const [importResult, setImportResult] = useState(null);
+  const [importJob, setImportJob] = useState(null);
   const [success, setSuccess] = useState('');
 
   const designations = [
@@ -236,8 +237,10 @@ const UserManagement = () => {
       setImporting(true);
       setError('');
       setImportResult(null);
+      setImportJob(null);
       
-      const response = await importUsersFromExcel(selectedFile);
+      // The import runs in the background; importJob tracks its progress
+      const response = await importUsersFromExcel(selectedFile, setImportJob);
       setImportResult(response.data);
       setSuccess(`Successfully imported ${response.data.created_count} users!`);
       
@@ -257,6 +260,16 @@ const UserManagement = () => {
       // Don't auto-close on error - let user read and manually close
     } finally {
       setImporting(false);
+      setImportJob(null);
+    }
+  };
+
+  const handleCancelImport = async () => {
+    if (!importJob) return;
+    try {
+      await cancelImportJob(importJob);
+    } catch (err) {
+      console.error('Cancel failed:', err);
     }
   };
 
@@ -556,6 +569,21 @@ const UserManagement = () => {
             />
           </Button>
 
+          {importing && importJob && (
+            <Box sx={{ mb: 2 }}>
+              <LinearProgress
+                variant={importJob.rows_total ? 'determinate' : 'indeterminate'}
+                value={importJob.rows_total ? Math.min(100, (100 * importJob.rows_parsed) / importJob.rows_total) : 0}
+              />
+              <Typography variant="caption" color="text.secondary">
+                {importJob.status === 'queued'
+                  ? 'Waiting to start...'
+                  : `Processed ${importJob.rows_parsed} of ${importJob.rows_total} rows`}
+                {importJob.cancel_requested && ' - cancelling...'}
+              </Typography>
+            </Box>
+          )}
+
           {importResult && (
             <Alert severity="info">
               <Typography variant="body2">
@@ -568,14 +596,18 @@ const UserManagement = () => {
         <DialogActions>
           <Button 
             onClick={() => {
+              if (importing) {
+                handleCancelImport();
+                return;
+              }
               setImportDialogOpen(false);
               setSelectedFile(null);
               setImportResult(null);
               setError('');
             }} 
-            disabled={importing}
+            disabled={importing && (!importJob || importJob.cancel_requested)}
           >
-            Cancel
+            {importing ? 'Cancel Import' : 'Cancel'}
           </Button>
           <Button
             onClick={handleImport}
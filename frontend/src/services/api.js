@@ -111,12 +111,56 @@ export const uploadDocument = (taskId, file) => {
   });
 };
 
-export const getTaskDocuments = (taskId) => api.get(`tasks/${taskId}/documents/`);
+const UPLOAD_CHUNK_SIZE = 5 * 1024 * 1024;
+
+const sha256Hex = async (blob) => {
+  // crypto.subtle only exists in secure contexts; the checksum is optional
+  if (!window.crypto || !window.crypto.subtle) return null;
+  const digest = await window.crypto.subtle.digest('SHA-256', await blob.arrayBuffer());
+  return Array.from(new Uint8Array(digest)).map((b) => b.toString(16).padStart(2, '0')).join('');
+};
+
+// Resumable upload: the file is sent in numbered chunks, so only one chunk is in memory at a time
+export const uploadDocumentChunked = async (taskId, file, onProgress) => {
+  const { data: upload } = await api.post(`tasks/${taskId}/uploads/`, {
+    file_name: file.name,
+    file_size: file.size,
+    file_type: file.type,
+    chunk_size: UPLOAD_CHUNK_SIZE,
+  });
+  const base = `tasks/${taskId}/uploads/${upload.upload_id}/`;
+
+  let next = upload.next_chunk;
+  while (next < upload.total_chunks) {
+    const chunk = file.slice(next * upload.chunk_size, (next + 1) * upload.chunk_size);
+    const headers = { 'Content-Type': 'application/octet-stream' };
+    const checksum = await sha256Hex(chunk);
+    if (checksum) headers['X-Chunk-SHA256'] = checksum;
+
+    let response;
+    try {
+      response = await api.put(`${base}chunks/${next}/`, chunk, { headers });
+    } catch (error) {
+      // One retry from wherever the server says the upload stands
+      response = await api.get(base);
+    }
+    if (response.data.next_chunk <= next) {
+      throw new Error(`Upload of ${file.name} failed at chunk ${next}`);
+    }
+    next = response.data.next_chunk;
+    if (onProgress) onProgress(Math.round((response.data.received_bytes / Math.max(file.size, 1)) * 100));
+  }
+
+  return api.post(`${base}complete/`);
+};
+
+export const getTaskDocuments =(taskId) => api.get(`tasks/${taskId}/documents/`);
 export const deleteDocument = (taskId, documentId) => api.delete(`tasks/${taskId}/delete_document/${documentId}/`);
 
 // Excel APIs
-export const exportTasksToExcel = (projectId) => {
-  return api.get(`tasks/export_excel/?project_id=${projectId}`, {
+// format: 'xlsx' (default), 'csv', 'ndjson' or 'parquet'
+export const exportTasksToExcel = (projectId, format = 'xlsx') => {
+  return api.get(`tasks/export_excel/?project_id=${projectId}&format=${format}`, {
     responseType: 'blob',
   });
 };
@@ -127,15 +171,43 @@ export const downloadSampleExcel = () => {
   });
 };
 
-export const importTasksFromExcel = (projectId, file) => {
+// Imports run as background jobs: poll the job until it finishes.
+// Resolves like the old synchronous response ({ data: { created_count, errors, ... } });
+// onProgress(job) gets every poll (rows_total, rows_parsed, rows_inserted, error_count).
+const IMPORT_POLL_INTERVAL_MS = 1000;
+
+export const waitForImportJob = async (job, onProgress) => {
+  while (true) {
+    if (onProgress) onProgress(job);
+    if (job.status === 'succeeded') {
+      return { data: { ...job.result, errors: job.errors, job } };
+    }
+    if (job.status === 'failed' || job.status === 'cancelled') {
+      const error = job.status === 'cancelled'
+        ? 'Import cancelled'
+        : `Failed to process Excel file: ${job.message}`;
+      // Same shape as an axios error so callers keep reading err.response.data.error
+      throw Object.assign(new Error(error), { response: { data: { error, job } } });
+    }
+    await new Promise((resolve) => setTimeout(resolve, IMPORT_POLL_INTERVAL_MS));
+    job = (await api.get(job.status_url)).data;
+  }
+};
+
+export const cancelImportJob = (job) => {
+  return api.post(job.cancel_url);
+};
+
+export const importTasksFromExcel = async (projectId, file, onProgress) => {
   const formData = new FormData();
   formData.append('file', file);
   formData.append('project_id', projectId);
-  return api.post('tasks/import_excel/', formData, {
+  const response = await api.post('tasks/import_excel/', formData, {
     headers: {
       'Content-Type': 'multipart/form-data',
     },
   });
+  return waitForImportJob(response.data, onProgress);
 };
 
 // Critical Path APIs
@@ -152,18 +224,19 @@ export const getFloatAnalysis = (projectId) => {
 };
 
 // User Management Bulk Upload APIs
-export const importUsersFromExcel = (file) => {
+export const importUsersFromExcel = async (file, onProgress) => {
   const formData = new FormData();
   formData.append('file', file);
-  return api.post('users/manage/import-excel/', formData, {
+  const response = await api.post('users/manage/import-excel/', formData, {
     headers: {
       'Content-Type': 'multipart/form-data',
     },
   });
+  return waitForImportJob(response.data, onProgress);
 };
 
-export const exportUsersToExcel = () => {
-  return api.get('users/manage/export-excel/', {
+export const exportUsersToExcel = (format = 'xlsx') => {
+  return api.get(`users/manage/export-excel/?format=${format}`, {
     responseType: 'blob',
   });
 };
@@ -53,6 +53,8 @@ class ProjectViewSet(viewsets.ModelViewSet):
             from users.models import CustomUser
             user = CustomUser.objects.get(id=user_id)
             project.members.add(user)
+            # Membership is part of the project version used for conditional GETs
+            project.save(update_fields=['updated_at'])
             
             # Send email notification to the added user
             if user.email and user.email_verified:
@@ -109,6 +111,7 @@ class ProjectViewSet(viewsets.ModelViewSet):
             from users.models import CustomUser
             user = CustomUser.objects.get(id=user_id)
             project.members.remove(user)
+            project.save(update_fields=['updated_at'])
             return Response({'message': f'User {user.username} removed successfully'})
         except CustomUser.DoesNotExist:
             return Response(
@@ -121,6 +124,13 @@ class ProjectViewSet(viewsets.ModelViewSet):
         """Get detailed statistics for a project"""
         project = self.get_object()
         
+        # Answer polls with 304 before running any of the count queries
+        from tasks.versioning import get_project_version
+        version = get_project_version(project.id)
+        not_modified = version.not_modified_response(request)
+        if not_modified is not None:
+            return version.apply_headers(not_modified)
+        
         tasks = project.tasks.all()
         total_tasks = tasks.count()
         
@@ -136,4 +146,4 @@ class ProjectViewSet(viewsets.ModelViewSet):
             'member_count': project.members.count(),
         }
         
-        return Response(stats_data)
+        return version.apply_headers(Response(stats_data))
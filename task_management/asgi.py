@@ -3,6 +3,12 @@ ASGI config for task_management project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Besides Django itself, the ASGI application serves the server-sent event
+stream of project task changes at /api/projects/<id>/events/ (see
+tasks/sse.py). Run it with an ASGI server, e.g.:
+
+    uvicorn task_management.asgi:application
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -13,4 +19,14 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "task_management.settings")
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported after Django is set up
+from tasks.sse import EVENTS_PATH, project_events_app
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'http' and EVENTS_PATH.match(scope['path']):
+        await project_events_app(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
@@ -193,6 +193,19 @@ SENDINBLUE_API_KEY = config('SENDINBLUE_API_KEY', default='')
 SENDER_EMAIL = config('SENDER_EMAIL', default='noreply@example.com')
 SENDER_NAME = config('SENDER_NAME', default='Task Management System')
 
+# Background workers for task email notifications
+TASK_NOTIFICATION_WORKERS = config('TASK_NOTIFICATION_WORKERS', default=2, cast=int)
+
+# Let the fronting server send document downloads: '' (Django streams them), 'x-accel-redirect' or 'x-sendfile'
+TASK_DOCUMENT_SENDFILE = config('TASK_DOCUMENT_SENDFILE', default='') or None
+TASK_DOCUMENT_ACCEL_PREFIX = config('TASK_DOCUMENT_ACCEL_PREFIX', default='/protected-media/')
+
+# Worker processes rendering document thumbnails (needs Pillow; PDFs also need poppler's pdftoppm)
+TASK_THUMBNAIL_WORKERS = config('TASK_THUMBNAIL_WORKERS', default=2, cast=int)
+
+# Worker threads running background Excel imports (tasks/jobs.py)
+TASK_IMPORT_WORKERS = config('TASK_IMPORT_WORKERS', default=2, cast=int)
+
 # Email Verification Settings
 EMAIL_VERIFICATION_TOKEN_EXPIRY_HOURS = 24
 FRONTEND_URL = config('FRONTEND_URL', default='http://localhost:3000')
@@ -1,6 +1,6 @@
 from django.contrib import admin
 from import_export.admin import ImportExportModelAdmin
-from .models import Task, TaskDocument
+from .models import Task, TaskDocument, TaskActivity, ArchivedTask, RecurringTaskTemplate
 
 class TaskAdmin(ImportExportModelAdmin):
     list_display = ('title', 'status', 'priority', 'start_date', 'due_date', 'assignee', 'parent_task', 'progress')
@@ -14,7 +14,34 @@ class TaskDocumentAdmin(admin.ModelAdmin):
     list_filter = ('file_type', 'uploaded_at')
     search_fields = ('file_name', 'task__title')
     raw_id_fields = ('task', 'uploaded_by')
-    readonly_fields = ('uploaded_at', 'file_size')
+    readonly_fields = ('uploaded_at', 'file_size', 'blob')
+
+class TaskActivityAdmin(admin.ModelAdmin):
+    list_display = ('task', 'verb', 'actor', 'created_at')
+    list_filter = ('verb',)
+    raw_id_fields = ('task', 'project', 'actor')
+    readonly_fields = ('task', 'project', 'actor', 'verb', 'changes', 'created_at')
+
+class ArchivedTaskAdmin(admin.ModelAdmin):
+    list_display = ('task_number', 'title', 'status', 'project_id', 'deleted_at', 'archived_at')
+    list_filter = ('status',)
+    search_fields = ('title', 'task_number')
+
+    # The archive is written by the archive_tasks command only
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+class RecurringTaskTemplateAdmin(admin.ModelAdmin):
+    list_display = ('title', 'project', 'frequency', 'interval', 'weekdays', 'start_date', 'until', 'is_active', 'materialized_until')
+    list_filter = ('frequency', 'is_active')
+    search_fields = ('title',)
+    raw_id_fields = ('project', 'assignee', 'created_by')
 
 admin.site.register(Task, TaskAdmin)
 admin.site.register(TaskDocument, TaskDocumentAdmin)
+admin.site.register(TaskActivity, TaskActivityAdmin)
+admin.site.register(ArchivedTask, ArchivedTaskAdmin)
+admin.site.register(RecurringTaskTemplate, RecurringTaskTemplateAdmin)
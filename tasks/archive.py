@@ -0,0 +1,268 @@
+"""
+Archive: moves cold tasks out of tasks_task into tasks_archivedtask.
+
+Every task of a Completed / Archived project is archived, plus tasks that
+have been soft-deleted for a while. Tasks move in batches, deepest first so
+no live row ever points at an archived parent, and each batch is one
+transaction: the rows are copied with their dependency ids and document
+rows, then the originals are removed with plain DELETEs. Restoring copies
+the rows back under their original ids with INSERT ... SELECT.
+"""
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from .events import publish_on_commit
+from .models import Task, TaskChange, TaskActivity, TaskDocument, ArchivedTask, RecurringTaskTemplate, DocumentUpload, DocumentBlob
+from .uploads import discard_uploads
+
+ARCHIVED_PROJECT_STATUSES = ('Completed', 'Archived')
+
+DEFAULT_BATCH_SIZE = 1000
+
+# Columns shared by Task and ArchivedTask
+TASK_COLUMNS = tuple(
+    field.attname for field in ArchivedTask._meta.concrete_fields
+    if field.attname not in ('dependency_ids', 'dependent_ids', 'documents', 'archived_at')
+)
+
+# Archived documents keep their blob reference, so the file stays stored
+DOCUMENT_FIELDS = ('id', 'task_id', 'file', 'blob_id', 'file_name', 'file_size', 'file_type', 'uploaded_by_id', 'uploaded_at')
+
+
+def archivable_tasks(project_ids=None, deleted_before=None):
+    """
+    Tasks due for the archive.
+
+    Args:
+        project_ids: Only consider these projects (default: all)
+        deleted_before: Also take tasks soft-deleted before this datetime
+
+    Returns:
+        QuerySet: Task rows, soft-deleted ones included
+    """
+    from project.models import Project
+
+    projects = Project.objects.filter(status__in=ARCHIVED_PROJECT_STATUSES)
+    tasks = Task.all_objects.all()
+    if project_ids is not None:
+        projects = projects.filter(pk__in=project_ids)
+        tasks = tasks.filter(project_id__in=project_ids)
+
+    condition = Q(project__in=projects.values('pk'))
+    if deleted_before is not None:
+        # A deleted task goes only once nothing under it is staying behind
+        staying = Task.all_objects.filter(parent_task_id=OuterRef('pk')).exclude(deleted_at__lt=deleted_before)
+        condition |= Q(deleted_at__lt=deleted_before) & ~Exists(staying)
+    return tasks.filter(condition)
+
+
+def _archive_batch(task_ids, archiving):
+    """Copy one batch into the archive and delete the originals"""
+    now = timezone.now()
+    rows = list(Task.all_objects.filter(pk__in=task_ids).values(*TASK_COLUMNS))
+
+    through = Task.dependencies.through
+    edges = list(through.objects.filter(
+        Q(from_task_id__in=task_ids) | Q(to_task_id__in=task_ids)
+    ).values_list('from_task_id', 'to_task_id'))
+    dependency_ids, dependent_ids = {}, {}
+    for task_id, dependency_id in edges:
+        dependency_ids.setdefault(task_id, []).append(dependency_id)
+        dependent_ids.setdefault(dependency_id, []).append(task_id)
+
+    documents = {}
+    for document in TaskDocument.objects.filter(task_id__in=task_ids).values(*DOCUMENT_FIELDS):
+        document['uploaded_at'] = document['uploaded_at'].isoformat()
+        documents.setdefault(document['task_id'], []).append(document)
+
+    ArchivedTask.objects.bulk_create([
+        ArchivedTask(
+            dependency_ids=dependency_ids.get(row['id'], []),
+            dependent_ids=dependent_ids.get(row['id'], []),
+            documents=documents.get(row['id'], []),
+            archived_at=now,
+            **row
+        )
+        for row in rows
+    ])
+
+    # Soft-deleted tasks were tombstoned when they were deleted
+    live = [row for row in rows if row['deleted_at'] is None]
+    TaskChange.objects.bulk_create([
+        TaskChange(project_id=row['project_id'], task_id=row['id'], action=TaskChange.DELETE)
+        for row in live
+    ])
+
+    through.objects.filter(Q(from_task_id__in=task_ids) | Q(to_task_id__in=task_ids)).delete()
+    # Unfinished uploads are not archived
+    discard_uploads(DocumentUpload.objects.filter(task_id__in=task_ids))
+    documents = TaskDocument.objects.filter(task_id__in=task_ids)
+    documents._raw_delete(documents.db)
+    tasks = Task.all_objects.filter(pk__in=task_ids)
+    tasks._raw_delete(tasks.db)
+
+    # Neighbours staying in the live table lose the archived edges
+    neighbours = {task_id for edge in edges for task_id in edge} - archiving
+    if neighbours:
+        Task.refresh_dependency_counts(neighbours)
+
+    by_project = {}
+    for row in live:
+        by_project.setdefault(row['project_id'], []).append(row['id'])
+    for project_id, ids in by_project.items():
+        publish_on_commit(project_id, 'tasks.archived', {'ids': ids})
+    return len(rows)
+
+
+def archive_tasks(tasks, batch_size=DEFAULT_BATCH_SIZE, progress=None):
+    """
+    Move tasks into the archive, one transaction per batch.
+
+    Args:
+        tasks: Task queryset (see archivable_tasks)
+        batch_size: Tasks per batch
+        progress: Optional callable(archived_so_far, total) called after each batch
+
+    Returns:
+        int: Number of tasks archived
+    """
+    # Children before parents: a parent row is only deleted after its subtasks
+    task_ids = list(tasks.order_by('-depth', 'id').values_list('id', flat=True))
+    archiving = set(task_ids)
+
+    archived = 0
+    for start in range(0, len(task_ids), batch_size):
+        with transaction.atomic():
+            archived += _archive_batch(task_ids[start:start + batch_size], archiving)
+        if progress:
+            progress(archived, len(task_ids))
+    return archived
+
+
+def archived_subtrees(task_ids):
+    """ArchivedTask queryset of the given tasks plus their archived subtasks"""
+    condition = Q(pk__in=task_ids)
+    for task_id, path in ArchivedTask.objects.filter(pk__in=task_ids).values_list('id', 'path'):
+        condition |= Task.descendants_filter(f"{path}{task_id}/")
+    return ArchivedTask.objects.filter(condition)
+
+
+def restore_archived(archived, undelete=False, actor=None, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Move archived tasks back into the live table under their original ids.
+
+    Parents that are neither live nor being restored are dropped (the task
+    becomes a main task), as are dependencies on tasks that no longer exist.
+
+    Args:
+        archived: ArchivedTask queryset
+        undelete: Also clear deleted_at on restored tasks that had been soft-deleted
+        actor: User making the change
+        batch_size: Rows per INSERT ... SELECT
+
+    Returns:
+        int: Number of tasks restored
+    """
+    from project.models import Project
+    from users.models import CustomUser
+    from .hierarchy import rebuild_paths
+
+    quote = connection.ops.quote_name
+    columns = ', '.join(quote(Task._meta.get_field(name).column) for name in TASK_COLUMNS)
+
+    # Rows of projects deleted since archiving have nowhere to go back to
+    archived = archived.filter(Q(project_id__isnull=True) | Q(project_id__in=Project.objects.values('pk')))
+
+    with transaction.atomic():
+        rows = list(archived.order_by('depth', 'id').values('id', 'parent_task_id', 'project_id', 'dependency_ids', 'dependent_ids', 'documents'))
+        restoring = {row['id'] for row in rows}
+        referenced = {row['parent_task_id'] for row in rows if row['parent_task_id']}
+        for row in rows:
+            referenced.update(row['dependency_ids'], row['dependent_ids'])
+        existing = restoring | set(Task.all_objects.filter(pk__in=referenced - restoring).values_list('id', flat=True))
+        # An undeleted task may only hang under a live parent
+        parents = restoring | set(
+            (Task.objects if undelete else Task.all_objects).filter(pk__in=referenced - restoring).values_list('id', flat=True)
+        )
+
+        detached = [row['id'] for row in rows if row['parent_task_id'] and row['parent_task_id'] not in parents]
+        restored_rows = ArchivedTask.objects.filter(pk__in=restoring)
+        restored_rows.filter(pk__in=detached).update(parent_task_id=None)
+        users = CustomUser.objects.values('pk')
+        restored_rows.exclude(assignee_id__in=users).update(assignee_id=None)
+        restored_rows.exclude(created_by_id__in=users).update(created_by_id=None)
+        restored_rows.exclude(
+            recurring_template_id__in=RecurringTaskTemplate.objects.values('pk')
+        ).update(recurring_template_id=None)
+        if undelete:
+            restored_rows.update(deleted_at=None)
+
+        # Parents first, copied straight from the archive table so timestamps survive
+        ids = [row['id'] for row in rows]
+        for start in range(0, len(ids), batch_size):
+            select_sql, params = ArchivedTask.objects.filter(
+                pk__in=ids[start:start + batch_size]
+            ).order_by().values(*TASK_COLUMNS).query.sql_with_params()
+            with connection.cursor() as cursor:
+                # Dependency counts start at zero and are refreshed below
+                cursor.execute(
+                    f"INSERT INTO {quote(Task._meta.db_table)} ({columns}, predecessor_count, successor_count) "
+                    f"SELECT archived.*, 0, 0 FROM ({select_sql}) archived",
+                    params
+                )
+
+        edges = set()
+        for row in rows:
+            edges.update((row['id'], dependency_id) for dependency_id in row['dependency_ids'] if dependency_id in existing)
+            edges.update((dependent_id, row['id']) for dependent_id in row['dependent_ids'] if dependent_id in existing)
+        through = Task.dependencies.through
+        through.objects.bulk_create(
+            [through(from_task_id=task_id, to_task_id=dependency_id) for task_id, dependency_id in edges],
+            batch_size=1000, ignore_conflicts=True
+        )
+
+        # Only the uploaders this batch references, not every user id
+        user_ids = set(CustomUser.objects.filter(
+            pk__in={document['uploaded_by_id'] for row in rows for document in row['documents']} - {None}
+        ).values_list('pk', flat=True))
+        blob_ids = set(DocumentBlob.objects.filter(
+            pk__in={document.get('blob_id') for row in rows for document in row['documents']}
+        ).values_list('pk', flat=True))
+        documents = [
+            TaskDocument(**{
+                **document,
+                'uploaded_at': parse_datetime(document['uploaded_at']),
+                'uploaded_by_id': document['uploaded_by_id'] if document['uploaded_by_id'] in user_ids else None,
+                'blob_id': document.get('blob_id') if document.get('blob_id') in blob_ids else None,
+            })
+            for row in rows for document in row['documents']
+        ]
+        uploaded_at = [document.uploaded_at for document in documents]
+        TaskDocument.objects.bulk_create(documents, batch_size=1000)
+        # bulk_create stamps auto_now_add fields; put the original upload times back
+        for document, value in zip(documents, uploaded_at):
+            document.uploaded_at = value
+        TaskDocument.objects.bulk_update(documents, ['uploaded_at'], batch_size=1000)
+
+        restored_rows.delete()
+
+        projects = {row['project_id'] for row in rows}
+        if detached:
+            for project_id in projects:
+                rebuild_paths(project_id)
+        Task.refresh_dependency_counts(restoring | {task_id for edge in edges for task_id in edge})
+
+        restored = list(Task.objects.filter(pk__in=restoring).only('id', 'project_id', 'parent_task_id'))
+        TaskChange.record(TaskChange.UPSERT, restored)
+        TaskActivity.objects.bulk_create([
+            TaskActivity(task_id=task.pk, project_id=task.project_id, actor_id=getattr(actor, 'id', None),
+                         verb=TaskActivity.RESTORED, changes={'from_archive': True})
+            for task in restored if task.parent_task_id not in restoring
+        ])
+        for project_id in projects:
+            publish_on_commit(project_id, 'tasks.restored', {
+                'ids': [task.pk for task in restored if task.project_id == project_id],
+            })
+
+    return len(rows)
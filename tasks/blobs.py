@@ -0,0 +1,243 @@
+"""
+Content-addressed document storage.
+
+Every document file is stored once per SHA-256 as a DocumentBlob, named
+task_documents/blobs/<ab>/<sha256><ext>; documents with the same content
+point at the same blob. Callers hash while the file streams in (see
+StagingUploadHandler and complete_upload in tasks/uploads.py) and hand
+over a staging file, which is either moved into storage or, when the
+content is already stored, simply dropped. Deleting a document, directly
+or through a task / project cascade, releases its blob (post_delete handler
+in tasks/signals.py) and a blob's file goes once its last reference does.
+"""
+import hashlib
+import os
+from collections import Counter
+from django.core.files import File
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, F, OuterRef, Value
+from django.db.models.functions import Greatest
+from .models import DocumentBlob, TaskDocument
+
+
+# Read / hash in blocks of this size
+BLOCK_SIZE = 64 * 1024
+
+
+def stream_sha256(source):
+    """Hex SHA-256 of a file object, read in blocks"""
+    digest = hashlib.sha256()
+    for block in iter(lambda: source.read(BLOCK_SIZE), b''):
+        digest.update(block)
+    return digest.hexdigest()
+
+
+def blob_name(sha256, file_name):
+    # The extension of the first upload is kept so media servers guess the type
+    extension = os.path.splitext(file_name)[1].lower()[:16]
+    return f"task_documents/blobs/{sha256[:2]}/{sha256}{extension}"
+
+
+def move_into_storage(path, name, storage=None):
+    """Move a local file into storage under (an available variant of) name; returns the stored name"""
+    storage = storage or DocumentBlob._meta.get_field('file').storage
+    name = storage.get_available_name(name)
+    try:
+        target = storage.path(name)
+    except NotImplementedError:
+        # Remote storage: stream it up from the local file
+        with open(path, 'rb') as source:
+            name = storage.save(name, File(source))
+        os.remove(path)
+        return name
+
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    os.replace(path, target)
+    return name
+
+
+def store_blob(path, sha256, size, file_name):
+    """
+    Take one reference to the blob with this content, storing it if new.
+
+    The staging file at `path` is consumed either way. A newly stored file
+    is not removed if the surrounding transaction rolls back; callers that
+    can fail afterwards delete it themselves when `created` is True.
+
+    Args:
+        path: Local staging file
+        sha256: Hex digest of the file, computed while it was received
+        size: File size in bytes
+        file_name: Original file name (for the extension)
+
+    Returns:
+        tuple: (DocumentBlob, created)
+    """
+    with transaction.atomic():
+        blob = DocumentBlob.objects.select_for_update().filter(sha256=sha256).first()
+        if blob is None:
+            name = move_into_storage(path, blob_name(sha256, file_name))
+            try:
+                with transaction.atomic():
+                    return DocumentBlob.objects.create(sha256=sha256, file=name, size=size, ref_count=1), True
+            except IntegrityError:
+                # The same content was stored concurrently; use that copy
+                DocumentBlob._meta.get_field('file').storage.delete(name)
+                blob = DocumentBlob.objects.select_for_update().get(sha256=sha256)
+        else:
+            os.remove(path)
+
+        DocumentBlob.objects.filter(pk=blob.pk).update(ref_count=F('ref_count') + 1)
+        blob.ref_count += 1
+    return blob, False
+
+
+def release_blobs(blob_ids):
+    """
+    Drop one reference per id (ids may repeat) and delete blobs nobody uses.
+
+    The files go once the transaction commits.
+    """
+    counts = Counter(blob_id for blob_id in blob_ids if blob_id)
+    if not counts:
+        return
+
+    with transaction.atomic():
+        by_count = {}
+        for blob_id, count in counts.items():
+            by_count.setdefault(count, []).append(blob_id)
+        for count, ids in by_count.items():
+            DocumentBlob.objects.filter(pk__in=ids).update(ref_count=Greatest(F('ref_count') - count, Value(0)))
+
+        _delete_unused(counts)
+
+
+def _delete_unused(blob_ids):
+    """Delete the blobs among blob_ids left with no reference; their files go on commit"""
+    unused = DocumentBlob.objects.filter(pk__in=blob_ids, ref_count=0).exclude(
+        Exists(TaskDocument.objects.filter(blob=OuterRef('pk')))
+    )
+    file_names = [name for names in unused.values_list('file', 'thumbnail') for name in names if name]
+    unused.delete()
+
+    storage = DocumentBlob._meta.get_field('file').storage
+    transaction.on_commit(lambda: [storage.delete(name) for name in file_names])
+
+
+def release_document_files(rows):
+    """
+    Release what deleted documents pointed at: one blob reference each, or
+    for pre-blob documents their own file (once the transaction commits).
+
+    Args:
+        rows: (blob_id, file name) pairs
+    """
+    rows = list(rows)
+    release_blobs(blob_id for blob_id, _ in rows)
+
+    file_names = [name for blob_id, name in rows if not blob_id and name]
+    if file_names:
+        storage = TaskDocument._meta.get_field('file').storage
+        transaction.on_commit(lambda: [storage.delete(name) for name in file_names])
+
+
+def delete_documents(documents):
+    """Delete TaskDocument rows; each one's blob is released by the post_delete handler"""
+    with transaction.atomic():
+        _, deleted = documents.delete()
+    return deleted.get(TaskDocument._meta.label, 0)
+
+
+def _archived_documents():
+    from .models import ArchivedTask
+
+    for documents in ArchivedTask.objects.exclude(documents=[]).values_list('documents', flat=True).iterator():
+        yield from documents
+
+
+def storage_report():
+    """
+    Bytes the documents would take as separate copies against the bytes
+    actually stored (blobs plus pre-blob files). Archived documents count too.
+
+    Returns:
+        dict: documents, blobs, legacy_files, logical_bytes, stored_bytes, saved_bytes
+    """
+    documents = logical = 0
+    legacy = {}
+    rows = TaskDocument.objects.values_list('blob_id', 'file', 'file_size').iterator()
+    archived = ((doc.get('blob_id'), doc['file'], doc['file_size']) for doc in _archived_documents())
+    for rows in (rows, archived):
+        for blob_id, name, size in rows:
+            documents += 1
+            logical += size or 0
+            if not blob_id and name:
+                legacy[name] = size or 0
+
+    blobs = list(DocumentBlob.objects.values_list('size', flat=True))
+    stored = sum(blobs) + sum(legacy.values())
+    return {
+        'documents': documents,
+        'blobs': len(blobs),
+        'legacy_files': len(legacy),
+        'logical_bytes': logical,
+        'stored_bytes': stored,
+        'saved_bytes': logical - stored,
+    }
+
+
+def recount_references():
+    """Recompute every blob's ref_count from live and archived documents; deletes unused blobs"""
+    counts = Counter(TaskDocument.objects.exclude(blob=None).values_list('blob_id', flat=True).iterator())
+    counts.update(doc['blob_id'] for doc in _archived_documents() if doc.get('blob_id'))
+
+    with transaction.atomic():
+        blobs = list(DocumentBlob.objects.select_for_update().only('id', 'ref_count'))
+        for blob in blobs:
+            blob.ref_count = counts.get(blob.pk, 0)
+        DocumentBlob.objects.bulk_update(blobs, ['ref_count'], batch_size=1000)
+        _delete_unused([blob.pk for blob in blobs if not blob.ref_count])
+    return len(blobs)
+
+
+def adopt_legacy_documents(progress=None):
+    """
+    Move documents uploaded before deduplication onto blobs.
+
+    Each file is hashed from storage; the first document with some content
+    hands its file over to a new blob as-is, later duplicates point at that
+    blob and their own copy is deleted. Files still named by archived
+    documents are left alone.
+
+    Args:
+        progress: Optional callable(done, total)
+
+    Returns:
+        tuple: (documents adopted, duplicate files deleted, bytes freed)
+    """
+    storage = TaskDocument._meta.get_field('file').storage
+    archived_names = {doc['file'] for doc in _archived_documents() if not doc.get('blob_id')}
+    legacy = list(TaskDocument.objects.filter(blob=None).exclude(file='').order_by('id').values_list('id', 'file', 'file_size'))
+
+    adopted = deleted = freed = 0
+    for done, (document_id, name, size) in enumerate(legacy, 1):
+        try:
+            with storage.open(name, 'rb') as source:
+                sha256 = stream_sha256(source)
+        except FileNotFoundError:
+            continue
+
+        with transaction.atomic():
+            blob = DocumentBlob.objects.select_for_update().filter(sha256=sha256).first()
+            if blob is None:
+                blob = DocumentBlob.objects.create(sha256=sha256, file=name, size=size, ref_count=0)
+            DocumentBlob.objects.filter(pk=blob.pk).update(ref_count=F('ref_count') + 1)
+            TaskDocument.objects.filter(pk=document_id).update(blob=blob, file=blob.file.name)
+            if blob.file.name != name and name not in archived_names:
+                transaction.on_commit(lambda name=name: storage.delete(name))
+                deleted += 1
+                freed += size or 0
+        adopted += 1
+        if progress:
+            progress(done, len(legacy))
+    return adopted, deleted, freed
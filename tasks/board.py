@@ -0,0 +1,104 @@
+"""
+Kanban board queries: main tasks of a project grouped into status columns.
+
+Tasks whose status is missing or not one of Task.STATUS_CHOICES land in an
+extra "Invalid Status" column (e.g. rows imported from Excel). A full board
+is three queries whatever its size: column counts, the first page of every
+column from one windowed query, and subtask counts for those cards. Columns
+are then paged on their own with an id cursor.
+"""
+from django.db.models import Case, Count, F, Q, Value, When, Window, CharField
+from django.db.models.functions import Left, RowNumber
+from .models import Task
+
+INVALID_COLUMN = 'Invalid Status'
+VALID_STATUSES = [value for value, _ in Task.STATUS_CHOICES]
+COLUMNS = VALID_STATUSES + [INVALID_COLUMN]
+
+DESCRIPTION_PREVIEW_LENGTH = 200
+
+CARD_FIELDS = (
+    'id', 'task_number', 'title', 'status', 'priority', 'progress', 'start_date', 'due_date',
+    'duration', 'assignee_id', 'is_critical', 'total_float', 'early_start_day', 'late_start_day',
+)
+
+
+def _board_tasks(project_id):
+    return Task.objects.filter(project_id=project_id, parent_task__isnull=True).annotate(
+        column=Case(
+            When(status__in=VALID_STATUSES, then=F('status')),
+            default=Value(INVALID_COLUMN),
+            output_field=CharField(),
+        )
+    )
+
+
+def _column_filter(column):
+    if column == INVALID_COLUMN:
+        return Q(status__isnull=True) | ~Q(status__in=VALID_STATUSES)
+    return Q(status=column)
+
+
+def _cards(queryset):
+    return queryset.select_related('assignee').only(
+        *CARD_FIELDS, 'assignee__username'
+    ).annotate(description_preview=Left('description', DESCRIPTION_PREVIEW_LENGTH))
+
+
+def _subtask_counts(cards):
+    counts = Task.objects.filter(parent_task_id__in=[card.id for card in cards]).values('parent_task_id').annotate(
+        total=Count('id'),
+        completed=Count('id', filter=Q(progress=100)),
+    )
+    return {row['parent_task_id']: (row['total'], row['completed']) for row in counts}
+
+
+def _attach_subtask_counts(cards):
+    counts = _subtask_counts(cards) if cards else {}
+    for card in cards:
+        card.subtask_count, card.completed_subtasks = counts.get(card.id, (0, 0))
+    return cards
+
+
+def get_board(project_id, limit):
+    """
+    Build every column of a project's board.
+
+    Returns:
+        list: [{'status', 'count', 'cards', 'has_more'}] in column order; cards
+        carry subtask_count / completed_subtasks attributes
+    """
+    tasks = _board_tasks(project_id)
+    counts = dict(tasks.order_by().values_list('column').annotate(count=Count('id')))
+
+    # First page of each column in one query: number the rows per column and cut
+    cards = list(_cards(tasks.annotate(
+        row=Window(RowNumber(), partition_by=[F('column')], order_by=[F('id').asc()])
+    ).filter(row__lte=limit)).order_by('id'))
+    _attach_subtask_counts(cards)
+
+    columns = []
+    for column in COLUMNS:
+        column_cards = [card for card in cards if card.column == column]
+        columns.append({
+            'status': column,
+            'count': counts.get(column, 0),
+            'cards': column_cards,
+            'has_more': counts.get(column, 0) > len(column_cards),
+        })
+    return columns
+
+
+def get_column_page(project_id, column, after=None, limit=20):
+    """
+    Next page of one column, starting after the card id ``after``.
+
+    Returns:
+        tuple: (cards, has_more)
+    """
+    tasks = _board_tasks(project_id).filter(_column_filter(column))
+    if after:
+        tasks = tasks.filter(id__gt=after)
+    cards = list(_cards(tasks).order_by('id')[:limit + 1])
+    has_more = len(cards) > limit
+    return _attach_subtask_counts(cards[:limit]), has_more
@@ -0,0 +1,208 @@
+"""
+Access-checked task document downloads.
+
+    GET /api/tasks/<id>/documents/<document_id>/download/[?download=1]
+
+Callers authenticate with their JWT or with the signed `token` that
+TaskDocumentSerializer puts into download_url, so <img>/<iframe> previews
+work without headers. Full files go out as a FileResponse, which the WSGI
+server can send with sendfile(). Single-range requests get a 206 with just
+the requested bytes (resumed downloads, PDF viewers seeking pages). With
+TASK_DOCUMENT_SENDFILE set, the response only carries an X-Accel-Redirect
+(nginx) or X-Sendfile (Apache / lighttpd) header and the fronting server
+sends the file, ranges included.
+
+    GET /api/tasks/<id>/documents/<document_id>/thumbnail/
+
+serves the preview rendered by tasks/thumbnails.py, with the same checks.
+
+The uploader's file_type is never echoed back. The served type comes from
+the stored bytes: only raster images and PDFs whose signature matches are
+shown inline (under `Content-Security-Policy: sandbox`), everything else
+goes out as an application/octet-stream attachment, and every response
+carries `X-Content-Type-Options: nosniff`, so an uploaded HTML or SVG file
+can never run script on the API origin.
+"""
+import re
+from django.conf import settings
+from django.core import signing
+from django.db.models import Q
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.http import content_disposition_header
+
+# None, 'x-accel-redirect' or 'x-sendfile'
+SENDFILE_BACKEND = getattr(settings, 'TASK_DOCUMENT_SENDFILE', None)
+
+# nginx `internal` location aliased to MEDIA_ROOT
+ACCEL_REDIRECT_PREFIX = getattr(settings, 'TASK_DOCUMENT_ACCEL_PREFIX', '/protected-media/')
+
+# Lifetime of signed download URLs, in seconds
+DOWNLOAD_URL_MAX_AGE = getattr(settings, 'TASK_DOCUMENT_URL_MAX_AGE', 60 * 60)
+
+BLOCK_SIZE = 64 * 1024
+
+_SIGNING_SALT = 'tasks.document-download'
+
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+# Types served inline, by leading bytes (SVG is deliberately absent: it can carry script)
+INLINE_SIGNATURES = (
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+    (b'%PDF-', 'application/pdf'),
+)
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def can_access_task(user, task):
+    """Project owners and members; tasks without a project by their creator or assignee"""
+    if not user or not user.is_authenticated:
+        return False
+    if task.project_id is None:
+        return user.pk in (task.created_by_id, task.assignee_id)
+    from project.models import Project
+    return Project.objects.filter(Q(owner=user) | Q(members=user), pk=task.project_id).exists()
+
+
+def download_token(document, user):
+    return signing.TimestampSigner(salt=_SIGNING_SALT).sign(f"{document.pk}:{user.pk}")
+
+
+def token_user_id(token, document):
+    """User id a download token was issued to, or None if it is invalid, expired or for another document"""
+    try:
+        value = signing.TimestampSigner(salt=_SIGNING_SALT).unsign(token, max_age=DOWNLOAD_URL_MAX_AGE)
+    except signing.BadSignature:
+        return None
+    document_id, _, user_id = value.partition(':')
+    return int(user_id) if document_id == str(document.pk) and user_id.isdigit() else None
+
+
+def download_url(document, request=None, route='task-download-document'):
+    """Download URL of a document, signed for the requesting user when there is one"""
+    url = reverse(route, kwargs={'pk': document.task_id, 'document_id': document.pk})
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        url = f"{url}?token={download_token(document, user)}"
+    return request.build_absolute_uri(url) if request is not None else url
+
+
+def parse_range(header, size):
+    """
+    (start, end) of a single `bytes=` range, end inclusive.
+
+    Returns None when the header should be ignored (absent, malformed or
+    multi-range), so the whole file is sent.
+
+    Raises:
+        RangeNotSatisfiable: If the range lies outside the file
+    """
+    match = _RANGE_RE.match((header or '').strip())
+    if not match or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if not first:
+        # Suffix range: the last N bytes
+        if int(last) == 0 or size == 0:
+            raise RangeNotSatisfiable()
+        return max(size - int(last), 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or (last and int(last) < start):
+        raise RangeNotSatisfiable()
+    return start, end
+
+
+def _stream_range(file, start, length):
+    try:
+        file.seek(start)
+        while length > 0:
+            block = file.read(min(BLOCK_SIZE, length))
+            if not block:
+                break
+            length -= len(block)
+            yield block
+    finally:
+        file.close()
+
+
+def sniff_content_type(storage, name):
+    """Inline-safe content type of a stored file from its leading bytes, or None"""
+    with storage.open(name, 'rb') as file:
+        head = file.read(12)
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'image/webp'
+    return next((content_type for signature, content_type in INLINE_SIGNATURES if head.startswith(signature)), None)
+
+
+def document_response(request, document):
+    """Stream a TaskDocument's file, honouring Range / If-Range"""
+    field_file = document.file
+    storage = field_file.storage
+    # Blob names change when the content does, so the digest is a strong validator
+    etag = f'"{document.blob.sha256}"' if document.blob_id else None
+    if etag and request.META.get('HTTP_IF_NONE_MATCH') == etag:
+        response = HttpResponse(status=304)
+        response['ETag'] = etag
+        return response
+
+    content_type = sniff_content_type(storage, field_file.name)
+    as_attachment = content_type is None or request.GET.get('download') in ('1', 'true')
+    content_type = content_type or 'application/octet-stream'
+
+    if SENDFILE_BACKEND in ('x-accel-redirect', 'x-sendfile'):
+        response = HttpResponse(content_type=content_type)
+        if SENDFILE_BACKEND == 'x-accel-redirect':
+            response['X-Accel-Redirect'] = f"{ACCEL_REDIRECT_PREFIX.rstrip('/')}/{field_file.name}"
+        else:
+            response['X-Sendfile'] = storage.path(field_file.name)
+    else:
+        file = storage.open(field_file.name, 'rb')
+        size = storage.size(field_file.name)
+
+        byte_range = None
+        if_range = request.META.get('HTTP_IF_RANGE')
+        if not if_range or (etag and if_range == etag):
+            try:
+                byte_range = parse_range(request.META.get('HTTP_RANGE'), size)
+            except RangeNotSatisfiable:
+                file.close()
+                response = HttpResponse(status=416)
+                response['Content-Range'] = f"bytes */{size}"
+                return response
+
+        if byte_range is None:
+            response = FileResponse(file, content_type=content_type)
+        else:
+            start, end = byte_range
+            response = StreamingHttpResponse(
+                _stream_range(file, start, end - start + 1), status=206, content_type=content_type
+            )
+            response['Content-Length'] = str(end - start + 1)
+            response['Content-Range'] = f"bytes {start}-{end}/{size}"
+        response['Accept-Ranges'] = 'bytes'
+
+    response['Content-Disposition'] = content_disposition_header(as_attachment, document.file_name)
+    response['X-Content-Type-Options'] = 'nosniff'
+    if not as_attachment:
+        response['Content-Security-Policy'] = 'sandbox'
+    response['Cache-Control'] = 'private, max-age=3600'
+    if etag:
+        response['ETag'] = etag
+    return response
+
+
+def thumbnail_response(blob):
+    """Serve a blob's thumbnail; it never changes for a given content"""
+    storage = blob.thumbnail.storage
+    content_type = 'image/webp' if blob.thumbnail.name.endswith('.webp') else 'image/png'
+    response = FileResponse(storage.open(blob.thumbnail.name, 'rb'), content_type=content_type)
+    response['X-Content-Type-Options'] = 'nosniff'
+    response['Cache-Control'] = 'private, max-age=86400'
+    return response
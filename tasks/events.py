@@ -0,0 +1,119 @@
+"""
+In-process publish/subscribe fan-out of project task events.
+
+Publishers (model signals, CPM recalculation) run in ordinary sync Django
+code; subscribers are asyncio queues owned by the server-sent event streams
+in tasks/sse.py. Delivery hops onto each subscriber's event loop with
+call_soon_threadsafe, so an idle connection costs one queue and two
+coroutines rather than a thread.
+
+Events only reach clients connected to the same process. Clients that miss
+events (reconnects, overflow, other workers) catch up with the change log
+via tasks/changes/?since=<cursor>.
+"""
+import json
+import threading
+from collections import defaultdict
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+
+
+class ProjectEventBroker:
+    """Fan out task events to the SSE subscribers of each project"""
+
+    def __init__(self, queue_size=200):
+        self.queue_size = queue_size
+        self._subscribers = defaultdict(dict)  # project_id -> {queue: loop}
+        self._lock = threading.Lock()
+
+    def subscribe(self, project_id):
+        """
+        Register a subscriber; must be called from the subscriber's event loop.
+
+        Returns:
+            asyncio.Queue: Receives encoded SSE messages (bytes)
+        """
+        import asyncio
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        with self._lock:
+            self._subscribers[project_id][queue] = asyncio.get_running_loop()
+        return queue
+
+    def unsubscribe(self, project_id, queue):
+        with self._lock:
+            subscribers = self._subscribers.get(project_id)
+            if subscribers is not None:
+                subscribers.pop(queue, None)
+                if not subscribers:
+                    del self._subscribers[project_id]
+
+    def subscriber_count(self, project_id=None):
+        with self._lock:
+            if project_id is not None:
+                return len(self._subscribers.get(project_id, {}))
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    def publish(self, project_id, event_type, data, event_id=None):
+        """Send an event to every subscriber of a project (thread-safe)"""
+        if project_id is None:
+            return
+        with self._lock:
+            targets = list(self._subscribers.get(project_id, {}).items())
+        if not targets:
+            return
+
+        message = encode_event(event_type, data, event_id)
+        for queue, loop in targets:
+            try:
+                loop.call_soon_threadsafe(self._deliver, queue, message)
+            except RuntimeError:
+                # The subscriber's loop has shut down; it will unsubscribe itself
+                pass
+
+    @staticmethod
+    def _deliver(queue, message):
+        if queue.full():
+            # A slow client lost events: drop the backlog and tell it to resync
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait(encode_event('resync', {'reason': 'overflow'}))
+            return
+        queue.put_nowait(message)
+
+
+def encode_event(event_type, data, event_id=None):
+    """Encode one server-sent event"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event_type}")
+    lines.append(f"data: {json.dumps(data, cls=DjangoJSONEncoder)}")
+    return ('\n'.join(lines) + '\n\n').encode()
+
+
+broker = ProjectEventBroker()
+
+
+def publish_on_commit(project_id, event_type, data, event_id=None):
+    """Publish once the current transaction commits (immediately in autocommit)"""
+    if project_id is None:
+        return
+    transaction.on_commit(lambda: broker.publish(project_id, event_type, data, event_id))
+
+
+def task_event_data(task):
+    """Slim task payload carried by task.created / task.updated events"""
+    return {
+        'id': task.pk,
+        'task_number': task.task_number,
+        'title': task.title,
+        'status': task.status,
+        'priority': task.priority,
+        'progress': task.progress,
+        'start_date': task.start_date,
+        'due_date': task.due_date,
+        'parent_task': task.parent_task_id,
+        'assignee': task.assignee_id,
+        'is_critical': task.is_critical,
+        'total_float': task.total_float,
+    }
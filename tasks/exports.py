@@ -0,0 +1,315 @@
+"""
+Streaming task exports.
+
+The XLSX export uses openpyxl's write-only mode: rows go straight to a
+temporary file instead of a cell tree, and the finished workbook is zipped
+into a second temporary file that is streamed back in blocks. Task rows are
+read with a chunked values_list() iterator; assignee emails and dependency
+edges are loaded up front with one query each, so the export runs a fixed
+number of queries and memory stays flat however many tasks there are.
+
+`?format=csv|ndjson|parquet` skips the workbook. CSV and NDJSON are encoded
+a chunk of rows at a time and streamed as they are produced, with no
+temporary file. Parquet (needs pyarrow) is written one row group at a time
+with typed columns (dates as dates, dependencies as a list<int64> column)
+into a temporary file, since its footer comes last. These formats use
+snake_case column names and native values instead of the XLSX display
+strings. The same writers serve the user export (users/exports.py).
+"""
+import csv
+import io
+import tempfile
+from functools import partial
+from itertools import islice
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Max
+from django.db.models.functions import Length
+from django.http import FileResponse, StreamingHttpResponse
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, Alignment, PatternFill
+from openpyxl.utils import get_column_letter
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.renderers import JSONRenderer
+from .models import Task
+
+TASK_EXPORT_HEADERS = [
+    'ID', 'Title', 'Description', 'Status', 'Priority',
+    'Start Date', 'Due Date', 'Duration (days)', 'Progress (%)',
+    'Parent Task ID', 'Assignee Email', 'Dependencies (IDs)'
+]
+
+TASK_EXPORT_FIELDS = (
+    'id', 'title', 'description', 'status', 'priority', 'start_date', 'due_date',
+    'duration', 'progress', 'parent_task_id', 'assignee_id',
+)
+
+# (name, type) per column of the csv/ndjson/parquet task export
+TASK_EXPORT_COLUMNS = (
+    ('id', 'int'), ('title', 'string'), ('description', 'string'), ('status', 'string'),
+    ('priority', 'string'), ('start_date', 'date'), ('due_date', 'date'), ('duration', 'int'),
+    ('progress', 'int'), ('parent_task_id', 'int'), ('assignee_email', 'string'),
+    ('dependencies', 'int_list'),
+)
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# format -> content type
+EXPORT_FORMATS = {
+    'xlsx': XLSX_CONTENT_TYPE,
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+MAX_COLUMN_WIDTH = 50
+
+ITERATOR_CHUNK_SIZE = 2000
+
+STREAM_BLOCK_SIZE = 256 * 1024
+
+# Rows per Parquet row group (all of a group's values are in memory at once)
+PARQUET_ROW_GROUP_SIZE = 64 * 1024
+
+
+class ExportContentNegotiation(DefaultContentNegotiation):
+    """
+    DRF treats `?format=` as a renderer override and answers 404 when no
+    renderer has that format. Export views read `format` themselves (and
+    reject unknown ones with a 400), so it is left out of negotiation here;
+    their only rendered responses are JSON errors.
+    """
+
+    def filter_renderers(self, renderers, format):
+        return renderers
+
+
+EXPORT_RENDERERS = [JSONRenderer]
+
+
+def export_lookups(tasks):
+    """
+    Assignee emails and dependency ids for a task queryset, one query each.
+
+    Returns:
+        tuple: ({user_id: email}, {task_id: [dependency ids]})
+    """
+    from users.models import CustomUser
+
+    emails = dict(CustomUser.objects.filter(
+        pk__in=tasks.exclude(assignee=None).order_by().values('assignee_id')
+    ).values_list('pk', 'email'))
+
+    dependencies = {}
+    edges = Task.dependencies.through.objects.filter(
+        from_task_id__in=tasks.order_by().values('pk')
+    ).order_by('from_task_id', 'to_task_id').values_list('from_task_id', 'to_task_id')
+    for task_id, dependency_id in edges.iterator(chunk_size=ITERATOR_CHUNK_SIZE):
+        dependencies.setdefault(task_id, []).append(dependency_id)
+    return emails, dependencies
+
+
+def task_export_records(tasks, emails, dependencies):
+    """Typed export records (in TASK_EXPORT_COLUMNS order) streamed from a values_list() iterator"""
+    rows = tasks.order_by('id').values_list(*TASK_EXPORT_FIELDS)
+    for (task_id, title, description, status, priority, start_date, due_date,
+         duration, progress, parent_task_id, assignee_id) in rows.iterator(chunk_size=ITERATOR_CHUNK_SIZE):
+        yield (
+            task_id, title, description, status, priority, start_date, due_date,
+            duration, progress, parent_task_id, emails.get(assignee_id), dependencies.get(task_id, []),
+        )
+
+
+def task_export_rows(tasks, emails, dependencies):
+    """XLSX export rows (in TASK_EXPORT_HEADERS order), as display strings"""
+    for (task_id, title, description, status, priority, start_date, due_date, duration,
+         progress, parent_task_id, email, dependency_ids) in task_export_records(tasks, emails, dependencies):
+        yield [
+            task_id,
+            title,
+            description or '',
+            status,
+            priority,
+            start_date.strftime('%Y-%m-%d') if start_date else '',
+            due_date.strftime('%Y-%m-%d') if due_date else '',
+            duration or '',
+            progress or 0,
+            parent_task_id or '',
+            email or '',
+            ','.join(map(str, dependency_ids)),
+        ]
+
+
+def _column_widths(tasks, emails, dependencies):
+    """
+    Column widths for the export, known before the first row is written.
+
+    Write-only sheets emit their <cols> element ahead of the rows, so the
+    text columns are measured by the database (one MAX(LENGTH()) aggregate)
+    and the looked-up columns from the dictionaries already in memory.
+    """
+    lengths = tasks.order_by().aggregate(
+        **{field: Max(Length(field)) for field in ('title', 'description', 'status', 'priority')},
+        id=Max('id'), parent_task_id=Max('parent_task_id'),
+    )
+    widest_dependencies = max(
+        (sum(len(str(dependency_id)) + 1 for dependency_id in ids) - 1 for ids in dependencies.values()), default=0
+    )
+    values = [
+        len(str(lengths['id'] or '')), lengths['title'], lengths['description'], lengths['status'],
+        lengths['priority'], 10, 10, 3, 3, len(str(lengths['parent_task_id'] or '')),
+        max(map(len, emails.values()), default=0), widest_dependencies,
+    ]
+    return [
+        min(max(value or 0, len(header)) + 2, MAX_COLUMN_WIDTH)
+        for header, value in zip(TASK_EXPORT_HEADERS, values)
+    ]
+
+
+def header_cells(ws, headers):
+    """Styled header row for a write-only sheet"""
+    header_fill = PatternFill(start_color='4472C4', end_color='4472C4', fill_type='solid')
+    header_font = Font(bold=True, color='FFFFFF')
+    header_alignment = Alignment(horizontal='center', vertical='center')
+    cells = []
+    for header in headers:
+        cell = WriteOnlyCell(ws, value=header)
+        cell.fill = header_fill
+        cell.font = header_font
+        cell.alignment = header_alignment
+        cells.append(cell)
+    return cells
+
+
+def write_tasks_xlsx(tasks, output):
+    """
+    Write a task queryset as an XLSX workbook into a binary file object.
+
+    Args:
+        tasks: Task queryset
+        output: Writable binary file (e.g. a temporary file)
+    """
+    emails, dependencies = export_lookups(tasks)
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title='Tasks')
+    for index, width in enumerate(_column_widths(tasks, emails, dependencies), 1):
+        ws.column_dimensions[get_column_letter(index)].width = width
+
+    ws.append(header_cells(ws, TASK_EXPORT_HEADERS))
+    for row in task_export_rows(tasks, emails, dependencies):
+        ws.append(row)
+    wb.save(output)
+
+
+def streaming_file_response(build, content_type, filename):
+    """
+    Build a file into a temporary file and stream it back in blocks.
+
+    Args:
+        build: Callable writing the content into the binary file it is given
+        content_type: Response content type
+        filename: Attachment file name
+    """
+    output = tempfile.TemporaryFile()
+    try:
+        build(output)
+        output.seek(0)
+    except Exception:
+        output.close()
+        raise
+    # FileResponse is a StreamingHttpResponse; it closes (and so deletes) the file when done
+    response = FileResponse(output, content_type=content_type, as_attachment=True, filename=filename)
+    response.block_size = STREAM_BLOCK_SIZE
+    return response
+
+
+def _batches(records, size):
+    records = iter(records)
+    while batch := list(islice(records, size)):
+        yield batch
+
+
+def csv_chunks(columns, records):
+    """
+    CSV text for export records, encoded a chunk of rows at a time.
+
+    List columns are joined with commas inside one (quoted) field; empty
+    values are empty fields.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(name for name, _ in columns)
+    lists = [index for index, (_, kind) in enumerate(columns) if kind.endswith('_list')]
+    for batch in _batches(records, ITERATOR_CHUNK_SIZE):
+        if lists:
+            batch = [list(record) for record in batch]
+            for record in batch:
+                for index in lists:
+                    record[index] = ','.join(map(str, record[index]))
+        writer.writerows(batch)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def ndjson_chunks(columns, records):
+    """Newline-delimited JSON objects for export records, a chunk of rows at a time"""
+    names = [name for name, _ in columns]
+    encode = DjangoJSONEncoder(separators=(',', ':'), ensure_ascii=False).encode
+    for batch in _batches(records, ITERATOR_CHUNK_SIZE):
+        yield ''.join([encode(dict(zip(names, record))) + '\n' for record in batch]).encode()
+
+
+def parquet_available():
+    try:
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def write_parquet(columns, records, output):
+    """
+    Write export records as a Parquet file, one row group per PARQUET_ROW_GROUP_SIZE rows.
+
+    Args:
+        columns: (name, type) pairs; types are int, string, date, timestamp, bool or int_list
+        records: Iterable of tuples in column order
+        output: Writable binary file
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    types = {
+        'int': pa.int64(), 'string': pa.string(), 'date': pa.date32(),
+        'timestamp': pa.timestamp('us', tz='UTC'), 'bool': pa.bool_(), 'int_list': pa.list_(pa.int64()),
+    }
+    schema = pa.schema([(name, types[kind]) for name, kind in columns])
+    with pq.ParquetWriter(output, schema, compression='snappy') as writer:
+        for batch in _batches(records, PARQUET_ROW_GROUP_SIZE):
+            # Transpose the rows into one array per column
+            arrays = [pa.array(values, type=field.type) for values, field in zip(zip(*batch), schema)]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+
+
+def export_response(export_format, columns, records, filename):
+    """
+    Stream export records as csv, ndjson or parquet.
+
+    Args:
+        export_format: 'csv', 'ndjson' or 'parquet'
+        columns: (name, type) pairs
+        records: Iterable of tuples in column order, consumed while the response is sent
+        filename: Attachment file name
+    """
+    content_type = EXPORT_FORMATS[export_format]
+    if export_format == 'parquet':
+        return streaming_file_response(partial(write_parquet, columns, records), content_type, filename)
+
+    chunks = csv_chunks(columns, records) if export_format == 'csv' else ndjson_chunks(columns, records)
+    response = StreamingHttpResponse(chunks, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
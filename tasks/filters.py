@@ -0,0 +1,87 @@
+"""
+Server-side task filters shared by the task list endpoints.
+
+Every supported filter is backed by one of the composite indexes declared on
+Task.Meta; tasks/tests.py checks the query plans so new filters keep that
+property.
+"""
+from datetime import datetime, timedelta
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+# Filters whose result depends on today's date rather than only on the data
+DATE_RELATIVE_FILTERS = ('overdue', 'due_this_week')
+
+TRUE_VALUES = ('1', 'true', 'yes')
+
+
+def _split(value):
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+def _parse_date(params, name):
+    value = params.get(name)
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise ValidationError({name: 'Use the YYYY-MM-DD format'})
+
+
+def apply_task_filters(queryset, params):
+    """
+    Narrow a Task queryset using request query parameters.
+
+    Supported parameters:
+        project_id: Tasks of one project
+        status: One or more comma-separated statuses
+        priority: One or more comma-separated priorities
+        assignee_id: Tasks assigned to a user ('none' for unassigned)
+        due_after / due_before: Inclusive due date range (YYYY-MM-DD)
+        overdue: Past due and not Done
+        due_this_week: Due between this Monday and Sunday
+
+    Raises:
+        ValidationError: If a parameter is malformed
+    """
+    project_id = params.get('project_id')
+    if project_id:
+        queryset = queryset.filter(project_id=project_id)
+
+    statuses = _split(params.get('status', ''))
+    if statuses:
+        queryset = queryset.filter(status__in=statuses)
+
+    priorities = _split(params.get('priority', ''))
+    if priorities:
+        queryset = queryset.filter(priority__in=priorities)
+
+    assignee_id = params.get('assignee_id')
+    if assignee_id:
+        if assignee_id == 'none':
+            queryset = queryset.filter(assignee__isnull=True)
+        elif assignee_id.isdigit():
+            queryset = queryset.filter(assignee_id=assignee_id)
+        else:
+            raise ValidationError({'assignee_id': 'Must be a user id or "none"'})
+
+    due_after = _parse_date(params, 'due_after')
+    if due_after:
+        queryset = queryset.filter(due_date__gte=due_after)
+
+    due_before = _parse_date(params, 'due_before')
+    if due_before:
+        queryset = queryset.filter(due_date__lte=due_before)
+
+    today = timezone.localdate()
+
+    if params.get('overdue', '').lower() in TRUE_VALUES:
+        # Tasks with a NULL status are not Done either
+        queryset = queryset.filter(due_date__lt=today).exclude(status='Done')
+
+    if params.get('due_this_week', '').lower() in TRUE_VALUES:
+        week_start = today - timedelta(days=today.weekday())
+        queryset = queryset.filter(due_date__range=(week_start, week_start + timedelta(days=6)))
+
+    return queryset
@@ -0,0 +1,378 @@
+"""
+Set-based operations on task hierarchies (a task plus all of its subtasks).
+
+A subtree is selected through the materialized Task.path column in one
+indexed query. Clones are inserted with one bulk_create per hierarchy level,
+and moves and deletes run as a handful of UPDATE statements instead of
+per-instance saves. These paths skip the model signals, so they write the
+change log, activity log and live events themselves.
+
+Deleting from the API is a soft delete (Task.deleted_at) that
+restore_subtree() can undo; the archive command (tasks/archive.py) later
+moves deleted subtrees out of the live table. Structural updates (paths, project moves) go
+through Task.all_objects so soft-deleted subtasks move along.
+"""
+from itertools import groupby
+from django.db import connection, transaction
+from django.db.models import Max, Q, Subquery, OuterRef, F, Value, CharField
+from django.db.models.functions import Cast, Concat
+from django.utils import timezone
+from .events import publish_on_commit
+from .models import Task, TaskChange, TaskActivity
+
+# Fields copied onto cloned tasks; CPM fields are left for the next recalculation
+CLONED_FIELDS = (
+    'title', 'description', 'status', 'priority', 'start_date', 'due_date',
+    'duration', 'progress', 'assignee_id',
+)
+
+
+def subtree_filter(root):
+    """Q object matching a task and all of its descendants"""
+    return Q(pk=root.pk) | Task.descendants_filter(root.descendant_prefix)
+
+
+def get_subtree(root):
+    """
+    Load a task and all of its descendants in one query.
+
+    Returns:
+        list: Tasks ordered by depth (root first)
+    """
+    return list(Task.objects.filter(subtree_filter(root)).order_by('depth', 'id'))
+
+
+def _log_subtree(root, action):
+    """Append one change per subtree task (under its current project) with INSERT ... SELECT"""
+    quote = connection.ops.quote_name
+    select_sql, params = Task.objects.filter(subtree_filter(root)).values('project_id', 'id').query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {quote(TaskChange._meta.db_table)} (project_id, task_id, action, created_at) "
+            f"SELECT subtree.project_id, subtree.id, %s, %s FROM ({select_sql}) subtree",
+            [action, connection.ops.adapt_datetimefield_value(timezone.now()), *params]
+        )
+
+
+def _log_edges(project_id, action, edges):
+    TaskChange.objects.bulk_create([
+        TaskChange(project_id=project_id, task_id=task_id, dependency_id=dependency_id, action=action)
+        for task_id, dependency_id in edges
+    ], batch_size=1000)
+
+
+def _latest_change(project_id):
+    return TaskChange.objects.filter(project_id=project_id).aggregate(latest=Max('id'))['latest']
+
+
+def _log_activity(task, verb, changes, actor):
+    # One row for the subtree root; subtask rows would swamp the project feed
+    TaskActivity.objects.create(
+        task_id=task.pk, project_id=task.project_id, actor_id=getattr(actor, 'id', None),
+        verb=verb, changes=changes
+    )
+
+
+def clone_subtree(root, parent=None, project=None, actor=None):
+    """
+    Copy a task and all of its subtasks.
+
+    Parent links and dependencies inside the subtree are remapped onto the
+    copies; dependencies on tasks outside the subtree are kept when the copy
+    stays in the same project. Documents are not copied.
+
+    Args:
+        root: Task to clone
+        parent: Task to attach the copy under (its project wins)
+        project: Project for the copy when no parent is given (default: root's)
+        actor: User making the change
+
+    Returns:
+        Task: The copy of root
+    """
+    if parent is not None:
+        project = parent.project
+        root_parent_id, root_path, root_depth = parent.pk, parent.descendant_prefix, parent.depth + 1
+    elif project is None or project.pk == root.project_id:
+        project = root.project
+        root_parent_id, root_path, root_depth = root.parent_task_id, root.path, root.depth
+    else:
+        root_parent_id, root_path, root_depth = None, '/', 0
+    project_id = project.pk if project else None
+
+    with transaction.atomic():
+        tasks = get_subtree(root)
+        numbers = iter(Task.reserve_task_numbers(project, len(tasks)))
+        created_by_id = getattr(actor, 'id', None)
+
+        clone_map = {}
+        clones = []
+        # One insert per level so children can point at their parent's new id and path
+        for depth, level in groupby(tasks, key=lambda task: task.depth):
+            level = list(level)
+            level_clones = []
+            for task in level:
+                clone = Task(
+                    task_number=next(numbers),
+                    project_id=project_id,
+                    created_by_id=created_by_id or task.created_by_id,
+                    **{field: getattr(task, field) for field in CLONED_FIELDS}
+                )
+                if task.pk == root.pk:
+                    clone.parent_task_id, clone.path, clone.depth = root_parent_id, root_path, root_depth
+                else:
+                    parent_clone = clone_map[task.parent_task_id]
+                    clone.parent_task_id = parent_clone.pk
+                    clone.path, clone.depth = parent_clone.descendant_prefix, parent_clone.depth + 1
+                level_clones.append(clone)
+            Task.objects.bulk_create(level_clones)
+            clone_map.update(zip((task.pk for task in level), level_clones))
+            clones.extend(level_clones)
+        id_map = {task_id: clone.pk for task_id, clone in clone_map.items()}
+
+        through = Task.dependencies.through
+        edges = []
+        for task_id, dependency_id in through.objects.filter(
+            from_task_id__in=[task.pk for task in tasks], to_task__deleted_at__isnull=True
+        ).values_list('from_task_id', 'to_task_id'):
+            if dependency_id in id_map:
+                edges.append((id_map[task_id], id_map[dependency_id]))
+            elif project_id == root.project_id:
+                # External predecessor in the same project
+                edges.append((id_map[task_id], dependency_id))
+        through.objects.bulk_create(
+            [through(from_task_id=task_id, to_task_id=dependency_id) for task_id, dependency_id in edges],
+            batch_size=1000
+        )
+
+        _log_subtree(clones[0], TaskChange.UPSERT)
+        _log_edges(project_id, TaskChange.DEPENDENCY_ADD, edges)
+        Task.refresh_dependency_counts(Task.objects.filter(subtree_filter(clones[0])).values('id'))
+        Task.refresh_dependency_counts({dependency_id for _, dependency_id in edges} - set(id_map.values()))
+        _log_activity(clones[0], TaskActivity.CREATED, {'cloned_from': root.pk, 'subtasks': len(clones) - 1}, actor)
+        publish_on_commit(project_id, 'subtree.cloned', {
+            'root': clones[0].pk,
+            'source': root.pk,
+            'ids': [clone.pk for clone in clones],
+        }, event_id=_latest_change(project_id))
+
+    return clones[0]
+
+
+def move_subtree(root, parent=None, project=None, actor=None):
+    """
+    Reparent a task and carry its subtasks along.
+
+    Moving to another project moves the whole subtree and drops the
+    dependencies that would cross the project boundary.
+
+    Args:
+        root: Task to move
+        parent: New parent task, or None to make root a main task
+        project: Target project when parent is None (default: root's)
+        actor: User making the change
+
+    Raises:
+        ValueError: If parent is inside the subtree being moved
+    """
+    project_id = parent.project_id if parent is not None else (project.pk if project else root.project_id)
+    parent_id = parent.pk if parent is not None else None
+    if parent is not None and (parent.pk == root.pk or f"/{root.pk}/" in parent.path):
+        raise ValueError('A task cannot be moved under its own subtask')
+
+    old_parent_id, old_project_id = root.parent_task_id, root.project_id
+    moving_project = project_id != old_project_id
+    if parent_id == old_parent_id and not moving_project:
+        return root
+
+    with transaction.atomic():
+        if moving_project:
+            # Tombstones for the project the tasks leave
+            _log_subtree(root, TaskChange.DELETE)
+
+        old_prefix, old_depth = root.descendant_prefix, root.depth
+        new_path, new_depth = (parent.descendant_prefix, parent.depth + 1) if parent is not None else ('/', 0)
+        now = timezone.now()
+        Task.objects.filter(pk=root.pk).update(parent_task_id=parent_id, path=new_path, depth=new_depth, updated_at=now)
+        root.parent_task_id, root.path, root.depth = parent_id, new_path, new_depth
+        # Descendants keep their relative ancestry under the new prefix
+        Task.rewrite_paths(old_prefix, root.descendant_prefix, new_depth - old_depth)
+
+        subtree = Task.all_objects.filter(subtree_filter(root))
+        task_ids = list(subtree.filter(deleted_at__isnull=True).values_list('id', flat=True))
+        changes = {'parent_task_id': [old_parent_id, parent_id]}
+        if moving_project:
+            subtree.update(project_id=project_id, updated_at=now)
+        # Every subtask's path / depth changed, not just the root's
+        _log_subtree(root, TaskChange.UPSERT)
+
+        if moving_project:
+            # Dependencies may not cross projects, so edges leaving the subtree go
+            subtree_ids = subtree.values('id')
+            through = Task.dependencies.through
+            crossing = list(through.objects.filter(
+                (Q(from_task_id__in=subtree_ids) & ~Q(to_task_id__in=subtree_ids))
+                | (~Q(from_task_id__in=subtree_ids) & Q(to_task_id__in=subtree_ids))
+            ).values_list('pk', 'from_task_id', 'to_task_id'))
+            through.objects.filter(pk__in=[pk for pk, _, _ in crossing]).delete()
+            _log_edges(old_project_id, TaskChange.DEPENDENCY_REMOVE,
+                       [(task_id, dependency_id) for _, task_id, dependency_id in crossing])
+            Task.refresh_dependency_counts({task_id for _, *edge in crossing for task_id in edge})
+            changes['project_id'] = [old_project_id, project_id]
+        if len(task_ids) > 1:
+            changes['subtasks'] = len(task_ids) - 1
+
+        root.refresh_from_db()
+        _log_activity(root, TaskActivity.UPDATED, changes, actor)
+
+        publish_on_commit(project_id, 'subtree.moved', {
+            'root': root.pk,
+            'parent_task': parent_id,
+            'ids': task_ids,
+        }, event_id=_latest_change(project_id))
+        if moving_project:
+            publish_on_commit(old_project_id, 'subtree.deleted', {
+                'root': root.pk,
+                'ids': task_ids,
+            }, event_id=_latest_change(old_project_id))
+
+    return root
+
+
+def soft_delete_subtree(root, actor=None):
+    """
+    Mark a task and all of its live subtasks deleted.
+
+    Rows, dependency links and documents stay where they are, so
+    restore_subtree() can bring the subtree back; the default manager stops
+    returning it at once and the archive command moves it out later.
+
+    Args:
+        root: Task to delete
+        actor: User making the change
+
+    Returns:
+        int: Number of tasks deleted
+    """
+    with transaction.atomic():
+        tasks = Task.objects.filter(subtree_filter(root))
+        subtree = tasks.values('id')
+        task_ids = list(tasks.values_list('id', flat=True))
+
+        through = Task.dependencies.through
+        # Live dependents outside the subtree lose a predecessor
+        orphaned = list(
+            through.objects.filter(to_task_id__in=subtree, from_task__deleted_at__isnull=True)
+            .exclude(from_task_id__in=subtree).values_list('from_task_id', 'to_task_id')
+        )
+        predecessor_ids = set(
+            through.objects.filter(from_task_id__in=subtree).exclude(to_task_id__in=subtree)
+            .values_list('to_task_id', flat=True)
+        )
+
+        _log_subtree(root, TaskChange.DELETE)
+        _log_edges(root.project_id, TaskChange.DEPENDENCY_REMOVE, orphaned)
+        changes = {'title': [root.title, None]}
+        if len(task_ids) > 1:
+            changes['subtasks'] = len(task_ids) - 1
+        _log_activity(root, TaskActivity.DELETED, changes, actor)
+
+        # One timestamp for the whole subtree marks what a restore brings back
+        now = timezone.now()
+        tasks.update(deleted_at=now, updated_at=now)
+        root.deleted_at = now
+        Task.refresh_dependency_counts({task_id for task_id, _ in orphaned} | predecessor_ids)
+
+        publish_on_commit(root.project_id, 'subtree.deleted', {
+            'root': root.pk,
+            'ids': task_ids,
+        }, event_id=_latest_change(root.project_id))
+
+    return len(task_ids)
+
+
+def restore_subtree(root, actor=None):
+    """
+    Undo soft_delete_subtree(): restore a task and the subtasks deleted with it.
+
+    Subtasks deleted on their own before the root stay deleted.
+
+    Args:
+        root: Soft-deleted task
+        actor: User making the change
+
+    Returns:
+        int: Number of tasks restored
+
+    Raises:
+        ValueError: If the task's parent is still deleted
+    """
+    if root.deleted_at is None:
+        return 0
+    if root.parent_task_id and not Task.objects.filter(pk=root.parent_task_id).exists():
+        raise ValueError('Restore the parent task first')
+
+    with transaction.atomic():
+        tasks = Task.all_objects.filter(subtree_filter(root), deleted_at=root.deleted_at)
+        task_ids = list(tasks.values_list('id', flat=True))
+        now = timezone.now()
+        tasks.update(deleted_at=None, updated_at=now)
+        root.deleted_at = None
+
+        through = Task.dependencies.through
+        # Live dependents outside the subtree get their predecessor back
+        reattached = list(
+            through.objects.filter(to_task_id__in=task_ids, from_task__deleted_at__isnull=True)
+            .exclude(from_task_id__in=task_ids).values_list('from_task_id', 'to_task_id')
+        )
+        predecessor_ids = set(
+            through.objects.filter(from_task_id__in=task_ids).exclude(to_task_id__in=task_ids)
+            .values_list('to_task_id', flat=True)
+        )
+        Task.refresh_dependency_counts(set(task_ids) | {task_id for task_id, _ in reattached} | predecessor_ids)
+
+        _log_subtree(root, TaskChange.UPSERT)
+        _log_edges(root.project_id, TaskChange.DEPENDENCY_ADD, reattached)
+        changes = {'subtasks': len(task_ids) - 1} if len(task_ids) > 1 else {}
+        _log_activity(root, TaskActivity.RESTORED, changes, actor)
+
+        publish_on_commit(root.project_id, 'subtree.restored', {
+            'root': root.pk,
+            'ids': task_ids,
+        }, event_id=_latest_change(root.project_id))
+
+    return len(task_ids)
+
+
+def rebuild_paths(project_id=None):
+    """
+    Recompute Task.path / depth from parent_task, one statement per level.
+
+    For paths that bypassed Task.save() (bulk inserts, QuerySet.update of
+    parent_task, data loaded before the column existed).
+
+    Args:
+        project_id: Only rebuild this project's tasks (default: all tasks)
+
+    Returns:
+        int: Tasks left without a path because their parents form a cycle
+    """
+    tasks = Task.all_objects.all() if project_id is None else Task.all_objects.filter(project_id=project_id)
+    parent = Task.all_objects.filter(pk=OuterRef('parent_task_id'))
+
+    with transaction.atomic():
+        tasks.update(path='')
+        tasks.filter(parent_task__isnull=True).update(path='/', depth=0)
+        # Each pass fills in the children of the tasks finished by the previous one;
+        # parents outside the scope already have their path
+        while True:
+            pending = tasks.filter(path='', parent_task__isnull=False).exclude(parent_task__path='')
+            updated = pending.update(
+                path=Subquery(parent.annotate(
+                    child_path=Concat('path', Cast('id', CharField()), Value('/'), output_field=CharField())
+                ).values('child_path')[:1]),
+                depth=Subquery(parent.annotate(child_depth=F('depth') + 1).values('child_depth')[:1]),
+            )
+            if not updated:
+                break
+        return tasks.filter(path='').count()
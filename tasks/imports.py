@@ -0,0 +1,465 @@
+"""
+Bulk task import from Excel.
+
+Imports run in two phases. parse_task_sheet() reads the sheet in openpyxl's
+read-only mode and validates every row without writing anything: assignee
+emails and referenced task ids are collected first and resolved with one
+query each, then each row is checked against those dictionaries.
+create_tasks() inserts the rows that passed with bulk_create, one task
+number reservation and one bulk insert into the dependency table, all in
+one transaction. Like the other bulk paths it skips the model signals, so
+it writes the change log, activity log and live event itself, and queues
+the assignment emails for assigned tasks once the import commits.
+
+Parent Task ID and Dependencies (IDs) may point at tasks in the same sheet,
+so a whole plan loads in one upload: `#5` is the task on sheet row 5 and
+any other non-numeric value is the temporary key of a row (the optional Key
+column after Dependencies). Plain numbers stay existing task ids. Parents
+are inserted one hierarchy level at a time, parents first; rows whose
+parents form a cycle are skipped and dependency cycles within the sheet are
+broken before anything is written.
+"""
+from datetime import date, datetime
+from graphlib import CycleError, TopologicalSorter
+from itertools import groupby
+from django.db import transaction
+from django.db.models import Max
+from openpyxl import load_workbook
+from .events import publish_on_commit
+from .exports import TASK_EXPORT_HEADERS
+from .models import Task, TaskChange, log_tasks_created
+from .notifications import queue_task_notifications
+
+# Exported sheets carry a leading ID column, which is ignored
+TASK_IMPORT_HEADERS = TASK_EXPORT_HEADERS[1:]
+
+# Optional column after the standard ones naming rows for in-sheet references
+KEY_HEADER = 'Key'
+
+INSERT_BATCH_SIZE = 1000
+
+# Ids per IN (...) lookup, well below SQLite's bound parameter limit
+LOOKUP_BATCH_SIZE = 5000
+
+# Rows between progress callbacks
+PROGRESS_EVERY = 1000
+
+_STATUSES = {value.lower(): value for value, _ in Task.STATUS_CHOICES}
+
+_PRIORITIES = {value.lower(): value for value, _ in Task.PRIORITY_CHOICES}
+
+_TITLE_MAX_LENGTH = Task._meta.get_field('title').max_length
+
+
+class RowError(ValueError):
+    pass
+
+
+def read_task_sheet(file, progress=None):
+    """
+    Data rows of a task sheet, read in read-only mode.
+
+    Args:
+        file: Uploaded .xlsx file
+        progress: Optional callback(rows_read, rows_total); the total is the
+            sheet's recorded dimension until the last row has been read
+
+    Returns:
+        list: (row number, values) pairs with values in TASK_IMPORT_HEADERS
+        order followed by the row's key (None without a Key column); rows
+        without a title are left out
+    """
+    wb = load_workbook(file, read_only=True, data_only=True)
+    try:
+        rows = wb.active.iter_rows(values_only=True)
+        headers = next(rows, None) or ()
+        skip = 1 if headers and headers[0] == 'ID' else 0
+        width = len(TASK_IMPORT_HEADERS)
+        has_key = len(headers) > skip + width and headers[skip + width] == KEY_HEADER
+        estimate = max((wb.active.max_row or 1) - 1, 0)
+
+        data = []
+        row_num = 1
+        for row_num, row in enumerate(rows, 2):
+            values = list(row[skip:skip + width + 1])
+            values += [None] * (width + 1 - len(values))
+            if not has_key:
+                values[width] = None
+            if _text(values[0]):
+                data.append((row_num, values))
+            if progress and (row_num - 1) % PROGRESS_EVERY == 0:
+                progress(row_num - 1, max(estimate, row_num - 1))
+        if progress:
+            progress(row_num - 1, row_num - 1)
+        return data
+    finally:
+        wb.close()
+
+
+def _text(value):
+    return str(value).strip() if value is not None else ''
+
+
+def _integer(value, label):
+    if _text(value) == '':
+        return None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise RowError(f"{label} must be a number, got '{value}'")
+    if not number.is_integer():
+        raise RowError(f"{label} must be a whole number, got '{value}'")
+    return int(number)
+
+
+def _date(value, label):
+    if _text(value) == '':
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    try:
+        return datetime.strptime(_text(value), '%Y-%m-%d').date()
+    except ValueError:
+        raise RowError(f"{label} must be a YYYY-MM-DD date, got '{value}'")
+
+
+def _choice(value, choices, label, default):
+    text = _text(value)
+    if not text:
+        return default
+    try:
+        return choices[text.lower()]
+    except KeyError:
+        raise RowError(f"{label} must be one of {', '.join(choices.values())}, got '{text}'")
+
+
+def _reference(value, label):
+    """
+    One task reference from a cell.
+
+    Returns:
+        An existing task id (int), ('row', n) for '#n', ('key', text) for
+        any other text, or None for an empty cell
+    """
+    if isinstance(value, (int, float)):
+        return _integer(value, label)
+    text = _text(value)
+    if not text:
+        return None
+    if text.startswith('#'):
+        if not text[1:].strip().isdigit():
+            raise RowError(f"{label} has an invalid row reference '{text}' (use #<row number>)")
+        return 'row', int(text[1:])
+    if text.isdigit():
+        return int(text)
+    return 'key', text
+
+
+def _references(value, label):
+    """Task references from a comma-separated cell (Excel may also hand back a single number)"""
+    if isinstance(value, (int, float)):
+        return [_reference(value, label)]
+    references = []
+    for part in _text(value).split(','):
+        if part.strip():
+            references.append(_reference(part, label))
+    return references
+
+
+def _key(value):
+    key = _text(value)
+    if not key:
+        return None
+    if key.isdigit() or key.startswith('#') or ',' in key:
+        raise RowError(f"Key '{key}' must not be a plain number, start with # or contain commas")
+    return key
+
+
+def _describe(reference):
+    if isinstance(reference, int):
+        return f"task {reference}"
+    kind, value = reference
+    return f"row {value}" if kind == 'row' else f"key '{value}'"
+
+
+def _in_batches(ids):
+    ids = list(ids)
+    for start in range(0, len(ids), LOOKUP_BATCH_SIZE):
+        yield ids[start:start + LOOKUP_BATCH_SIZE]
+
+
+def _load_users(emails):
+    """{email: user id} in one query; the lowest id wins for duplicated emails"""
+    from users.models import CustomUser
+
+    users, duplicates = {}, set()
+    for user_id, email in CustomUser.objects.filter(email__in=emails).order_by('id').values_list('id', 'email'):
+        if email in users:
+            duplicates.add(email)
+        else:
+            users[email] = user_id
+    return users, duplicates
+
+
+def _load_tasks(project_id, task_ids):
+    """{task id: (path, depth)} for the referenced live tasks of the project"""
+    tasks = {}
+    for batch in _in_batches(task_ids):
+        tasks.update(
+            (task_id, (path, depth)) for task_id, path, depth in
+            Task.objects.filter(project_id=project_id, pk__in=batch).values_list('id', 'path', 'depth')
+        )
+    return tasks
+
+
+def _parse_row(values):
+    """Field values of one row, before references are resolved"""
+    (title, description, status, priority, start_date, due_date, duration, progress,
+     parent, assignee, dependencies, key) = values
+
+    title = _text(title)
+    if len(title) > _TITLE_MAX_LENGTH:
+        raise RowError(f"Title is longer than {_TITLE_MAX_LENGTH} characters")
+    duration = _integer(duration, 'Duration (days)')
+    if duration is not None and duration < 1:
+        raise RowError(f"Duration (days) must be at least 1, got {duration}")
+    progress = _integer(progress, 'Progress (%)')
+    if progress is not None and not 0 <= progress <= 100:
+        raise RowError(f"Progress (%) must be between 0 and 100, got {progress}")
+    start_date, due_date = _date(start_date, 'Start Date'), _date(due_date, 'Due Date')
+    if start_date and due_date and due_date < start_date:
+        raise RowError("Due Date is before Start Date")
+
+    fields = {
+        'title': title,
+        'description': _text(description),
+        'status': _choice(status, _STATUSES, 'Status', 'To Do'),
+        'priority': _choice(priority, _PRIORITIES, 'Priority', 'Medium'),
+        'start_date': start_date,
+        'due_date': due_date,
+        'duration': duration or 1,
+        'progress': progress or 0,
+    }
+    return (fields, _reference(parent, 'Parent Task ID'), _text(assignee),
+            _references(dependencies, 'Dependencies (IDs)'), _key(key))
+
+
+def parse_task_sheet(file, project_id, progress=None):
+    """
+    Phase one: read and validate a task sheet without writing anything.
+
+    Rows with invalid values, a missing parent or parents forming a cycle
+    are skipped, and so are their subtasks. Unknown assignees and
+    dependencies, and the in-sheet dependencies that would close a cycle,
+    are reported and the task is imported without them.
+
+    Args:
+        file: Uploaded .xlsx file
+        project_id: Project the tasks are imported into
+        progress: Optional callback(rows_read, rows_total) while reading
+
+    Returns:
+        tuple: (rows, errors) - rows are dicts with 'row' (sheet row number),
+        'level' (number of ancestors in the sheet), 'fields' (Task field
+        values), 'parent_row', 'dependency_ids' (existing tasks) and
+        'dependency_rows', ordered parents first; errors are "Row N: ..."
+        messages
+    """
+    errors = []
+    parsed, keys, failed = {}, {}, set()
+    for row_num, values in read_task_sheet(file, progress):
+        try:
+            fields, parent, email, dependencies, key = _parse_row(values)
+            if key in keys:
+                raise RowError(f"Key '{key}' is already used by row {keys[key]}")
+        except RowError as e:
+            errors.append((row_num, str(e)))
+            failed.add(row_num)
+            # Keep the key so references to this row say why they fail
+            key = _text(values[-1])
+            if key and key not in keys:
+                keys[key] = row_num
+            continue
+        if key:
+            keys[key] = row_num
+        parsed[row_num] = {'fields': fields, 'parent': parent, 'email': email, 'dependencies': dependencies}
+
+    users, duplicates = _load_users({row['email'] for row in parsed.values() if row['email']})
+    tasks = _load_tasks(project_id, {
+        reference for row in parsed.values() for reference in (row['parent'], *row['dependencies'])
+        if isinstance(reference, int)
+    })
+
+    def resolve(row_num, reference, label):
+        """Existing task id, or ('row', n) for a task in the sheet"""
+        if isinstance(reference, int):
+            if reference not in tasks:
+                raise RowError(f"{label} task {reference} not found in this project")
+            return reference
+        kind, value = reference
+        target = value if kind == 'row' else keys.get(value)
+        if target == row_num:
+            raise RowError(f"{label} {_describe(reference)} is the task itself")
+        if target in parsed:
+            return 'row', target
+        if target in failed:
+            raise RowError(f"{label} {_describe(reference)} was not imported")
+        raise RowError(f"{label} {_describe(reference)} not found in the sheet")
+
+    rows = {}
+    for row_num, row in parsed.items():
+        fields = row['fields']
+        try:
+            parent = resolve(row_num, row['parent'], 'Parent') if row['parent'] is not None else None
+        except RowError as e:
+            errors.append((row_num, str(e)))
+            failed.add(row_num)
+            continue
+        parent_row = None
+        if parent is None:
+            fields.update(parent_task_id=None, path='/', depth=0)
+        elif isinstance(parent, int):
+            parent_path, parent_depth = tasks[parent]
+            fields.update(parent_task_id=parent, path=f"{parent_path}{parent}/", depth=parent_depth + 1)
+        else:
+            parent_row = parent[1]
+
+        email = row['email']
+        fields['assignee_id'] = users.get(email) if email else None
+        if email and email not in users:
+            errors.append((row_num, f"User with email '{email}' not found"))
+        elif email in duplicates:
+            errors.append((row_num, f"Warning - Multiple users found with email '{email}', using first match"))
+
+        rows[row_num] = {'row': row_num, 'fields': fields, 'parent_row': parent_row,
+                         'dependencies': row['dependencies'], 'dependency_ids': [], 'dependency_rows': []}
+
+    # Parents go in before their subtasks; a parent cycle can never be inserted
+    parents = {row_num: {row['parent_row']} if row['parent_row'] else set() for row_num, row in rows.items()}
+    while True:
+        try:
+            order = list(TopologicalSorter(parents).static_order())
+            break
+        except CycleError as e:
+            cycle = e.args[1]
+            for row_num in cycle[:-1]:
+                errors.append((row_num, f"Parent rows form a cycle ({' → '.join(map(str, cycle))})"))
+                failed.add(row_num)
+                del rows[row_num], parents[row_num]
+    for row_num in order:
+        row = rows.get(row_num)
+        if row is None or row['parent_row'] is None:
+            if row is not None:
+                row['level'] = 0
+            continue
+        if row['parent_row'] not in rows:
+            errors.append((row_num, f"Parent row {row['parent_row']} was not imported"))
+            failed.add(row_num)
+            del rows[row_num]
+            continue
+        row['level'] = rows[row['parent_row']]['level'] + 1
+
+    for row_num, row in rows.items():
+        for reference in row.pop('dependencies'):
+            try:
+                dependency = resolve(row_num, reference, 'Dependency')
+            except RowError as e:
+                errors.append((row_num, str(e)))
+                continue
+            if isinstance(dependency, int):
+                target = row['dependency_ids']
+            elif dependency[1] in rows:
+                dependency, target = dependency[1], row['dependency_rows']
+            else:
+                errors.append((row_num, f"Dependency row {dependency[1]} was not imported"))
+                continue
+            if dependency not in target:
+                target.append(dependency)
+
+    # Existing tasks cannot depend on new ones, so cycles can only run through the sheet;
+    # drop the edge declared furthest down each cycle until none is left
+    dependencies = {row_num: set(row['dependency_rows']) for row_num, row in rows.items()}
+    while True:
+        try:
+            list(TopologicalSorter(dependencies).static_order())
+            break
+        except CycleError as e:
+            cycle = e.args[1]
+            # Each row in the cycle is a dependency of the next one
+            predecessor, dependent = max(zip(cycle, cycle[1:]), key=lambda edge: edge[1])
+            dependencies[dependent].discard(predecessor)
+            rows[dependent]['dependency_rows'].remove(predecessor)
+            errors.append((
+                dependent,
+                f"Circular dependency ({' → '.join(map(str, cycle))}), dependency on row {predecessor} dropped"
+            ))
+
+    rows = sorted(rows.values(), key=lambda row: (row['level'], row['row']))
+    return rows, [f"Row {row_num}: {message}" for row_num, message in sorted(errors, key=lambda error: error[0])]
+
+
+def create_tasks(project, rows, actor=None, progress=None):
+    """
+    Phase two: insert parsed rows in one transaction.
+
+    Args:
+        project: Project the tasks are imported into
+        rows: Rows from parse_task_sheet()
+        actor: User running the import
+        progress: Optional callback(rows_inserted, rows_total); an exception
+            raised from it rolls the whole import back
+
+    Returns:
+        list: The created tasks, in sheet order
+    """
+    if not rows:
+        return []
+    actor_id = getattr(actor, 'id', None)
+
+    with transaction.atomic():
+        numbers = iter(Task.reserve_task_numbers(project, len(rows)))
+        created = {}
+        # One insert per level so subtasks can point at their parent's new id and path
+        for level, level_rows in groupby(rows, key=lambda row: row['level']):
+            level_rows = list(level_rows)
+            tasks = []
+            for row in level_rows:
+                task = Task(project=project, task_number=next(numbers), created_by_id=actor_id, **row['fields'])
+                if row['parent_row'] is not None:
+                    parent = created[row['parent_row']]
+                    task.parent_task_id, task.path, task.depth = parent.pk, parent.descendant_prefix, parent.depth + 1
+                task.apply_defaults()
+                tasks.append(task)
+            for start in range(0, len(tasks), INSERT_BATCH_SIZE):
+                Task.objects.bulk_create(tasks[start:start + INSERT_BATCH_SIZE])
+                if progress:
+                    progress(len(created) + min(start + INSERT_BATCH_SIZE, len(tasks)), len(rows))
+            created.update(zip((row['row'] for row in level_rows), tasks))
+
+        through = Task.dependencies.through
+        edges = []
+        for row in rows:
+            task_id = created[row['row']].pk
+            edges.extend((task_id, dependency_id) for dependency_id in row['dependency_ids'])
+            edges.extend((task_id, created[row_num].pk) for row_num in row['dependency_rows'])
+        through.objects.bulk_create(
+            [through(from_task_id=task_id, to_task_id=dependency_id) for task_id, dependency_id in edges],
+            batch_size=INSERT_BATCH_SIZE
+        )
+
+        tasks = [created[row_num] for row_num in sorted(created)]
+        for batch in _in_batches([task.pk for task in tasks]):
+            log_tasks_created(Task.objects.filter(pk__in=batch), actor_id=actor_id)
+        for batch in _in_batches({task_id for edge in edges for task_id in edge}):
+            Task.refresh_dependency_counts(batch)
+        for task in tasks:
+            if task.assignee_id:
+                queue_task_notifications(task.pk, {}, actor_id=actor_id, created=True)
+
+        publish_on_commit(project.pk, 'tasks.created', {
+            'ids': [task.pk for task in tasks],
+        }, event_id=TaskChange.objects.filter(project_id=project.pk).aggregate(latest=Max('id'))['latest'])
+
+    return tasks
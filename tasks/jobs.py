@@ -0,0 +1,258 @@
+"""
+Background Excel imports.
+
+    POST   /api/tasks/import_excel/                       queue a task import (file, project_id)
+    POST   /api/users/manage/import-excel/                queue a user import (file)
+    GET    /api/tasks/import_jobs/<job_id>/               progress and, once finished, the result
+    POST   /api/tasks/import_jobs/<job_id>/cancel/        stop the job
+    (users/manage/import-jobs/<job_id>/[cancel/] for user imports)
+
+The upload is saved with an ImportJob row and handed to a small thread pool
+once the request commits, so the web worker answers right away with 202.
+The pool's work queue lives in this process; jobs still queued when it
+exits are picked up by `manage.py run_import_jobs`.
+
+Workers write rows_parsed / rows_inserted / errors to the job as they go,
+at most every PROGRESS_INTERVAL seconds. Task imports insert in a single
+transaction, so their insert counter only reaches the database at commit;
+polls served by the worker's own process see it live. A cancel is noticed
+at the next progress update: task imports roll back completely, user
+imports keep the users created so far.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import connection, transaction
+from django.urls import reverse
+from django.utils import timezone
+from .models import ImportJob
+
+IMPORT_WORKERS = getattr(settings, 'TASK_IMPORT_WORKERS', 2)
+
+# Seconds between progress writes / cancellation checks
+PROGRESS_INTERVAL = 0.5
+
+# Row errors kept on the job (error_count has the total)
+MAX_STORED_ERRORS = 500
+
+_executor = ThreadPoolExecutor(max_workers=IMPORT_WORKERS, thread_name_prefix='import-jobs')
+
+# Jobs running in this process: job id -> _Progress
+_running = {}
+
+
+class ImportCancelled(Exception):
+    pass
+
+
+class _Progress:
+    """Progress callbacks for one running job: throttled counter writes and cancellation checks"""
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self.counters = {}
+        self.cancelled = threading.Event()
+        self._last_check = 0
+
+    def update(self, force=False, **counters):
+        self.counters.update(counters)
+        now = time.monotonic()
+        if not force and now - self._last_check < PROGRESS_INTERVAL:
+            return
+        self._last_check = now
+        if self.cancelled.is_set() or ImportJob.objects.filter(pk=self.job_id, cancel_requested=True).exists():
+            raise ImportCancelled()
+        # Inside the import's transaction the write would only show up at commit
+        if not connection.in_atomic_block:
+            ImportJob.objects.filter(pk=self.job_id).update(updated_at=timezone.now(), **self.counters)
+
+    def reading(self, done, total):
+        self.update(rows_parsed=done, rows_total=total)
+
+    def inserting(self, done, total):
+        self.update(rows_inserted=done)
+
+
+def queue_import(kind, file, user, project=None):
+    """
+    Save an uploaded sheet as a queued ImportJob and start it once the request commits.
+
+    Returns:
+        ImportJob: The new job
+    """
+    job = ImportJob.objects.create(
+        kind=kind, project=project, created_by=user, file=file, file_name=file.name
+    )
+    transaction.on_commit(lambda: _executor.submit(run_import, job.pk))
+    return job
+
+
+def cancel_import(job):
+    """Ask a job to stop; queued jobs are cancelled right away"""
+    local = _running.get(job.pk)
+    if local is not None:
+        # Set first: on SQLite the update below waits for a running import's transaction
+        local.cancelled.set()
+    ImportJob.objects.filter(pk=job.pk, status=ImportJob.QUEUED).update(
+        status=ImportJob.CANCELLED, cancel_requested=True, finished_at=timezone.now(), updated_at=timezone.now()
+    )
+    ImportJob.objects.filter(pk=job.pk, status=ImportJob.RUNNING).update(cancel_requested=True)
+    job.refresh_from_db()
+    return job
+
+
+def _run_tasks_import(job, progress):
+    from .imports import parse_task_sheet, create_tasks
+
+    with job.file.open('rb') as file:
+        rows, errors = parse_task_sheet(file, job.project_id, progress=progress.reading)
+    progress.update(force=True, rows_total=progress.counters.get('rows_parsed', 0),
+                    error_count=len(errors), errors=errors[:MAX_STORED_ERRORS])
+    created = create_tasks(job.project, rows, actor=job.created_by, progress=progress.inserting)
+    return {
+        'created_count': len(created),
+        'created_task_ids': [task.id for task in created],
+        'errors': errors,
+    }
+
+
+def _run_users_import(job, progress):
+    from users.imports import import_users
+
+    with job.file.open('rb') as file:
+        result = import_users(file, progress=progress.reading)
+    progress.counters['rows_inserted'] = result['created_count']
+    return result
+
+
+def run_import(job_id):
+    """
+    Run a queued job to the end (worker entry point).
+
+    Returns:
+        ImportJob: The finished job, or None if it was no longer queued
+    """
+    now = timezone.now()
+    # Claim the job; a cancel or another worker may have got there first
+    if not ImportJob.objects.filter(pk=job_id, status=ImportJob.QUEUED).update(
+        status=ImportJob.RUNNING, started_at=now, updated_at=now
+    ):
+        return None
+
+    progress = _Progress(job_id)
+    _running[job_id] = progress
+    job = ImportJob.objects.select_related('project', 'created_by').get(pk=job_id)
+    fields = {}
+    try:
+        runner = _run_tasks_import if job.kind == ImportJob.TASKS else _run_users_import
+        result = runner(job, progress)
+        errors = result.pop('errors')
+        fields = {
+            'status': ImportJob.SUCCEEDED, 'result': result,
+            'error_count': len(errors), 'errors': errors[:MAX_STORED_ERRORS],
+        }
+    except ImportCancelled:
+        fields = {'status': ImportJob.CANCELLED}
+    except Exception as e:
+        print(f"❌ Import job {job_id} failed: {str(e)}")
+        fields = {'status': ImportJob.FAILED, 'message': str(e)}
+    finally:
+        _running.pop(job_id, None)
+        if job.kind == ImportJob.TASKS and fields.get('status') != ImportJob.SUCCEEDED:
+            # Task inserts are all or nothing (users created before a stop stay)
+            fields['rows_inserted'] = 0
+        try:
+            job = ImportJob.objects.get(pk=job_id)
+            if job.file:
+                job.file.delete(save=False)
+            ImportJob.objects.filter(pk=job_id).update(
+                **{**progress.counters, **fields}, file='', finished_at=timezone.now(), updated_at=timezone.now()
+            )
+            job.refresh_from_db()
+        finally:
+            # Worker threads get their own connection; don't leak it
+            connection.close()
+    return job
+
+
+def import_job_data(job, request=None):
+    """API representation of a job; counters of a job running in this process are live"""
+    counters = {
+        'rows_total': job.rows_total,
+        'rows_parsed': job.rows_parsed,
+        'rows_inserted': job.rows_inserted,
+        'error_count': job.error_count,
+    }
+    local = _running.get(job.pk)
+    if local is not None and not job.is_finished:
+        counters.update((key, value) for key, value in local.counters.items() if key in counters)
+
+    basename = 'task' if job.kind == ImportJob.TASKS else 'user-management'
+    urls = {
+        name: reverse(f'{basename}-{route}', kwargs={'job_id': job.pk})
+        for name, route in (('status_url', 'import-job'), ('cancel_url', 'cancel-import-job'))
+    }
+    if request is not None:
+        urls = {name: request.build_absolute_uri(url) for name, url in urls.items()}
+    return {
+        'job_id': str(job.pk),
+        'kind': job.kind,
+        'status': job.status,
+        'file_name': job.file_name,
+        'project_id': job.project_id,
+        **counters,
+        'errors': job.errors,
+        'result': job.result if job.status == ImportJob.SUCCEEDED else None,
+        'message': job.message,
+        'cancel_requested': job.cancel_requested,
+        'created_at': job.created_at,
+        'started_at': job.started_at,
+        'finished_at': job.finished_at,
+        **urls,
+    }
+
+
+def run_queued_imports(progress=None):
+    """
+    Run every queued job in the foreground (jobs left behind by a restarted process).
+
+    Returns:
+        int: Number of jobs run
+    """
+    job_ids = list(ImportJob.objects.filter(status=ImportJob.QUEUED).order_by('created_at').values_list('pk', flat=True))
+    for done, job_id in enumerate(job_ids, 1):
+        run_import(job_id)
+        if progress:
+            progress(done, len(job_ids))
+    return len(job_ids)
+
+
+def fail_stale_imports(max_age):
+    """
+    Mark running jobs that stopped reporting progress as failed (their worker died).
+
+    Args:
+        max_age: timedelta since the last progress update
+
+    Returns:
+        int: Number of jobs marked failed
+    """
+    stale = ImportJob.objects.filter(status=ImportJob.RUNNING, updated_at__lt=timezone.now() - max_age)
+    stale = stale.exclude(pk__in=list(_running))
+    for job in stale.exclude(file=''):
+        job.file.delete(save=False)
+    return stale.update(
+        status=ImportJob.FAILED, message='The import stopped without finishing', file='',
+        finished_at=timezone.now(), updated_at=timezone.now()
+    )
+
+
+def get_import_job(kind, job_id, user):
+    """A job of this kind started by the user, or None (also for malformed ids)"""
+    from django.core.exceptions import ValidationError
+
+    try:
+        return ImportJob.objects.filter(kind=kind, created_by=user, pk=job_id).first()
+    except ValidationError:
+        return None
@@ -0,0 +1,48 @@
+"""
+Move cold tasks out of the live task table into the archive.
+
+Archives every task of Completed / Archived projects plus tasks that have
+been soft-deleted for longer than --deleted-days, in batches of --batch-size
+tasks per transaction. Meant to run from cron; --restore-project brings a
+reopened project's tasks back.
+"""
+
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from tasks.archive import DEFAULT_BATCH_SIZE, archivable_tasks, archive_tasks, restore_archived
+from tasks.models import ArchivedTask
+
+
+class Command(BaseCommand):
+    help = 'Archive tasks of completed / archived projects and long-deleted tasks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--project-id', type=int, action='append', help='Only archive this project (repeatable)')
+        parser.add_argument('--deleted-days', type=int, default=30,
+                            help='Archive tasks soft-deleted more than this many days ago (0 to skip)')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='Tasks per transaction')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the tasks that would be archived')
+        parser.add_argument('--restore-project', type=int, help='Move this project\'s archived tasks back instead')
+
+    def handle(self, *args, **options):
+        restore_project = options.get('restore_project')
+        if restore_project:
+            restored = restore_archived(ArchivedTask.objects.filter(project_id=restore_project),
+                                        batch_size=options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f"✓ Restored {restored} tasks of project {restore_project}"))
+            return
+
+        deleted_days = options['deleted_days']
+        deleted_before = timezone.now() - timedelta(days=deleted_days) if deleted_days > 0 else None
+        tasks = archivable_tasks(options.get('project_id'), deleted_before)
+
+        if options['dry_run']:
+            self.stdout.write(f"{tasks.count()} tasks would be archived")
+            return
+
+        def progress(archived, total):
+            self.stdout.write(f"  {archived}/{total} tasks archived")
+
+        archived = archive_tasks(tasks, batch_size=options['batch_size'], progress=progress)
+        self.stdout.write(self.style.SUCCESS(f"✓ Archived {archived} tasks"))
@@ -0,0 +1,33 @@
+"""
+Render the preview thumbnails of image and PDF documents that do not have
+one yet: blobs stored before thumbnails existed, adopted by
+task_document_storage --dedupe, or dropped because the background queue
+was full. Uses the same bounded process pool as the upload path.
+"""
+
+from django.core.management.base import BaseCommand
+from tasks.models import DocumentBlob
+from tasks.thumbnails import generate_thumbnails
+
+
+class Command(BaseCommand):
+    help = 'Generate missing document thumbnails'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retry-failed', action='store_true', help='Also retry blobs whose rendering failed')
+
+    def handle(self, *args, **options):
+        statuses = [DocumentBlob.THUMBNAIL_PENDING]
+        if options['retry_failed']:
+            statuses.append(DocumentBlob.THUMBNAIL_FAILED)
+        blobs = DocumentBlob.objects.filter(thumbnail_status__in=statuses).order_by('pk')
+
+        def progress(done, total):
+            self.stdout.write(f"  {done}/{total} blobs")
+
+        processed = generate_thumbnails(blobs, progress)
+        ready = DocumentBlob.objects.filter(thumbnail_status=DocumentBlob.THUMBNAIL_READY).count()
+        failed = DocumentBlob.objects.filter(thumbnail_status=DocumentBlob.THUMBNAIL_FAILED).count()
+        self.stdout.write(self.style.SUCCESS(f"✓ Processed {processed} blobs ({ready} with thumbnails)"))
+        if failed:
+            self.stdout.write(self.style.WARNING(f"⚠ {failed} blobs failed to render (retry with --retry-failed)"))
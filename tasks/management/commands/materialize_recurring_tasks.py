@@ -0,0 +1,27 @@
+"""
+Create the upcoming tasks of every active recurring task template.
+
+Meant to run daily from cron; each run only adds occurrences past what the
+previous run created, so the horizon can be raised at any time (e.g. --days
+365 to lay out a year).
+"""
+
+from django.core.management.base import BaseCommand
+from tasks.models import RecurringTaskTemplate
+from tasks.recurrence import DEFAULT_HORIZON_DAYS, materialize_occurrences
+
+
+class Command(BaseCommand):
+    help = 'Materialize upcoming occurrences of recurring task templates'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=DEFAULT_HORIZON_DAYS, help='How many days ahead to create tasks')
+        parser.add_argument('--project-id', type=int, help='Only this project\'s templates')
+
+    def handle(self, *args, **options):
+        templates = RecurringTaskTemplate.objects.filter(is_active=True)
+        if options.get('project_id'):
+            templates = templates.filter(project_id=options['project_id'])
+
+        created = materialize_occurrences(templates, horizon_days=options['days'])
+        self.stdout.write(self.style.SUCCESS(f"✓ Created {created} recurring task occurrences"))
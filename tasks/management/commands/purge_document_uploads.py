@@ -0,0 +1,19 @@
+"""
+Discard chunked document uploads that were abandoned part way, along with
+their staging files. Meant to run from cron.
+"""
+
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from tasks.uploads import purge_stale_uploads
+
+
+class Command(BaseCommand):
+    help = 'Delete chunked document uploads with no activity for a while'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=24, help='Idle time after which an upload is abandoned')
+
+    def handle(self, *args, **options):
+        purged = purge_stale_uploads(timedelta(hours=options['hours']))
+        self.stdout.write(self.style.SUCCESS(f"✓ Discarded {purged} abandoned uploads"))
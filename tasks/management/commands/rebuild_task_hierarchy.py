@@ -0,0 +1,25 @@
+"""
+Recompute the materialized task paths (Task.path / Task.depth) from parent_task
+and the denormalized dependency counts from the dependency table.
+Run after loading data that bypassed Task.save() and the m2m signals.
+"""
+
+from django.core.management.base import BaseCommand
+from tasks.hierarchy import rebuild_paths
+from tasks.models import Task
+
+
+class Command(BaseCommand):
+    help = 'Rebuild materialized task hierarchy paths and dependency counts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--project-id', type=int, help='Only rebuild this project')
+
+    def handle(self, *args, **options):
+        project_id = options.get('project_id')
+        broken = rebuild_paths(project_id)
+        tasks = Task.all_objects.filter(project_id=project_id) if project_id else Task.all_objects.all()
+        Task.refresh_dependency_counts(tasks.values('id'))
+        if broken:
+            self.stdout.write(self.style.WARNING(f"⚠ {broken} tasks are in a parent_task cycle and have no path"))
+        self.stdout.write(self.style.SUCCESS("✓ Task hierarchy paths and dependency counts rebuilt"))
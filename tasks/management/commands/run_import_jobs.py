@@ -0,0 +1,24 @@
+"""
+Finish Excel import jobs left behind when the process that queued them
+stopped: running jobs that went quiet are marked failed, queued ones are
+run here in the foreground. Meant to run from cron or after a deploy.
+"""
+
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from tasks.jobs import fail_stale_imports, run_queued_imports
+
+
+class Command(BaseCommand):
+    help = 'Run queued Excel import jobs and fail the ones whose worker died'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stale-minutes', type=int, default=30,
+                            help='Minutes without progress after which a running import is failed')
+
+    def handle(self, *args, **options):
+        failed = fail_stale_imports(timedelta(minutes=options['stale_minutes']))
+        if failed:
+            self.stdout.write(self.style.WARNING(f"Marked {failed} stalled imports as failed"))
+        ran = run_queued_imports()
+        self.stdout.write(self.style.SUCCESS(f"✓ Ran {ran} queued imports"))
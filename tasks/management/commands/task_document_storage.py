@@ -0,0 +1,50 @@
+"""
+Report how much storage document deduplication saves and move documents
+uploaded before it onto content-addressed blobs.
+
+    python manage.py task_document_storage             # report only
+    python manage.py task_document_storage --dedupe    # adopt old documents, then report
+    python manage.py task_document_storage --recount   # repair blob reference counts
+"""
+
+from django.core.management.base import BaseCommand
+from tasks.blobs import adopt_legacy_documents, recount_references, storage_report
+
+
+def _size(value):
+    for unit in ['B', 'KB', 'MB', 'GB']:
+        if abs(value) < 1024.0:
+            return f"{value:.1f} {unit}"
+        value /= 1024.0
+    return f"{value:.1f} TB"
+
+
+class Command(BaseCommand):
+    help = 'Report deduplicated document storage and migrate old documents to blobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dedupe', action='store_true', help='Hash documents without a blob and share identical files')
+        parser.add_argument('--recount', action='store_true', help='Recompute blob reference counts')
+
+    def handle(self, *args, **options):
+        if options['dedupe']:
+            def progress(done, total):
+                if done % 500 == 0 or done == total:
+                    self.stdout.write(f"  {done}/{total} documents hashed")
+
+            adopted, deleted, freed = adopt_legacy_documents(progress)
+            self.stdout.write(self.style.SUCCESS(
+                f"✓ Moved {adopted} documents onto blobs, deleted {deleted} duplicate files ({_size(freed)})"
+            ))
+        if options['recount']:
+            blobs = recount_references()
+            self.stdout.write(self.style.SUCCESS(f"✓ Recounted references of {blobs} blobs"))
+
+        report = storage_report()
+        saved = report['saved_bytes']
+        ratio = saved / report['logical_bytes'] * 100 if report['logical_bytes'] else 0
+        self.stdout.write(f"Documents:       {report['documents']}")
+        self.stdout.write(f"Blobs:           {report['blobs']} (+ {report['legacy_files']} files not yet deduplicated)")
+        self.stdout.write(f"Logical size:    {_size(report['logical_bytes'])}")
+        self.stdout.write(f"Stored size:     {_size(report['stored_bytes'])}")
+        self.stdout.write(self.style.SUCCESS(f"✓ Saved {_size(saved)} ({ratio:.1f}%)"))
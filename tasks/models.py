@@ -1,7 +1,16 @@
-from django.db import models
+from django.db import connection, models
+from django.utils import timezone
 from users.models import CustomUser
 from datetime import datetime, timedelta
 import os
+import uuid
+
+
+class LiveTaskManager(models.Manager):
+    """Default manager: hides soft-deleted tasks (Task.all_objects sees every row)"""
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
 
 class Task(models.Model):
     STATUS_CHOICES = (
@@ -26,9 +35,15 @@ class Task(models.Model):
     progress = models.IntegerField(default=0, help_text="Progress percentage (0-100)")
     project = models.ForeignKey('project.Project', on_delete=models.CASCADE, related_name='tasks', null=True, blank=True)
     parent_task = models.ForeignKey('self', on_delete=models.CASCADE, blank=True, null=True, related_name='subtasks')
+    # Materialized ancestry: ids of all ancestors, e.g. "/12/40/" for a task under 40 under 12 ("/" for main tasks)
+    path = models.CharField(max_length=500, default='/', db_index=True, editable=False)
+    depth = models.PositiveIntegerField(default=0, editable=False, help_text="Number of ancestors (0 for main tasks)")
     assignee = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, blank=True, null=True, related_name='tasks')
     created_by = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, blank=True, null=True, related_name='created_tasks')
     dependencies = models.ManyToManyField('self', symmetrical=False, blank=True, related_name='dependents')
+    # Denormalized sizes of dependencies / dependents (see refresh_dependency_counts)
+    predecessor_count = models.PositiveIntegerField(default=0, editable=False)
+    successor_count = models.PositiveIntegerField(default=0, editable=False)
     
     # Critical Path Method (CPM) fields
     early_start_day = models.IntegerField(default=0, help_text="Early start day from project start")
@@ -40,52 +55,61 @@ class Task(models.Model):
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Occurrence of a recurring template (see tasks/recurrence.py)
+    recurring_template = models.ForeignKey('RecurringTaskTemplate', on_delete=models.SET_NULL, blank=True, null=True, related_name='occurrences')
+    occurrence_date = models.DateField(blank=True, null=True)
+    # Soft delete: set for a task and its subtasks together (see hierarchy.soft_delete_subtree)
+    deleted_at = models.DateTimeField(blank=True, null=True, db_index=True, editable=False)
+
+    objects = LiveTaskManager()
+    all_objects = models.Manager()
 
     def save(self, *args, **kwargs):
         # Generate task_number if not exists
-        if not self.task_number and self.project:
-            # Get project key
-            project_key = self.project.key if self.project.key else 'TASK'
-            
-            # Get the highest task number for this project
-            last_task = Task.objects.filter(
-                project=self.project,
-                task_number__startswith=f"{project_key}-"
-            ).order_by('-task_number').first()
-            
-            if last_task and last_task.task_number:
-                # Extract number from last task (e.g., "PROJ-0005" -> 5)
-                try:
-                    last_number = int(last_task.task_number.split('-')[-1])
-                    next_number = last_number + 1
-                except (ValueError, IndexError):
-                    next_number = 1
-            else:
-                next_number = 1
-            
-            # Generate task number with zero-padding (min 4 digits)
-            self.task_number = f"{project_key}-{next_number:04d}"
-        elif not self.task_number and not self.project:
-            # For tasks without project, use TASK prefix
-            last_task = Task.objects.filter(
-                project__isnull=True,
-                task_number__startswith="TASK-"
-            ).order_by('-task_number').first()
-            
-            if last_task and last_task.task_number:
-                try:
-                    last_number = int(last_task.task_number.split('-')[-1])
-                    next_number = last_number + 1
-                except (ValueError, IndexError):
-                    next_number = 1
-            else:
-                next_number = 1
-            
-            self.task_number = f"TASK-{next_number:04d}"
+        if not self.task_number:
+            self.task_number = Task.reserve_task_numbers(self.project, 1)[0]
+        
+        # Keep the materialized path in step with parent_task
+        old_prefix = old_depth = None
+        update_fields = kwargs.get('update_fields')
+        parent_changed = self.parent_task_id != getattr(self, '_loaded_parent_id', None)
+        if not self.pk or (parent_changed and (update_fields is None or 'parent_task' in update_fields
+                                               or 'parent_task_id' in update_fields)):
+            if self.pk:
+                old_prefix, old_depth = self.descendant_prefix, self.depth
+            self._set_path()
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | {'path', 'depth'}
         
         # Check if we should skip progress auto-calculation
         skip_progress_auto = kwargs.pop('skip_progress_auto', False)
+        self.apply_defaults(skip_progress_auto=skip_progress_auto)
+            
+        super().save(*args, **kwargs)
+        self._loaded_parent_id = self.parent_task_id
         
+        if old_prefix and old_prefix != self.descendant_prefix:
+            Task.rewrite_paths(old_prefix, self.descendant_prefix, self.depth - old_depth)
+            self._log_moved_descendants()
+
+    def _log_moved_descendants(self):
+        """Change-log rows and a live event for the subtasks a reparent rewrote (post_save only logs this task)"""
+        from .events import publish_on_commit
+        
+        moved = Task.objects.filter(Task.descendants_filter(self.descendant_prefix)).values_list('id', 'project_id')
+        changes = TaskChange.objects.bulk_create([
+            TaskChange(project_id=project_id, task_id=task_id, action=TaskChange.UPSERT)
+            for task_id, project_id in moved
+        ])
+        if changes:
+            publish_on_commit(self.project_id, 'subtree.moved', {
+                'root': self.pk,
+                'parent_task': self.parent_task_id,
+                'ids': [self.pk, *(change.task_id for change in changes)],
+            }, event_id=changes[-1].pk)
+
+    def apply_defaults(self, skip_progress_auto=False):
+        """Fill in missing dates from the duration and progress from the status (also for bulk inserts)"""
         # Auto-set start_date if not provided
         if not self.start_date and self.due_date:
             self.start_date = self.due_date - timedelta(days=self.duration - 1)
@@ -104,8 +128,156 @@ class Task(models.Model):
             # Only set progress to 0 for new 'To Do' tasks, not when updating
             elif self.status == 'To Do' and not self.pk:  # Only for new instances
                 self.progress = 0
-            
-        super().save(*args, **kwargs)
+
+    def _set_path(self):
+        parent = None
+        if self.parent_task_id:
+            parent = Task.all_objects.filter(pk=self.parent_task_id).values_list('id', 'path', 'depth').first()
+        if parent is None:
+            self.path, self.depth = '/', 0
+        else:
+            parent_id, parent_path, parent_depth = parent
+            if self.pk and f"/{self.pk}/" in f"{parent_path}{parent_id}/":
+                raise ValueError('A task cannot be moved under its own subtask')
+            self.path, self.depth = f"{parent_path}{parent_id}/", parent_depth + 1
+
+    @property
+    def descendant_prefix(self):
+        """Path prefix shared by every descendant of this task"""
+        return f"{self.path}{self.pk}/"
+
+    @property
+    def ancestor_ids(self):
+        """Ancestor ids from the root down to the parent"""
+        return [int(part) for part in self.path.strip('/').split('/') if part]
+
+    @property
+    def root_id(self):
+        ancestors = self.ancestor_ids
+        return ancestors[0] if ancestors else self.pk
+
+    @staticmethod
+    def descendants_filter(prefix):
+        """
+        Q object matching the tasks whose path starts with prefix.
+        
+        SQLite cannot use an index for Django's LIKE ... ESCAPE lookups, so a
+        range over the prefix is used there ('0' sorts right after '/');
+        PostgreSQL gets a varchar_pattern_ops index for startswith.
+        """
+        if connection.vendor == 'postgresql':
+            return models.Q(path__startswith=prefix)
+        return models.Q(path__gte=prefix, path__lt=prefix[:-1] + '0')
+
+    def get_descendants(self):
+        """All subtasks at any depth, in one indexed query"""
+        return Task.objects.filter(Task.descendants_filter(self.descendant_prefix))
+
+    def get_ancestors(self):
+        return Task.objects.filter(pk__in=self.ancestor_ids).order_by('depth')
+
+    @classmethod
+    def rewrite_paths(cls, old_prefix, new_prefix, depth_delta):
+        """Re-root every path under old_prefix onto new_prefix in one UPDATE"""
+        from django.db.models.functions import Concat, Substr
+        
+        # Soft-deleted descendants move too so a restore finds them in place
+        return cls.all_objects.filter(cls.descendants_filter(old_prefix)).update(
+            path=Concat(models.Value(new_prefix), Substr('path', len(old_prefix) + 1),
+                        output_field=models.CharField()),
+            depth=models.F('depth') + depth_delta,
+            updated_at=timezone.now(),
+        )
+
+    @classmethod
+    def reserve_task_numbers(cls, project, count):
+        """
+        Take the next `count` task numbers for a project (e.g. PROJ-0006, PROJ-0007).
+        
+        The numbers come from the prefix's TaskNumberSequence row, bumped with
+        an UPDATE that locks it until the caller's transaction ends, so
+        concurrent creates and bulk inserts never hand out the same number.
+        
+        Args:
+            project: Project the tasks belong to, or None for TASK- numbers
+            count: How many consecutive numbers to hand out
+        
+        Returns:
+            list: Task number strings
+        """
+        from django.db import transaction
+        from django.db.models import F
+        
+        # Tasks without project use the TASK prefix
+        project_key = (project.key if project else None) or 'TASK'
+        
+        with transaction.atomic():
+            sequence, _ = TaskNumberSequence.objects.get_or_create(
+                prefix=project_key, defaults={'last_number': lambda: cls._highest_task_number(project_key)}
+            )
+            sequences = TaskNumberSequence.objects.filter(pk=sequence.pk)
+            sequences.update(last_number=F('last_number') + count)
+            last_number = sequences.values_list('last_number', flat=True).get()
+        
+        # Generate task numbers with zero-padding (min 4 digits)
+        return [f"{project_key}-{number:04d}" for number in range(last_number - count + 1, last_number + 1)]
+
+    @classmethod
+    def _highest_task_number(cls, project_key):
+        """Highest number in use for a prefix (seeds its TaskNumberSequence)"""
+        from django.db.models.functions import Length
+        
+        # Deleted and archived tasks keep theirs so a restore never collides.
+        # Longer numbers sort first so PROJ-10000 beats PROJ-9999
+        last_numbers = [
+            queryset.filter(task_number__startswith=f"{project_key}-")
+            .order_by(Length('task_number').desc(), '-task_number').values_list('task_number', flat=True).first()
+            for queryset in (cls.all_objects.all(), ArchivedTask.objects.all())
+        ]
+        last_number = max(filter(None, last_numbers), key=lambda number: (len(number), number), default=None)
+        
+        if last_number:
+            # Extract number from last task (e.g., "PROJ-0005" -> 5)
+            try:
+                return int(last_number.split('-')[-1])
+            except (ValueError, IndexError):
+                pass
+        return 0
+
+    @classmethod
+    def refresh_dependency_counts(cls, task_ids=None):
+        """
+        Recompute predecessor_count / successor_count from the dependency table.
+        
+        Args:
+            task_ids: Ids (or an id subquery) of the tasks to refresh; None refreshes every task
+        """
+        from django.db.models import Count, OuterRef, Subquery
+        from django.db.models.functions import Coalesce
+        
+        through = cls.dependencies.through
+        # Edges to soft-deleted tasks stay in the table for a restore but are not counted
+        other_side = {'from_task_id': 'to_task__deleted_at__isnull', 'to_task_id': 'from_task__deleted_at__isnull'}
+        
+        def edge_count(column):
+            return Coalesce(Subquery(
+                through.objects.filter(**{column: OuterRef('pk'), other_side[column]: True}).order_by()
+                .values(column).annotate(total=Count('pk')).values('total')[:1]
+            ), 0)
+        
+        tasks = cls.all_objects.all() if task_ids is None else cls.all_objects.filter(pk__in=task_ids)
+        return tasks.update(
+            predecessor_count=edge_count('from_task_id'),
+            successor_count=edge_count('to_task_id'),
+        )
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the project the row was loaded with so moves can be logged
+        instance._loaded_project_id = instance.__dict__.get('project_id')
+        instance._loaded_parent_id = instance.__dict__.get('parent_task_id')
+        return instance
 
     @property
     def is_subtask(self):
@@ -116,6 +288,17 @@ class Task(models.Model):
             models.Index(fields=['is_critical', 'project']),
             models.Index(fields=['total_float', 'project']),
             models.Index(fields=['early_start_day', 'early_finish_day']),
+            # Server-side list filters (see tasks/filters.py)
+            models.Index(fields=['project', 'status']),
+            models.Index(fields=['project', 'priority']),
+            models.Index(fields=['project', 'due_date']),
+            models.Index(fields=['assignee', 'due_date']),
+            # Gantt timeline windows (see tasks/timeline.py)
+            models.Index(fields=['project', 'start_date', 'due_date']),
+        ]
+        constraints = [
+            # One task per template occurrence; lets materialization skip duplicates
+            models.UniqueConstraint(fields=['recurring_template', 'occurrence_date'], name='unique_task_occurrence'),
         ]
         ordering = ['id']
 
@@ -125,10 +308,92 @@ class Task(models.Model):
         return self.title
 
 
+class TaskNumberSequence(models.Model):
+    """Last task number handed out per prefix (see Task.reserve_task_numbers)"""
+    prefix = models.CharField(max_length=20, unique=True)
+    last_number = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.prefix}-{self.last_number:04d}"
+
+
+class RecurringTaskTemplate(models.Model):
+    """
+    A task that repeats on a schedule within a project.
+
+    The schedule is a small subset of iCalendar RRULE: FREQ (daily, weekly,
+    monthly), INTERVAL, BYDAY for weekly rules and UNTIL. Occurrences are
+    turned into tasks ahead of time by the materialize_recurring_tasks
+    command.
+    """
+    DAILY = 'DAILY'
+    WEEKLY = 'WEEKLY'
+    MONTHLY = 'MONTHLY'
+    FREQUENCY_CHOICES = (
+        (DAILY, 'Daily'),
+        (WEEKLY, 'Weekly'),
+        (MONTHLY, 'Monthly'),
+    )
+
+    project = models.ForeignKey('project.Project', on_delete=models.CASCADE, related_name='recurring_templates')
+    title = models.CharField(max_length=255)
+    description = models.TextField(blank=True, null=True)
+    priority = models.CharField(max_length=20, choices=Task.PRIORITY_CHOICES, default='Medium')
+    duration = models.IntegerField(default=1, help_text="Duration in days of each occurrence")
+    assignee = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, blank=True, null=True, related_name='recurring_tasks')
+    created_by = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, blank=True, null=True, related_name='created_recurring_tasks')
+
+    frequency = models.CharField(max_length=10, choices=FREQUENCY_CHOICES, default=WEEKLY)
+    interval = models.PositiveIntegerField(default=1, help_text="Repeat every N days / weeks / months")
+    weekdays = models.CharField(max_length=20, blank=True, default='', help_text="Weekly rules: e.g. MO,WE,FR (default: start date's weekday)")
+    start_date = models.DateField(help_text="First occurrence; monthly rules repeat on its day of month")
+    until = models.DateField(blank=True, null=True, help_text="Last possible occurrence")
+    is_active = models.BooleanField(default=True)
+    # Occurrences up to this date have been turned into tasks
+    materialized_until = models.DateField(blank=True, null=True, editable=False)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['id']
+
+    def __str__(self):
+        return f"{self.title} ({self.get_frequency_display()})"
+
+
+class DocumentBlob(models.Model):
+    """
+    One stored file, shared by every TaskDocument with the same content
+    (see tasks/blobs.py).
+
+    ref_count counts the documents pointing at the blob, archived ones
+    included; the file is deleted when it drops to zero.
+    """
+    THUMBNAIL_PENDING = ''
+    THUMBNAIL_READY = 'ready'
+    THUMBNAIL_FAILED = 'failed'
+    THUMBNAIL_UNSUPPORTED = 'unsupported'
+
+    sha256 = models.CharField(max_length=64, unique=True)
+    file = models.FileField(upload_to='task_documents/blobs/', max_length=255)
+    size = models.BigIntegerField(help_text="File size in bytes")
+    ref_count = models.PositiveIntegerField(default=0)
+    # Preview derivative written by tasks/thumbnails.py
+    thumbnail = models.FileField(upload_to='task_documents/thumbnails/', max_length=255, blank=True)
+    thumbnail_status = models.CharField(max_length=12, blank=True, default=THUMBNAIL_PENDING)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.sha256[:12]} ({self.ref_count} refs)"
+
+
 class TaskDocument(models.Model):
     """Model to store multiple documents/attachments for a task"""
     task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='documents')
     file = models.FileField(upload_to='task_documents/%Y/%m/%d/')
+    # Documents uploaded before deduplication have no blob and own their file
+    blob = models.ForeignKey(DocumentBlob, on_delete=models.PROTECT, null=True, blank=True, related_name='documents')
     file_name = models.CharField(max_length=255)
     file_size = models.IntegerField(help_text="File size in bytes")
     file_type = models.CharField(max_length=100)  # MIME type
@@ -174,3 +439,299 @@ class TaskDocument(models.Model):
     
     def __str__(self):
         return f"{self.file_name} - {self.task.title}"
+
+
+class DocumentUpload(models.Model):
+    """
+    A chunked document upload in progress (see tasks/uploads.py).
+
+    Chunks are appended to a staging file as they arrive; received_bytes
+    is only advanced once a chunk is fully on disk, so an interrupted chunk
+    is simply sent again.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='uploads')
+    uploaded_by = models.ForeignKey(CustomUser, on_delete=models.CASCADE, null=True, blank=True)
+    file_name = models.CharField(max_length=255)
+    file_type = models.CharField(max_length=100)
+    file_size = models.BigIntegerField(help_text="Expected total size in bytes")
+    checksum = models.CharField(max_length=64, blank=True, default='', help_text="Expected SHA-256 of the whole file (hex)")
+    chunk_size = models.PositiveIntegerField()
+    next_chunk = models.PositiveIntegerField(default=0)
+    received_bytes = models.BigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['created_at']
+
+    @property
+    def total_chunks(self):
+        return max(1, -(-self.file_size // self.chunk_size))
+
+    def __str__(self):
+        return f"{self.file_name} ({self.received_bytes}/{self.file_size} bytes)"
+
+
+class ImportJob(models.Model):
+    """
+    An Excel import running in the background (see tasks/jobs.py).
+
+    The uploaded sheet is kept until the job finishes. The worker writes its
+    counters as it goes so clients can poll progress, and checks
+    cancel_requested between batches.
+    """
+    TASKS = 'tasks'
+    USERS = 'users'
+    KIND_CHOICES = (
+        (TASKS, 'Tasks'),
+        (USERS, 'Users'),
+    )
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    CANCELLED = 'cancelled'
+    STATUS_CHOICES = (
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (SUCCEEDED, 'Succeeded'),
+        (FAILED, 'Failed'),
+        (CANCELLED, 'Cancelled'),
+    )
+    FINISHED_STATUSES = (SUCCEEDED, FAILED, CANCELLED)
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=QUEUED)
+    project = models.ForeignKey('project.Project', on_delete=models.CASCADE, null=True, blank=True, related_name='import_jobs')
+    created_by = models.ForeignKey(CustomUser, on_delete=models.CASCADE, null=True, blank=True, related_name='import_jobs')
+    file = models.FileField(upload_to='imports/', blank=True)
+    file_name = models.CharField(max_length=255)
+    rows_total = models.PositiveIntegerField(default=0, help_text="Data rows in the sheet (an estimate until parsed)")
+    rows_parsed = models.PositiveIntegerField(default=0)
+    rows_inserted = models.PositiveIntegerField(default=0)
+    error_count = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True, help_text="Row errors, capped (error_count has the total)")
+    result = models.JSONField(default=dict, blank=True)
+    message = models.TextField(blank=True, default='', help_text="Why the job failed")
+    cancel_requested = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+        ordering = ['created_at']
+
+    @property
+    def is_finished(self):
+        return self.status in self.FINISHED_STATUSES
+
+    def __str__(self):
+        return f"{self.kind} import {self.file_name} ({self.status})"
+
+
+class TaskChange(models.Model):
+    """Append-only change log used by clients to pull task deltas"""
+    UPSERT = 'upsert'
+    DELETE = 'delete'
+    DEPENDENCY_ADD = 'dependency_add'
+    DEPENDENCY_REMOVE = 'dependency_remove'
+    ACTION_CHOICES = (
+        (UPSERT, 'Created or Updated'),
+        (DELETE, 'Deleted'),
+        (DEPENDENCY_ADD, 'Dependency Added'),
+        (DEPENDENCY_REMOVE, 'Dependency Removed'),
+    )
+
+    # Plain ids instead of foreign keys so tombstones outlive the rows they describe
+    project_id = models.BigIntegerField(blank=True, null=True)
+    task_id = models.BigIntegerField()
+    dependency_id = models.BigIntegerField(blank=True, null=True, help_text="Predecessor task for dependency changes")
+    action = models.CharField(max_length=20, choices=ACTION_CHOICES)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['project_id', 'id']),
+        ]
+        ordering = ['id']
+
+    @classmethod
+    def record(cls, action, tasks):
+        """Append one change per task in a single insert (for bulk paths that skip signals)"""
+        return cls.objects.bulk_create([
+            cls(project_id=task.project_id, task_id=task.pk, action=action)
+            for task in tasks
+        ])
+
+    def __str__(self):
+        return f"#{self.id} {self.action} task {self.task_id}"
+
+
+class TaskActivity(models.Model):
+    """Append-only audit trail of who changed what on a task"""
+    CREATED = 'created'
+    UPDATED = 'updated'
+    DELETED = 'deleted'
+    DEPENDENT_ADDED = 'dependent_added'
+    DEPENDENT_REMOVED = 'dependent_removed'
+    RESTORED = 'restored'
+    VERB_CHOICES = (
+        (CREATED, 'Created'),
+        (UPDATED, 'Updated'),
+        (DELETED, 'Deleted'),
+        (DEPENDENT_ADDED, 'Dependent Added'),
+        (DEPENDENT_REMOVED, 'Dependent Removed'),
+        (RESTORED, 'Restored'),
+    )
+
+    # No database constraints on task/project so history survives deletes
+    task = models.ForeignKey(Task, on_delete=models.DO_NOTHING, db_constraint=False, related_name='activity')
+    project = models.ForeignKey('project.Project', on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name='task_activity')
+    actor = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True, blank=True, related_name='task_activity')
+    verb = models.CharField(max_length=20, choices=VERB_CHOICES)
+    changes = models.JSONField(default=dict, blank=True, help_text="Field diff as {field: [old, new]}")
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['project', 'created_at']),
+            models.Index(fields=['task', 'created_at']),
+            models.Index(fields=['actor', 'created_at']),
+        ]
+        ordering = ['-created_at', '-id']
+        verbose_name_plural = 'Task activity'
+
+    @classmethod
+    def log_changes(cls, task, changes, actor=None, verb=UPDATED):
+        """
+        Write the activity rows for one task change in a single insert.
+
+        Dependency edits in ``changes['dependencies']`` also get a row on each
+        affected predecessor so its feed shows the new / removed dependent.
+        """
+        now = timezone.now()
+        actor_id = getattr(actor, 'id', None)
+        rows = [cls(task_id=task.pk, project_id=task.project_id, actor_id=actor_id,
+                    verb=verb, changes=changes, created_at=now)]
+
+        dependency_changes = changes.get('dependencies') or {}
+        for key, edge_verb in (('added', cls.DEPENDENT_ADDED), ('removed', cls.DEPENDENT_REMOVED)):
+            for predecessor_id in dependency_changes.get(key, []):
+                rows.append(cls(task_id=predecessor_id, project_id=task.project_id, actor_id=actor_id,
+                                verb=edge_verb, changes={'task': task.pk}, created_at=now))
+
+        return cls.objects.bulk_create(rows)
+
+    @classmethod
+    def log_created(cls, tasks, actor=None):
+        """Write one 'created' row per task in a single insert (bulk paths)"""
+        now = timezone.now()
+        actor_id = getattr(actor, 'id', None)
+        return cls.objects.bulk_create([
+            cls(task_id=task.pk, project_id=task.project_id, actor_id=actor_id,
+                verb=cls.CREATED, created_at=now)
+            for task in tasks
+        ])
+
+    def __str__(self):
+        return f"{self.verb} task {self.task_id} at {self.created_at}"
+
+
+def log_tasks_created(tasks, actor_id=None):
+    """
+    Change-log and activity rows for bulk-created tasks, written with
+    INSERT ... SELECT so the tasks never have to be loaded.
+
+    Each task gets a TaskChange upsert and a 'created' TaskActivity row; each
+    of its dependency edges gets a TaskChange dependency_add.
+
+    Args:
+        tasks: Task queryset (e.g. filtered on the new ids)
+        actor_id: User the activity rows are attributed to
+    """
+    quote = connection.ops.quote_name
+    now = connection.ops.adapt_datetimefield_value(timezone.now())
+    no_changes = TaskActivity._meta.get_field('changes').get_db_prep_save({}, connection)
+    tasks_sql, tasks_params = tasks.order_by('id').values('project_id', 'id').query.sql_with_params()
+    edges_sql, edges_params = (
+        Task.dependencies.through.objects.filter(from_task_id__in=tasks.order_by().values('pk'))
+        .order_by('id').values('from_task_id', 'to_task_id', project_id=models.F('from_task__project_id'))
+        .query.sql_with_params()
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {quote(TaskChange._meta.db_table)} (project_id, task_id, action, created_at) "
+            f"SELECT created.project_id, created.id, %s, %s FROM ({tasks_sql}) created",
+            [TaskChange.UPSERT, now, *tasks_params]
+        )
+        cursor.execute(
+            f"INSERT INTO {quote(TaskChange._meta.db_table)} (project_id, task_id, dependency_id, action, created_at) "
+            f"SELECT edge.project_id, edge.from_task_id, edge.to_task_id, %s, %s FROM ({edges_sql}) edge",
+            [TaskChange.DEPENDENCY_ADD, now, *edges_params]
+        )
+        cursor.execute(
+            f"INSERT INTO {quote(TaskActivity._meta.db_table)} (project_id, task_id, actor_id, verb, changes, created_at) "
+            f"SELECT created.project_id, created.id, %s, %s, %s, %s FROM ({tasks_sql}) created",
+            [actor_id, TaskActivity.CREATED, no_changes, now, *tasks_params]
+        )
+
+
+class ArchivedTask(models.Model):
+    """
+    Cold copy of a task moved out of tasks_task by the archive command.
+
+    Rows keep the original task id and plain ids instead of foreign keys, so
+    nothing in the live tables points into the archive and a restore puts
+    every task back under the same id, number, parent and dependencies.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    title = models.CharField(max_length=255)
+    task_number = models.CharField(max_length=50, blank=True, null=True, db_index=True)
+    description = models.TextField(blank=True, null=True)
+    status = models.CharField(max_length=20, null=True, blank=True)
+    priority = models.CharField(max_length=20)
+    start_date = models.DateField(blank=True, null=True)
+    due_date = models.DateField(blank=True, null=True)
+    duration = models.IntegerField(default=1)
+    progress = models.IntegerField(default=0)
+    project_id = models.BigIntegerField(blank=True, null=True)
+    parent_task_id = models.BigIntegerField(blank=True, null=True)
+    path = models.CharField(max_length=500, default='/')
+    depth = models.PositiveIntegerField(default=0)
+    assignee_id = models.BigIntegerField(blank=True, null=True)
+    created_by_id = models.BigIntegerField(blank=True, null=True)
+    early_start_day = models.IntegerField(default=0)
+    early_finish_day = models.IntegerField(default=0)
+    late_start_day = models.IntegerField(default=0)
+    late_finish_day = models.IntegerField(default=0)
+    total_float = models.IntegerField(default=0)
+    is_critical = models.BooleanField(default=False)
+    recurring_template_id = models.BigIntegerField(blank=True, null=True)
+    occurrence_date = models.DateField(blank=True, null=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    deleted_at = models.DateTimeField(blank=True, null=True)
+
+    # Relations that lived in other tables, as of archiving
+    dependency_ids = models.JSONField(default=list, blank=True, help_text="Predecessor task ids")
+    dependent_ids = models.JSONField(default=list, blank=True, help_text="Successor task ids")
+    documents = models.JSONField(default=list, blank=True, help_text="TaskDocument rows; the files stay in storage")
+    archived_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['project_id', 'id']),
+        ]
+        ordering = ['id']
+
+    def __str__(self):
+        if self.task_number:
+            return f"{self.task_number} - {self.title} (archived)"
+        return f"{self.title} (archived)"
@@ -0,0 +1,159 @@
+"""
+Task change tracking and asynchronous email notifications.
+
+Views snapshot the tracked fields of the instance they already loaded, diff
+it after saving and hand the diff to queue_task_notifications(). Emails are
+rendered and sent from a small thread pool once the transaction commits, so
+API response times do not depend on the email provider.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from django.conf import settings
+from django.db import connection, transaction
+
+TRACKED_FIELDS = (
+    'title', 'description', 'status', 'priority', 'start_date', 'due_date',
+    'duration', 'progress', 'project_id', 'parent_task_id', 'assignee_id',
+)
+
+_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'TASK_NOTIFICATION_WORKERS', 2),
+    thread_name_prefix='task-notifications',
+)
+
+
+def _json_value(value):
+    return value.isoformat() if isinstance(value, date) else value
+
+
+def snapshot_task(task):
+    """Capture the tracked fields of an in-memory task"""
+    return {field: _json_value(getattr(task, field)) for field in TRACKED_FIELDS}
+
+
+def diff_task(before, after):
+    """
+    Field-level diff between two snapshots.
+
+    Returns:
+        dict: {field: [old, new]} for every field that changed
+    """
+    return {
+        field: [before.get(field), after.get(field)]
+        for field in TRACKED_FIELDS
+        if before.get(field) != after.get(field)
+    }
+
+
+def diff_dependencies(old_ids, new_ids):
+    """Diff two sets of dependency ids, or None if they are equal"""
+    old_ids, new_ids = set(old_ids), set(new_ids)
+    if old_ids == new_ids:
+        return None
+    return {'added': sorted(new_ids - old_ids), 'removed': sorted(old_ids - new_ids)}
+
+
+def queue_task_notifications(task_id, changes, actor_id=None, created=False):
+    """
+    Send the emails for a task change after the current transaction commits.
+
+    Args:
+        task_id: Changed task
+        changes: Diff from diff_task() (ignored when created is True)
+        actor_id: User who made the change
+        created: Whether the task was just created
+    """
+    transaction.on_commit(
+        lambda: _executor.submit(_send_task_notifications, task_id, changes, actor_id, created)
+    )
+
+
+def _send_task_notifications(task_id, changes, actor_id, created):
+    from users.models import CustomUser
+    from .models import Task
+
+    try:
+        task = Task.objects.select_related('assignee', 'created_by', 'project').filter(pk=task_id).first()
+        if task is None:
+            return
+        actor = CustomUser.objects.filter(pk=actor_id).first() if actor_id else None
+
+        if created or 'assignee_id' in changes:
+            _send_assignment_email(task, actor, created)
+        if not created and 'status' in changes:
+            old_status, new_status = changes['status']
+            _send_status_change_email(task, actor, old_status, new_status)
+    except Exception as e:
+        print(f"❌ Failed to send task notifications for task {task_id}: {str(e)}")
+    finally:
+        # Worker threads get their own connection; don't leak it
+        connection.close()
+
+
+def _send_assignment_email(task, actor, created):
+    if not task.assignee or not task.assignee.email:
+        return
+
+    try:
+        from utils.email_service import email_service
+        from utils.email_templates.templates import task_assignment_email_template
+
+        html_content = task_assignment_email_template(
+            user=task.assignee,
+            task=task,
+            project=task.project,
+            assigned_by=actor
+        )
+
+        prefix = 'New Task Assigned' if created else 'Task Assigned'
+        email_service.send_email(
+            to_email=task.assignee.email,
+            subject=f'{prefix}: [{task.task_number}] {task.title}' if task.task_number else f'{prefix}: {task.title}',
+            html_content=html_content
+        )
+        print(f"✅ Task assignment email sent to {task.assignee.email}")
+    except Exception as e:
+        print(f"❌ Failed to send task assignment email: {str(e)}")
+
+
+def _send_status_change_email(task, actor, old_status, new_status):
+    try:
+        # Collect recipients (created_by and assignee)
+        recipients = []
+
+        if task.created_by and task.created_by.email and task.created_by.email_verified:
+            recipients.append({
+                'email': task.created_by.email,
+                'name': task.created_by.get_full_name() or task.created_by.username
+            })
+
+        # Add assignee if different from created_by
+        if task.assignee and task.assignee.email and task.assignee.email_verified:
+            if not task.created_by or task.assignee.id != task.created_by.id:
+                recipients.append({
+                    'email': task.assignee.email,
+                    'name': task.assignee.get_full_name() or task.assignee.username
+                })
+
+        if not recipients:
+            return
+
+        from utils.email_service import email_service
+        from utils.email_templates.templates import task_status_change_email_template
+
+        html_content = task_status_change_email_template(
+            task=task,
+            old_status=old_status,
+            new_status=new_status,
+            changed_by_user=actor
+        )
+
+        for recipient in recipients:
+            email_service.send_email(
+                to_email=recipient['email'],
+                subject=f'Task Status Changed: [{task.task_number}] {task.title}' if task.task_number else f'Task Status Changed: {task.title}',
+                html_content=html_content
+            )
+            print(f"✅ Status change email sent to {recipient['name']} ({recipient['email']})")
+    except Exception as e:
+        print(f"❌ Failed to send status change email: {str(e)}")
@@ -0,0 +1,240 @@
+"""
+Recurring task templates: occurrence dates and bulk materialization.
+
+Occurrence dates are computed in Python from the template's rule (no
+per-occurrence queries). materialize_occurrences() turns every occurrence
+up to a horizon into a task for all templates at once: existing occurrences
+are read in one query, task numbers are reserved once per project, the
+tasks go in with batched executemany inserts and the change / activity logs
+are written with INSERT ... SELECT. The (recurring_template,
+occurrence_date) unique constraint makes a concurrent or repeated run skip
+occurrences that already exist.
+"""
+import calendar
+from datetime import timedelta
+from django.db import connection, transaction
+from django.utils import timezone
+from .events import publish_on_commit
+from .models import Task, TaskChange, RecurringTaskTemplate, log_tasks_created
+
+WEEKDAYS = ('MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU')
+
+DEFAULT_HORIZON_DAYS = 90
+
+MAX_HORIZON_DAYS = 366
+
+INSERT_BATCH_SIZE = 1000
+
+# Projects whose templates stop producing tasks
+INACTIVE_PROJECT_STATUSES = ('Completed', 'Archived')
+
+
+def parse_weekdays(value):
+    """'MO,WE,FR' -> [0, 2, 4]; raises ValueError on unknown days"""
+    days = []
+    for code in filter(None, (part.strip().upper() for part in (value or '').split(','))):
+        if code not in WEEKDAYS:
+            raise ValueError(f"Unknown weekday '{code}' (use {', '.join(WEEKDAYS)})")
+        days.append(WEEKDAYS.index(code))
+    return sorted(set(days))
+
+
+def _add_months(date, months, day):
+    month_index = date.month - 1 + months
+    year, month = date.year + month_index // 12, month_index % 12 + 1
+    # Day 31 falls on the last day of shorter months
+    return date.replace(year=year, month=month, day=min(day, calendar.monthrange(year, month)[1]))
+
+
+def occurrence_dates(template, start, end):
+    """
+    Dates on which a template occurs between start and end (inclusive).
+
+    Args:
+        template: RecurringTaskTemplate
+        start: First date of the window
+        end: Last date of the window
+
+    Returns:
+        list: Sorted dates
+    """
+    first = template.start_date
+    if template.until and template.until < end:
+        end = template.until
+    start = max(start, first)
+    if start > end:
+        return []
+    interval = max(template.interval, 1)
+
+    if template.frequency == RecurringTaskTemplate.DAILY:
+        # Jump straight to the first occurrence inside the window
+        skip = -(-(start - first).days // interval)
+        date, dates = first + timedelta(days=skip * interval), []
+        while date <= end:
+            dates.append(date)
+            date += timedelta(days=interval)
+        return dates
+
+    if template.frequency == RecurringTaskTemplate.WEEKLY:
+        weekdays = parse_weekdays(template.weekdays) or [first.weekday()]
+        first_monday = first - timedelta(days=first.weekday())
+        week = (start - first_monday).days // 7
+        week += -week % interval
+        dates = []
+        while True:
+            monday = first_monday + timedelta(weeks=week)
+            if monday > end:
+                return dates
+            dates.extend(
+                date for date in (monday + timedelta(days=day) for day in weekdays)
+                if start <= date <= end
+            )
+            week += interval
+
+    # Monthly on the start date's day of month
+    months = (start.year - first.year) * 12 + start.month - first.month
+    months = max(months - months % interval, 0)
+    dates = []
+    while True:
+        date = _add_months(first, months, first.day)
+        if date > end:
+            return dates
+        if date >= start:
+            dates.append(date)
+        months += interval
+
+
+def _insert_occurrences(rows):
+    """
+    INSERT (template, date, task_number) rows as tasks, skipping occurrences that already exist.
+
+    bulk_create spends nearly all of its time preparing every field of every
+    row; here a template's fields are prepared once and each row only adds
+    its dates and number, sent with executemany. Only a clash on the
+    (recurring_template, occurrence_date) constraint is skipped; any other
+    integrity error (e.g. a task_number collision) is raised.
+    """
+    quote = connection.ops.quote_name
+    fields = [field for field in Task._meta.concrete_fields if not field.primary_key]
+    per_row = ('start_date', 'due_date', 'occurrence_date', 'task_number')
+    positions = {field.attname: index for index, field in enumerate(fields)}
+    adapt_date = connection.ops.adapt_datefield_value
+    now = timezone.now()
+
+    prepared = {}
+    params = []
+    for template, date, number in rows:
+        if template.pk not in prepared:
+            prototype = Task(
+                title=template.title,
+                description=template.description,
+                priority=template.priority,
+                duration=template.duration,
+                project_id=template.project_id,
+                assignee_id=template.assignee_id,
+                created_by_id=template.created_by_id,
+                recurring_template_id=template.pk,
+                created_at=now,
+                updated_at=now,
+            )
+            prepared[template.pk] = [
+                None if field.attname in per_row else field.get_db_prep_save(getattr(prototype, field.attname), connection)
+                for field in fields
+            ]
+        due_date = date + timedelta(days=max(template.duration, 1) - 1)
+        row = prepared[template.pk][:]
+        row[positions['start_date']] = adapt_date(date)
+        row[positions['due_date']] = adapt_date(due_date)
+        row[positions['occurrence_date']] = adapt_date(date)
+        row[positions['task_number']] = number
+        params.append(row)
+
+    occurrence_columns = [Task._meta.get_field(name).column for name in ('recurring_template', 'occurrence_date')]
+    sql = (
+        f"INSERT INTO {quote(Task._meta.db_table)} "
+        f"({', '.join(quote(field.column) for field in fields)}) "
+        f"VALUES ({', '.join(['%s'] * len(fields))}) "
+        f"ON CONFLICT ({', '.join(map(quote, occurrence_columns))}) DO NOTHING"
+    )
+    with connection.cursor() as cursor:
+        for start in range(0, len(params), INSERT_BATCH_SIZE):
+            cursor.executemany(sql, params[start:start + INSERT_BATCH_SIZE])
+
+
+def materialize_occurrences(templates=None, horizon_days=DEFAULT_HORIZON_DAYS, today=None):
+    """
+    Create the tasks for every occurrence up to today + horizon_days.
+
+    Each template resumes after its materialized_until date, so past
+    occurrences are never backfilled and reruns only add the new window.
+
+    Args:
+        templates: RecurringTaskTemplate queryset (default: all active templates)
+        horizon_days: How far ahead to create tasks
+        today: Reference date (default: today)
+
+    Returns:
+        int: Number of tasks created
+    """
+    today = today or timezone.localdate()
+    horizon = today + timedelta(days=horizon_days)
+    if templates is None:
+        templates = RecurringTaskTemplate.objects.filter(is_active=True)
+    templates = list(
+        templates.exclude(project__status__in=INACTIVE_PROJECT_STATUSES).select_related('project')
+    )
+
+    windows = {}
+    for template in templates:
+        window_start = template.materialized_until + timedelta(days=1) if template.materialized_until else today
+        dates = occurrence_dates(template, window_start, horizon)
+        if dates:
+            windows[template.pk] = dates
+    if not windows:
+        return 0
+
+    with transaction.atomic():
+        existing = set(Task.all_objects.filter(
+            recurring_template_id__in=windows, occurrence_date__gte=min(dates[0] for dates in windows.values())
+        ).values_list('recurring_template_id', 'occurrence_date'))
+
+        by_project = {}
+        for template in templates:
+            for date in windows.get(template.pk, []):
+                if (template.pk, date) not in existing:
+                    by_project.setdefault(template.project_id, []).append((template, date))
+
+        rows = []
+        for occurrences in by_project.values():
+            # One number reservation per project
+            numbers = Task.reserve_task_numbers(occurrences[0][0].project, len(occurrences))
+            rows.extend((template, date, number) for number, (template, date) in zip(numbers, occurrences))
+        _insert_occurrences(rows)
+
+        for template in templates:
+            if template.pk in windows:
+                template.materialized_until = horizon
+        RecurringTaskTemplate.objects.bulk_update(
+            [template for template in templates if template.pk in windows], ['materialized_until'], batch_size=1000
+        )
+
+        # ON CONFLICT leaves no ids behind; read back the occurrences carrying
+        # this run's numbers (a concurrent run's duplicates carry others)
+        numbers = {(template.pk, date): number for template, date, number in rows}
+        occurrences = Task.all_objects.filter(
+            recurring_template_id__in=windows, occurrence_date__in={date for _, date, _ in rows}
+        ).values_list('id', 'project_id', 'recurring_template_id', 'occurrence_date', 'task_number')
+        created = [
+            (task_id, project_id)
+            for task_id, project_id, template_id, date, number in occurrences
+            if numbers.get((template_id, date)) == number
+        ]
+        created_ids = [task_id for task_id, _ in created]
+        for start in range(0, len(created_ids), INSERT_BATCH_SIZE):
+            log_tasks_created(Task.all_objects.filter(pk__in=created_ids[start:start + INSERT_BATCH_SIZE]))
+        for project_id in {project_id for _, project_id in created}:
+            publish_on_commit(project_id, 'tasks.created', {
+                'ids': [task_id for task_id, task_project_id in created if task_project_id == project_id],
+            })
+
+    return len(created)
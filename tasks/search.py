@@ -0,0 +1,174 @@
+"""
+Full-text search over task titles and descriptions.
+
+SQLite uses an FTS5 table (tasks_task_fts) kept in sync by triggers on
+tasks_task, PostgreSQL uses a GIN index over a weighted tsvector expression.
+Soft-deleted tasks are left out of both.
+Both are created from the post_migrate hook in TasksConfig.ready(), and any
+other backend falls back to icontains filtering.
+"""
+import logging
+import re
+from django.db import connection, OperationalError, ProgrammingError
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = 'tasks_task_fts'
+
+# Title matches count ten times as much as description matches; the
+# project column only exists for scoping and must not affect ranking
+FTS_RANK = f"bm25({FTS_TABLE}, 10.0, 1.0, 0.0)"
+
+SQLITE_SCHEMA = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        title, description, project,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3'
+    )
+    """,
+    # Recreated on every run so databases with older trigger bodies pick up changes
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ai",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_au",
+    f"""
+    CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON tasks_task WHEN new.deleted_at IS NULL BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, description, project)
+        VALUES (new.id, new.title, coalesce(new.description, ''), 'p' || coalesce(new.project_id, 0));
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON tasks_task BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = old.id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE OF title, description, project_id, deleted_at ON tasks_task BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = old.id;
+        INSERT INTO {FTS_TABLE}(rowid, title, description, project)
+        SELECT new.id, new.title, coalesce(new.description, ''), 'p' || coalesce(new.project_id, 0)
+        WHERE new.deleted_at IS NULL;
+    END
+    """,
+]
+
+POSTGRES_VECTOR = (
+    "setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(description, '')), 'B')"
+)
+
+POSTGRES_SCHEMA = [
+    f"CREATE INDEX IF NOT EXISTS tasks_task_search_idx ON tasks_task USING GIN (({POSTGRES_VECTOR}))",
+]
+
+
+def install_search_index(using=None, **kwargs):
+    """Create the search index for the current backend (post_migrate receiver)"""
+    from django.db import connections
+    conn = connections[using or 'default']
+
+    try:
+        with conn.cursor() as cursor:
+            if conn.vendor == 'sqlite':
+                cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+                created = cursor.fetchone() is None
+                for statement in SQLITE_SCHEMA:
+                    cursor.execute(statement)
+                if created:
+                    # Index rows that existed before the search table did
+                    cursor.execute(
+                        f"INSERT INTO {FTS_TABLE}(rowid, title, description, project) "
+                        f"SELECT id, title, coalesce(description, ''), 'p' || coalesce(project_id, 0) FROM tasks_task "
+                        f"WHERE deleted_at IS NULL"
+                    )
+            elif conn.vendor == 'postgresql':
+                for statement in POSTGRES_SCHEMA:
+                    cursor.execute(statement)
+    except (OperationalError, ProgrammingError) as e:
+        # e.g. an SQLite build without FTS5; search falls back to icontains
+        logger.warning(f"Task search index not installed: {str(e)}")
+
+
+def _terms(query):
+    """Split a user query into (term, is_prefix) pairs"""
+    terms = []
+    for match in re.finditer(r'(\w+)(\*)?', query):
+        terms.append((match.group(1).lower(), bool(match.group(2))))
+    if terms:
+        # Search-as-you-type: the last word is always treated as a prefix
+        terms[-1] = (terms[-1][0], True)
+    return terms
+
+
+def _fts5_query(terms, project_id=None):
+    parts = [f'"{term}"*' if is_prefix else f'"{term}"' for term, is_prefix in terms]
+    match = ' '.join(parts)
+    if project_id is not None:
+        match = f'project:"p{int(project_id)}" AND ({match})'
+    return match
+
+
+def _tsquery(terms):
+    return ' & '.join(f"{term}:*" if is_prefix else term for term, is_prefix in terms)
+
+
+def search_tasks(query, project_id=None, limit=20, offset=0):
+    """
+    Rank tasks matching a free-text query.
+
+    Args:
+        query: User query; words are ANDed, a trailing '*' or the last word
+            makes a prefix match
+        project_id: Optional project to scope the search to
+        limit: Maximum number of results
+        offset: Number of ranked results to skip
+
+    Returns:
+        list: (task_id, score) tuples, best match first
+    """
+    terms = _terms(query)
+    if not terms:
+        return []
+
+    try:
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"SELECT rowid, {FTS_RANK} AS score FROM {FTS_TABLE} "
+                    f"WHERE {FTS_TABLE} MATCH %s ORDER BY score LIMIT %s OFFSET %s",
+                    [_fts5_query(terms, project_id), limit, offset]
+                )
+                # bm25() is lower-is-better; flip it so callers see higher-is-better
+                return [(row[0], -row[1]) for row in cursor.fetchall()]
+
+        if connection.vendor == 'postgresql':
+            sql = (
+                f"SELECT id, ts_rank({POSTGRES_VECTOR}, query) AS score "
+                f"FROM tasks_task, to_tsquery('simple', %s) query "
+                f"WHERE ({POSTGRES_VECTOR}) @@ query AND deleted_at IS NULL"
+            )
+            params = [_tsquery(terms)]
+            if project_id is not None:
+                sql += " AND project_id = %s"
+                params.append(project_id)
+            sql += " ORDER BY score DESC, id LIMIT %s OFFSET %s"
+            params += [limit, offset]
+            with connection.cursor() as cursor:
+                cursor.execute(sql, params)
+                return list(cursor.fetchall())
+    except (OperationalError, ProgrammingError) as e:
+        logger.warning(f"Full-text task search unavailable, falling back to icontains: {str(e)}")
+
+    return _search_tasks_fallback(terms, project_id, limit, offset)
+
+
+def _search_tasks_fallback(terms, project_id, limit, offset):
+    from django.db.models import Q
+    from .models import Task
+
+    queryset = Task.objects.all()
+    if project_id is not None:
+        queryset = queryset.filter(project_id=project_id)
+    for term, is_prefix in terms:
+        queryset = queryset.filter(Q(title__icontains=term) | Q(description__icontains=term))
+    ids = queryset.order_by('id').values_list('id', flat=True)[offset:offset + limit]
+    return [(task_id, 0.0) for task_id in ids]
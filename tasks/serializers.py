@@ -1,5 +1,7 @@
+from django.db import models
+from django.db.models import Count, Max, Prefetch, Sum
 from rest_framework import serializers
-from .models import Task, TaskDocument
+from .models import Task, TaskDocument, DocumentBlob, TaskActivity, ArchivedTask, RecurringTaskTemplate
 
 class TaskDocumentSerializer(serializers.ModelSerializer):
     uploaded_by_username = serializers.SerializerMethodField()
@@ -7,10 +9,12 @@ class TaskDocumentSerializer(serializers.ModelSerializer):
     is_image = serializers.SerializerMethodField()
     is_pdf = serializers.SerializerMethodField()
     file_extension = serializers.SerializerMethodField()
+    download_url = serializers.SerializerMethodField()
+    thumbnail_url = serializers.SerializerMethodField()
     
     class Meta:
         model = TaskDocument
-        fields = ['id', 'task', 'file', 'file_name', 'file_size', 'formatted_size', 
+        fields = ['id', 'task', 'file', 'download_url', 'thumbnail_url', 'file_name', 'file_size', 'formatted_size', 
                   'file_type', 'file_extension', 'is_image', 'is_pdf', 
                   'uploaded_by', 'uploaded_by_username', 'uploaded_at']
         read_only_fields = ['file_size', 'uploaded_at']
@@ -29,6 +33,98 @@ class TaskDocumentSerializer(serializers.ModelSerializer):
     
     def get_file_extension(self, obj):
         return obj.get_file_extension()
+    
+    def get_download_url(self, obj):
+        # Signed for the requesting user, so it works in <img>/<iframe> without auth headers
+        from .downloads import download_url
+        return download_url(obj, self.context.get('request'))
+    
+    def get_thumbnail_url(self, obj):
+        # Null until the background worker has rendered one (see tasks/thumbnails.py)
+        from .downloads import download_url
+        if not obj.blob_id or obj.blob.thumbnail_status != DocumentBlob.THUMBNAIL_READY:
+            return None
+        return download_url(obj, self.context.get('request'), route='task-document-thumbnail')
+
+def document_summaries(task_ids):
+    """{task_id: {count, total_size, last_uploaded_at}} for the given tasks, in one aggregate query"""
+    summaries = {task_id: {'count': 0, 'total_size': 0, 'last_uploaded_at': None} for task_id in task_ids}
+    rows = TaskDocument.objects.filter(task_id__in=list(summaries)).order_by().values('task_id').annotate(
+        count=Count('id'), total_size=Sum('file_size'), last_uploaded_at=Max('uploaded_at')
+    )
+    for row in rows:
+        summaries[row.pop('task_id')] = row
+    return summaries
+
+
+# Subtrees per descendants query; each adds one path range to an OR (SQLite caps expression depth)
+SUBTREE_BATCH_SIZE = 500
+
+
+def load_subtask_children(tasks, context):
+    """
+    Load the subtrees of several tasks at once, grouped by parent.
+
+    One descendants query per SUBTREE_BATCH_SIZE tasks (an OR of their path
+    ranges, skipping tasks already inside another one's subtree), plus one
+    dependencies prefetch and one document summary aggregate (or document
+    prefetch) for all of them.
+
+    Returns:
+        dict: {parent_task_id: [subtasks]}
+    """
+    prefixes = []
+    for prefix in sorted(task.descendant_prefix for task in tasks):
+        if not prefixes or not prefix.startswith(prefixes[-1]):
+            prefixes.append(prefix)
+
+    descendants = []
+    for start in range(0, len(prefixes), SUBTREE_BATCH_SIZE):
+        ranges = models.Q()
+        for prefix in prefixes[start:start + SUBTREE_BATCH_SIZE]:
+            ranges |= Task.descendants_filter(prefix)
+        descendants.extend(
+            Task.objects.filter(ranges).select_related('assignee', 'created_by', 'project').order_by('depth', 'id')
+        )
+
+    lookups = []
+    if context.get('dependency_mode') != 'counts':
+        lookups.append('dependencies')
+    if context.get('document_mode', 'summary') == 'summary':
+        # One aggregate for every subtree instead of one per nested list
+        context.setdefault('document_summaries', {}).update(
+            document_summaries([task.pk for task in descendants])
+        )
+    else:
+        lookups.append(document_prefetch())
+    if lookups:
+        models.prefetch_related_objects(descendants, *lookups)
+
+    children = {}
+    for task in descendants:
+        children.setdefault(task.parent_task_id, []).append(task)
+    return children
+
+
+class TaskListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        tasks = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        # Summary mode: document summaries for the whole list in one query
+        if self.context.get('document_mode', 'summary') == 'summary':
+            summaries = self.context.setdefault('document_summaries', {})
+            missing = [task.pk for task in tasks if task.pk not in summaries]
+            if missing:
+                summaries.update(document_summaries(missing))
+        # Top-level list: the subtrees of every listed task in one go (nested lists reuse them)
+        if 'subtask_children' not in self.context and tasks:
+            self.context['subtask_children'] = load_subtask_children(tasks, self.context)
+        return super().to_representation(tasks)
+
+
+def document_prefetch():
+    """Prefetch for full document lists, with what TaskDocumentSerializer reads"""
+    return Prefetch('documents', queryset=TaskDocument.objects.select_related('uploaded_by', 'blob'))
+
 
 class TaskSerializer(serializers.ModelSerializer):
     subtasks = serializers.SerializerMethodField()
@@ -37,16 +133,48 @@ class TaskSerializer(serializers.ModelSerializer):
     assignee_username = serializers.SerializerMethodField()
     created_by_username = serializers.SerializerMethodField()
     documents = TaskDocumentSerializer(many=True, read_only=True)
+    document_summary = serializers.SerializerMethodField()
     project_name = serializers.CharField(source='project.name', read_only=True)
     project_key = serializers.CharField(source='project.key', read_only=True)
 
     class Meta:
         model = Task
         fields = '__all__'
+        list_serializer_class = TaskListSerializer
+    
+    def get_fields(self):
+        fields = super().get_fields()
+        # dependency_mode=counts: predecessor_count / successor_count only, no through-table reads
+        if self.context.get('dependency_mode') == 'counts':
+            fields.pop('dependencies')
+        # Full document lists only where asked for (task detail); lists carry document_summary
+        if self.context.get('document_mode', 'summary') == 'summary':
+            fields.pop('documents')
+        return fields
+    
+    def get_document_summary(self, obj):
+        summary = self.context.get('document_summaries', {}).get(obj.pk)
+        if summary is None:
+            # Full mode (or a lone task): from the prefetched documents
+            documents = list(obj.documents.all())
+            summary = {
+                'count': len(documents),
+                'total_size': sum(document.file_size for document in documents),
+                'last_uploaded_at': max((document.uploaded_at for document in documents), default=None),
+            }
+        return summary
     
     def get_subtasks(self, obj):
-        if obj.subtasks.exists():
-            return TaskSerializer(obj.subtasks.all(), many=True).data
+        # The whole subtree is loaded once (via the materialized path) and
+        # handed down to the nested serializers grouped by parent; lists
+        # load every listed task's subtree up front (TaskListSerializer)
+        children = self.context.get('subtask_children')
+        if children is None:
+            children = load_subtask_children([obj], self.context)
+        
+        subtasks = children.get(obj.id)
+        if subtasks:
+            return TaskSerializer(subtasks, many=True, context={**self.context, 'subtask_children': children}).data
         return []
     
     def get_assignee_username(self, obj):
@@ -59,6 +187,104 @@ class TaskSerializer(serializers.ModelSerializer):
             return obj.created_by.username
         return None
 
+class TaskSearchResultSerializer(serializers.ModelSerializer):
+    """Slim task payload for search results"""
+    project_key = serializers.CharField(source='project.key', read_only=True)
+    assignee_username = serializers.CharField(source='assignee.username', read_only=True, default=None)
+    score = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Task
+        fields = ['id', 'task_number', 'title', 'status', 'priority', 'start_date', 'due_date',
+                  'project', 'project_key', 'parent_task', 'assignee', 'assignee_username', 'score']
+
+    def get_score(self, obj):
+        return self.context.get('scores', {}).get(obj.id)
+
+class TaskCardSerializer(serializers.ModelSerializer):
+    """Slim Kanban card payload (see tasks/board.py)"""
+    description = serializers.CharField(source='description_preview', read_only=True, default=None)
+    assignee_username = serializers.CharField(source='assignee.username', read_only=True, default=None)
+    subtask_count = serializers.IntegerField(read_only=True)
+    completed_subtasks = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Task
+        fields = ['id', 'task_number', 'title', 'description', 'status', 'priority', 'progress',
+                  'start_date', 'due_date', 'duration', 'assignee', 'assignee_username',
+                  'is_critical', 'total_float', 'early_start_day', 'late_start_day',
+                  'subtask_count', 'completed_subtasks']
+
+class TaskActivitySerializer(serializers.ModelSerializer):
+    actor_username = serializers.CharField(source='actor.username', read_only=True, default=None)
+
+    class Meta:
+        model = TaskActivity
+        fields = ['id', 'task', 'project', 'actor', 'actor_username', 'verb', 'changes', 'created_at']
+
+class ArchivedTaskSerializer(serializers.ModelSerializer):
+    """Read-only view of an archived task (see tasks/archive.py)"""
+    project = serializers.IntegerField(source='project_id', read_only=True)
+    parent_task = serializers.IntegerField(source='parent_task_id', read_only=True)
+    assignee = serializers.IntegerField(source='assignee_id', read_only=True)
+    dependencies = serializers.JSONField(source='dependency_ids', read_only=True)
+    documents = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ArchivedTask
+        fields = ['id', 'task_number', 'title', 'description', 'status', 'priority', 'progress',
+                  'start_date', 'due_date', 'duration', 'project', 'parent_task', 'depth', 'assignee',
+                  'dependencies', 'documents', 'created_at', 'updated_at', 'deleted_at', 'archived_at']
+        read_only_fields = fields
+
+    def get_documents(self, obj):
+        return [
+            {'id': document['id'], 'file_name': document['file_name'], 'file_size': document['file_size'],
+             'file_type': document['file_type'], 'uploaded_at': document['uploaded_at']}
+            for document in obj.documents
+        ]
+
+class RecurringTaskTemplateSerializer(serializers.ModelSerializer):
+    assignee_username = serializers.CharField(source='assignee.username', read_only=True, default=None)
+
+    class Meta:
+        model = RecurringTaskTemplate
+        fields = ['id', 'project', 'title', 'description', 'priority', 'duration', 'assignee', 'assignee_username',
+                  'frequency', 'interval', 'weekdays', 'start_date', 'until', 'is_active', 'materialized_until',
+                  'created_by', 'created_at', 'updated_at']
+        read_only_fields = ['materialized_until', 'created_by', 'created_at', 'updated_at']
+
+    def validate(self, attrs):
+        from .recurrence import parse_weekdays, WEEKDAYS
+
+        frequency = attrs.get('frequency', getattr(self.instance, 'frequency', RecurringTaskTemplate.WEEKLY))
+        weekdays = attrs.get('weekdays', getattr(self.instance, 'weekdays', ''))
+        start_date = attrs.get('start_date', getattr(self.instance, 'start_date', None))
+        until = attrs.get('until', getattr(self.instance, 'until', None))
+
+        if weekdays:
+            if frequency != RecurringTaskTemplate.WEEKLY:
+                raise serializers.ValidationError({'weekdays': 'Only weekly rules take weekdays'})
+            try:
+                # Store the canonical form, e.g. "mo, fr" -> "MO,FR"
+                attrs['weekdays'] = ','.join(WEEKDAYS[day] for day in parse_weekdays(weekdays))
+            except ValueError as e:
+                raise serializers.ValidationError({'weekdays': str(e)})
+        if until and start_date and until < start_date:
+            raise serializers.ValidationError({'until': 'Must not be before start_date'})
+        if attrs.get('interval') == 0:
+            raise serializers.ValidationError({'interval': 'Must be at least 1'})
+        return attrs
+
+class TaskIdListField(serializers.ListField):
+    """List of task ids that also renders related managers (e.g. task.dependencies)"""
+    child = serializers.IntegerField()
+
+    def to_representation(self, data):
+        if hasattr(data, 'values_list'):
+            data = data.values_list('pk', flat=True)
+        return super().to_representation(data)
+
 class TaskCreateUpdateSerializer(serializers.Serializer):
     title = serializers.CharField(max_length=255)
     description = serializers.CharField(required=False)
@@ -71,30 +297,99 @@ class TaskCreateUpdateSerializer(serializers.Serializer):
     project_id = serializers.IntegerField(required=False, allow_null=True)
     parent_task_id = serializers.IntegerField(required=False, allow_null=True)
     assignee_id = serializers.IntegerField(required=False, allow_null=True)
-    dependencies = serializers.PrimaryKeyRelatedField(many=True, queryset=Task.objects.all(), required=False)
+    # Plain ids, resolved together in validate() instead of one get() per id
+    dependencies = TaskIdListField(required=False)
+
+    def validate(self, attrs):
+        """
+        Resolve every referenced id with one id__in query per model.
+
+        Dependencies and the parent task must belong to the project the task
+        will end up in; a new task without a project takes its parent's.
+        Unknown parent / project ids are ignored as before.
+        """
+        from project.models import Project
+        from users.models import CustomUser
+
+        instance = self.instance
+        errors = {}
+
+        # Project the task will belong to after this save
+        project_id = attrs.get('project_id')
+        if project_id:
+            project = Project.objects.filter(id__in=[project_id]).first()
+            if project is not None:
+                attrs['project'] = project
+            target_project_id = project.id if project else (instance.project_id if instance else None)
+        elif project_id is not None and instance is not None:
+            # 0 clears the project on update
+            attrs['project'] = None
+            target_project_id = None
+        else:
+            target_project_id = instance.project_id if instance else None
+
+        dependency_ids = list(dict.fromkeys(attrs.get('dependencies') or []))
+        parent_task_id = attrs.get('parent_task_id') or None
+
+        referenced_ids = set(dependency_ids)
+        if parent_task_id:
+            referenced_ids.add(parent_task_id)
+        referenced = Task.objects.filter(id__in=referenced_ids).values_list('id', 'project_id', 'path') if referenced_ids else []
+        task_projects = {task_id: task_project_id for task_id, task_project_id, _ in referenced}
+        task_paths = {task_id: path for task_id, _, path in referenced}
+
+        if instance is None and not project_id and parent_task_id in task_projects:
+            # A subtask created without a project joins its parent's
+            target_project_id = task_projects[parent_task_id]
+            if target_project_id is not None:
+                attrs['project'] = Project.objects.filter(id__in=[target_project_id]).first()
+
+        if dependency_ids:
+            missing = [task_id for task_id in dependency_ids if task_id not in task_projects]
+            foreign = [
+                task_id for task_id in dependency_ids
+                if task_id in task_projects and task_projects[task_id] != target_project_id
+            ]
+            if missing:
+                errors['dependencies'] = [f"Tasks not found: {', '.join(map(str, missing))}"]
+            elif foreign:
+                errors['dependencies'] = [
+                    f"Dependencies must belong to the same project: {', '.join(map(str, foreign))}"
+                ]
+            elif instance is not None and instance.pk in dependency_ids:
+                errors['dependencies'] = ['A task cannot depend on itself']
+        if 'dependencies' in attrs:
+            attrs['dependencies'] = dependency_ids
+
+        if parent_task_id:
+            if parent_task_id not in task_projects:
+                # If parent task doesn't exist, keep the previous behaviour and ignore it
+                attrs.pop('parent_task_id')
+            elif task_projects[parent_task_id] != target_project_id:
+                errors['parent_task_id'] = ['Parent task must belong to the same project']
+            elif instance is not None and instance.pk == parent_task_id:
+                errors['parent_task_id'] = ['A task cannot be its own parent']
+            elif instance is not None and f"/{instance.pk}/" in task_paths[parent_task_id]:
+                errors['parent_task_id'] = ['A task cannot be moved under its own subtask']
+
+        assignee_id = attrs.get('assignee_id')
+        if assignee_id and not CustomUser.objects.filter(id__in=[assignee_id]).exists():
+            errors['assignee_id'] = [f"User {assignee_id} not found"]
+
+        if errors:
+            raise serializers.ValidationError(errors)
+        return attrs
 
     def create(self, validated_data):
         dependencies = validated_data.pop('dependencies', [])
-        parent_task_id = validated_data.pop('parent_task_id', None)
-        project_id = validated_data.pop('project_id', None)
+        validated_data.pop('project_id', None)
         
         # Check if progress was explicitly provided
         has_explicit_progress = 'progress' in validated_data
         
-        if parent_task_id:
-            try:
-                parent_task = Task.objects.get(id=parent_task_id)
-                validated_data['parent_task'] = parent_task
-            except Task.DoesNotExist:
-                pass  # If parent task doesn't exist, create as main task
-        
-        if project_id:
-            from project.models import Project
-            try:
-                project = Project.objects.get(id=project_id)
-                validated_data['project'] = project
-            except Project.DoesNotExist:
-                pass  # If project doesn't exist, create task without project
+        # parent_task_id / project were resolved in validate()
+        if not validated_data.get('parent_task_id'):
+            validated_data.pop('parent_task_id', None)
         
         # Create the task with explicit progress preservation
         task = Task(**validated_data)
@@ -105,7 +400,7 @@ class TaskCreateUpdateSerializer(serializers.Serializer):
     def update(self, instance, validated_data):
         dependencies = validated_data.pop('dependencies', None)
         parent_task_id = validated_data.pop('parent_task_id', None)
-        project_id = validated_data.pop('project_id', None)
+        validated_data.pop('project_id', None)
         
         instance.title = validated_data.get('title', instance.title)
         instance.description = validated_data.get('description', instance.description)
@@ -118,25 +413,11 @@ class TaskCreateUpdateSerializer(serializers.Serializer):
         instance.assignee_id = validated_data.get('assignee_id', instance.assignee_id)
         
         if parent_task_id is not None:
-            if parent_task_id == '' or parent_task_id == 0:
-                instance.parent_task = None
-            else:
-                try:
-                    parent_task = Task.objects.get(id=parent_task_id)
-                    instance.parent_task = parent_task
-                except Task.DoesNotExist:
-                    pass  # Keep existing parent if new one doesn't exist
+            # 0 clears the parent; otherwise validate() has checked it exists
+            instance.parent_task_id = parent_task_id or None
         
-        if project_id is not None:
-            if project_id == '' or project_id == 0:
-                instance.project = None
-            else:
-                from project.models import Project
-                try:
-                    project = Project.objects.get(id=project_id)
-                    instance.project = project
-                except Project.DoesNotExist:
-                    pass  # Keep existing project if new one doesn't exist
+        if 'project' in validated_data:
+            instance.project = validated_data['project']
             
         # If progress was explicitly provided, skip auto-calculation
         skip_progress_auto = 'progress' in validated_data
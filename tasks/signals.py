@@ -0,0 +1,143 @@
+"""
+Signal handlers that keep the task change log (TaskChange) and the
+denormalized dependency counts up to date, and publish the matching
+server-sent events (see tasks/events.py).
+"""
+from django.db.models import Q
+from django.db.models.signals import post_save, pre_delete, post_delete, m2m_changed
+from django.dispatch import receiver
+from .blobs import release_document_files
+from .events import publish_on_commit, task_event_data
+from .models import Task, TaskChange, TaskDocument
+
+
+@receiver(post_save, sender=Task)
+def log_task_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+
+    changes = [TaskChange(project_id=instance.project_id, task_id=instance.pk, action=TaskChange.UPSERT)]
+
+    # A task moved to another project disappears from the old project's feed
+    old_project_id = getattr(instance, '_loaded_project_id', None)
+    if not created and old_project_id and old_project_id != instance.project_id:
+        changes.append(TaskChange(project_id=old_project_id, task_id=instance.pk, action=TaskChange.DELETE))
+    instance._loaded_project_id = instance.project_id
+
+    upsert = TaskChange.objects.bulk_create(changes)[0]
+
+    publish_on_commit(
+        instance.project_id,
+        'task.created' if created else 'task.updated',
+        task_event_data(instance),
+        event_id=upsert.pk,
+    )
+    if len(changes) > 1:
+        publish_on_commit(old_project_id, 'task.deleted', {'id': instance.pk}, event_id=changes[1].pk)
+
+
+@receiver(pre_delete, sender=Task)
+def capture_dependency_neighbours(sender, instance, **kwargs):
+    # The dependency rows are gone by post_delete, so note whose counts change
+    edges = list(Task.dependencies.through.objects.filter(
+        Q(from_task_id=instance.pk) | Q(to_task_id=instance.pk)
+    ).values_list('from_task_id', 'to_task_id'))
+    neighbour_ids = set()
+    for edge in edges:
+        neighbour_ids.update(edge)
+    neighbour_ids.discard(instance.pk)
+    instance._dependency_neighbour_ids = neighbour_ids
+
+    if not edges:
+        return
+
+    # The cascade removes the edges without m2m_changed, so log them here
+    logged = TaskChange.objects.bulk_create([
+        TaskChange(
+            project_id=instance.project_id,
+            task_id=task_id,
+            dependency_id=dependency_id,
+            action=TaskChange.DEPENDENCY_REMOVE,
+        )
+        for task_id, dependency_id in edges
+    ])
+    publish_on_commit(
+        instance.project_id,
+        'dependency.removed',
+        {'edges': [{'task': task_id, 'dependency': dependency_id} for task_id, dependency_id in edges]},
+        event_id=logged[-1].pk,
+    )
+
+
+@receiver(post_delete, sender=Task)
+def log_task_deleted(sender, instance, **kwargs):
+    change = TaskChange.objects.create(project_id=instance.project_id, task_id=instance.pk, action=TaskChange.DELETE)
+    publish_on_commit(instance.project_id, 'task.deleted', {'id': instance.pk}, event_id=change.pk)
+
+    neighbour_ids = getattr(instance, '_dependency_neighbour_ids', None)
+    if neighbour_ids:
+        Task.refresh_dependency_counts(neighbour_ids)
+
+
+@receiver(m2m_changed, sender=Task.dependencies.through)
+def log_dependency_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear':
+        # pk_set is not provided on clear, so capture the edges about to go away
+        related = instance.dependents if reverse else instance.dependencies
+        instance._cleared_dependency_pks = set(related.values_list('pk', flat=True))
+        return
+
+    if action in ('post_add', 'post_remove'):
+        pks = pk_set or set()
+    elif action == 'post_clear':
+        pks = getattr(instance, '_cleared_dependency_pks', set())
+    else:
+        return
+
+    if not pks:
+        return
+
+    # Recount from the table: pk_set on remove may name edges that did not exist
+    Task.refresh_dependency_counts({instance.pk, *pks})
+
+    change_action = TaskChange.DEPENDENCY_ADD if action == 'post_add' else TaskChange.DEPENDENCY_REMOVE
+
+    # Edges are always logged as (dependent task, predecessor)
+    if reverse:
+        edges = [(pk, instance.pk) for pk in pks]
+    else:
+        edges = [(instance.pk, pk) for pk in pks]
+
+    logged = TaskChange.objects.bulk_create([
+        TaskChange(
+            project_id=instance.project_id,
+            task_id=task_id,
+            dependency_id=dependency_id,
+            action=change_action,
+        )
+        for task_id, dependency_id in edges
+    ])
+
+    publish_on_commit(
+        instance.project_id,
+        'dependency.added' if action == 'post_add' else 'dependency.removed',
+        {'edges': [{'task': task_id, 'dependency': dependency_id} for task_id, dependency_id in edges]},
+        event_id=logged[-1].pk,
+    )
+
+
+@receiver(post_save, sender=TaskDocument)
+@receiver(post_delete, sender=TaskDocument)
+def log_document_changed(sender, instance, created=True, raw=False, **kwargs):
+    # Task lists embed document summaries, so a new or removed document is a
+    # task change: it moves the project version (ETags) and the delta feed
+    if raw or not created:
+        return
+    project_id = Task.all_objects.filter(pk=instance.task_id).values_list('project_id', flat=True).first()
+    TaskChange.objects.create(project_id=project_id, task_id=instance.task_id, action=TaskChange.UPSERT)
+
+
+@receiver(post_delete, sender=TaskDocument)
+def release_document_blob(sender, instance, **kwargs):
+    # Cascades from task and project deletes come through here too
+    release_document_files([(instance.blob_id, instance.file.name)])
@@ -0,0 +1,126 @@
+"""
+Server-sent event stream of a project's task changes (ASGI only).
+
+    GET /api/projects/<project_id>/events/?token=<JWT access token>
+
+EventSource cannot send an Authorization header, so the access token may be
+passed as a query parameter instead. The stream starts with a ``ready``
+event carrying the current change-log cursor, then forwards task.created,
+task.updated, task.deleted, dependency.added, dependency.removed,
+subtree.cloned, subtree.moved, subtree.deleted, subtree.restored,
+tasks.created, tasks.archived, tasks.restored and cpm.recalculated events.
+A comment line is sent periodically to keep proxies from closing idle
+connections.
+"""
+import asyncio
+import re
+from urllib.parse import parse_qs
+from asgiref.sync import sync_to_async
+from django.db.models import Max, Q
+from .events import broker, encode_event
+
+EVENTS_PATH = re.compile(r'^/api/projects/(?P<project_id>\d+)/events/?$')
+
+HEARTBEAT_SECONDS = 20
+
+
+def _authenticate(token):
+    from rest_framework_simplejwt.authentication import JWTAuthentication
+    from rest_framework_simplejwt.exceptions import InvalidToken, AuthenticationFailed
+
+    authentication = JWTAuthentication()
+    try:
+        return authentication.get_user(authentication.get_validated_token(token))
+    except (InvalidToken, AuthenticationFailed):
+        return None
+
+
+def _project_access(user, project_id):
+    """Return the current change cursor if the user may read the project, else None"""
+    from project.models import Project
+    from .models import TaskChange
+
+    projects = Project.objects.filter(pk=project_id)
+    if user.designation != 'admin':
+        projects = projects.filter(Q(owner=user) | Q(members=user))
+    if not projects.exists():
+        return None
+    return TaskChange.objects.filter(project_id=project_id).aggregate(cursor=Max('id'))['cursor'] or 0
+
+
+def _token_from_scope(scope):
+    for name, value in scope.get('headers', []):
+        if name == b'authorization':
+            parts = value.decode('latin-1').split()
+            if len(parts) == 2 and parts[0] == 'Bearer':
+                return parts[1]
+    query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+    return (query.get('token') or [None])[0]
+
+
+async def _respond(send, status, body):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json')],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def _pump(send, queue):
+    while True:
+        try:
+            message = await asyncio.wait_for(queue.get(), timeout=HEARTBEAT_SECONDS)
+        except asyncio.TimeoutError:
+            message = b': keepalive\n\n'
+        await send({'type': 'http.response.body', 'body': message, 'more_body': True})
+
+
+async def project_events_app(scope, receive, send):
+    """ASGI application serving /api/projects/<id>/events/"""
+    match = EVENTS_PATH.match(scope['path'])
+    project_id = int(match.group('project_id'))
+
+    if scope['method'] != 'GET':
+        await _respond(send, 405, b'{"error": "Method not allowed"}')
+        return
+
+    token = _token_from_scope(scope)
+    user = await sync_to_async(_authenticate)(token) if token else None
+    if user is None:
+        await _respond(send, 401, b'{"error": "Authentication credentials were not provided or are invalid"}')
+        return
+
+    cursor = await sync_to_async(_project_access)(user, project_id)
+    if cursor is None:
+        await _respond(send, 404, b'{"error": "Project not found"}')
+        return
+
+    queue = broker.subscribe(project_id)
+    pump = None
+    try:
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'text/event-stream'),
+                (b'cache-control', b'no-cache'),
+                # Stop nginx from buffering the stream
+                (b'x-accel-buffering', b'no'),
+            ],
+        })
+        await send({
+            'type': 'http.response.body',
+            'body': b'retry: 5000\n' + encode_event('ready', {'project_id': project_id, 'cursor': cursor}),
+            'more_body': True,
+        })
+
+        pump = asyncio.ensure_future(_pump(send, queue))
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                break
+    finally:
+        if pump is not None:
+            pump.cancel()
+        broker.unsubscribe(project_id, queue)
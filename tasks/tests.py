@@ -1,3 +1,766 @@
-from django.test import TestCase
+import io
+import re
+import shutil
+import tempfile
+from datetime import date, timedelta
+from itertools import combinations
+from unittest import mock
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Max
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from openpyxl import Workbook
+from rest_framework.test import APIClient
+from project.models import Project
+from users.models import CustomUser
+from .archive import archivable_tasks, archive_tasks
+from .blobs import recount_references, storage_report
+from .exports import write_tasks_xlsx
+from .filters import apply_task_filters
+from .hierarchy import clone_subtree, move_subtree, restore_subtree, soft_delete_subtree, subtree_filter
+from .imports import KEY_HEADER, TASK_IMPORT_HEADERS, create_tasks, parse_task_sheet
+from .models import ArchivedTask, DocumentBlob, RecurringTaskTemplate, Task, TaskActivity, TaskChange, TaskDocument
+from .recurrence import _insert_occurrences, materialize_occurrences, occurrence_dates, parse_weekdays
+from .versioning import get_project_version
 
-# Create your tests here.
+
+class TaskFilterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create(username='filter-user', email='filter@example.com')
+        cls.project = Project.objects.create(name='Filters', key='FLT', owner=cls.user)
+        today = timezone.localdate()
+        cls.overdue = Task.objects.create(
+            title='Overdue', project=cls.project, status='In Progress', priority='High',
+            assignee=cls.user, start_date=today - timedelta(days=10), due_date=today - timedelta(days=1)
+        )
+        cls.done = Task.objects.create(
+            title='Done late', project=cls.project, status='Done', priority='Low',
+            start_date=today - timedelta(days=10), due_date=today - timedelta(days=2)
+        )
+        cls.upcoming = Task.objects.create(
+            title='Upcoming', project=cls.project, status='To Do', priority='Medium',
+            assignee=cls.user, start_date=today + timedelta(days=30), due_date=today + timedelta(days=40)
+        )
+
+    def filtered(self, **params):
+        return set(apply_task_filters(Task.objects.all(), params).values_list('id', flat=True))
+
+    def test_status_priority_and_assignee(self):
+        self.assertEqual(self.filtered(project_id=self.project.id, status='To Do,Done'), {self.done.id, self.upcoming.id})
+        self.assertEqual(self.filtered(project_id=self.project.id, priority='High'), {self.overdue.id})
+        self.assertEqual(self.filtered(assignee_id=str(self.user.id)), {self.overdue.id, self.upcoming.id})
+        self.assertEqual(self.filtered(project_id=self.project.id, assignee_id='none'), {self.done.id})
+
+    def test_date_filters(self):
+        today = timezone.localdate()
+        self.assertEqual(self.filtered(project_id=self.project.id, overdue='true'), {self.overdue.id})
+        self.assertEqual(
+            self.filtered(project_id=self.project.id, due_after=str(today), due_before=str(today + timedelta(days=60))),
+            {self.upcoming.id}
+        )
+        week_start = today - timedelta(days=today.weekday())
+        expected = {
+            task.id for task in (self.overdue, self.done, self.upcoming)
+            if week_start <= task.due_date <= week_start + timedelta(days=6)
+        }
+        self.assertEqual(self.filtered(project_id=self.project.id, due_this_week='1'), expected)
+
+
+class TaskFilterQueryPlanTests(TestCase):
+    """Every supported filter combination must be answered from an index"""
+
+    SCOPES = [
+        {'project_id': '1'},
+        {'assignee_id': '1'},
+        {'project_id': '1', 'assignee_id': '1'},
+    ]
+    FILTERS = {
+        'status': 'To Do,In Progress',
+        'priority': 'High',
+        'due_after': '2025-01-01',
+        'due_before': '2025-12-31',
+        'overdue': 'true',
+        'due_this_week': 'true',
+    }
+
+    def assert_uses_index(self, params):
+        queryset = apply_task_filters(Task.objects.all(), params)
+        if connection.vendor != 'sqlite':
+            self.skipTest('Query plan assertions are written for SQLite')
+        plan = queryset.explain()
+        # A full table scan shows up as "SCAN tasks_task" without a usable index
+        self.assertIsNone(
+            re.search(r'SCAN tasks_task\b(?! USING (COVERING )?INDEX)', plan),
+            f"{params} scans tasks_task:\n{plan}"
+        )
+        self.assertIn('USING', plan, f"{params} does not use an index:\n{plan}")
+
+    def test_every_filter_combination_uses_an_index(self):
+        names = list(self.FILTERS)
+        for scope in self.SCOPES:
+            for size in range(len(names) + 1):
+                for combo in combinations(names, size):
+                    params = dict(scope, **{name: self.FILTERS[name] for name in combo})
+                    with self.subTest(params=params):
+                        self.assert_uses_index(params)
+
+
+class TemporaryMediaMixin:
+    """Stores uploads under a throwaway MEDIA_ROOT for the length of each test"""
+
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp(prefix='planora-tests-')
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+
+class DocumentDownloadTests(TemporaryMediaMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = CustomUser.objects.create(username='download-user', email='download@example.com')
+        project = Project.objects.create(name='Downloads', key='DWN', owner=self.user)
+        self.task = Task.objects.create(title='Attachments', project=project)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def download(self, name, content, content_type, query=''):
+        upload = ContentFile(content, name=name)
+        upload.content_type = content_type
+        response = self.client.post(f'/api/tasks/{self.task.id}/upload_document/', {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 201, response.data)
+        return self.client.get(response.data['download_url'].split('?')[0] + query)
+
+    def test_html_and_svg_are_attachments(self):
+        for name, content, content_type in (
+            ('page.html', b'<html><script>alert(1)</script></html>', 'text/html'),
+            ('logo.svg', b'<svg xmlns="http://www.w3.org/2000/svg"><script>alert(1)</script></svg>', 'image/svg+xml'),
+            # Claimed image type, HTML bytes
+            ('fake.png', b'<html><script>alert(1)</script></html>', 'image/png'),
+        ):
+            with self.subTest(name=name):
+                response = self.download(name, content, content_type)
+                self.assertEqual(response['Content-Type'], 'application/octet-stream')
+                self.assertTrue(response['Content-Disposition'].startswith('attachment'))
+                self.assertEqual(response['X-Content-Type-Options'], 'nosniff')
+
+    def test_images_and_pdfs_are_inline_and_sandboxed(self):
+        for name, content, content_type in (
+            ('photo.png', b'\x89PNG\r\n\x1a\n' + b'\0' * 32, 'image/png'),
+            ('report.pdf', b'%PDF-1.7\n' + b'\0' * 32, 'text/html'),
+        ):
+            with self.subTest(name=name):
+                response = self.download(name, content, content_type)
+                self.assertEqual(response['Content-Type'], 'application/pdf' if name.endswith('.pdf') else 'image/png')
+                self.assertTrue(response['Content-Disposition'].startswith('inline'))
+                self.assertEqual(response['Content-Security-Policy'], 'sandbox')
+                self.assertEqual(response['X-Content-Type-Options'], 'nosniff')
+
+        response = self.download('again.pdf', b'%PDF-1.4\n', 'application/pdf', query='?download=1')
+        self.assertTrue(response['Content-Disposition'].startswith('attachment'))
+        self.assertNotIn('Content-Security-Policy', response)
+
+
+class SubtreeTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create(username='tree-user', email='tree@example.com')
+        self.project = Project.objects.create(name='Tree', key='TRE', owner=self.user)
+        self.root = Task.objects.create(title='Root', project=self.project)
+        self.child = Task.objects.create(title='Child', project=self.project, parent_task=self.root)
+        self.grandchild = Task.objects.create(title='Grandchild', project=self.project, parent_task=self.child)
+        self.target = Task.objects.create(title='Target', project=self.project)
+
+    def changes_since(self, cursor):
+        return set(TaskChange.objects.filter(id__gt=cursor).values_list('task_id', 'action'))
+
+    def test_move_within_project_logs_every_moved_task(self):
+        cursor = TaskChange.objects.aggregate(latest=Max('id'))['latest']
+        before = Task.objects.get(pk=self.grandchild.pk).updated_at
+        move_subtree(self.root, parent=self.target)
+
+        grandchild = Task.objects.get(pk=self.grandchild.pk)
+        self.assertEqual((grandchild.path, grandchild.depth), (f'/{self.target.pk}/{self.root.pk}/{self.child.pk}/', 3))
+        self.assertGreater(grandchild.updated_at, before)
+        self.assertEqual(self.changes_since(cursor), {
+            (task.pk, TaskChange.UPSERT) for task in (self.root, self.child, self.grandchild)
+        })
+
+    def counts(self, task):
+        task = Task.all_objects.get(pk=task.pk)
+        return task.predecessor_count, task.successor_count
+
+    def test_move_within_project_keeps_dependencies(self):
+        self.grandchild.dependencies.add(self.child)
+        self.child.dependencies.add(self.target)
+        move_subtree(self.child, parent=None)
+
+        child, grandchild = Task.objects.get(pk=self.child.pk), Task.objects.get(pk=self.grandchild.pk)
+        self.assertEqual((child.parent_task_id, child.path, child.depth), (None, '/', 0))
+        self.assertEqual((grandchild.path, grandchild.depth), (f'/{self.child.pk}/', 1))
+        self.assertEqual(set(child.dependencies.values_list('id', flat=True)), {self.target.pk})
+        self.assertEqual(self.counts(self.target), (0, 1))
+        with self.assertRaises(ValueError):
+            move_subtree(self.root, parent=self.grandchild)
+
+    def test_move_across_projects_drops_crossing_edges(self):
+        other = Project.objects.create(name='Other tree', key='OTR', owner=self.user)
+        dependent = Task.objects.create(title='Dependent', project=self.project)
+        self.grandchild.dependencies.add(self.child)
+        self.child.dependencies.add(self.target)
+        dependent.dependencies.add(self.root)
+        cursor = TaskChange.objects.aggregate(latest=Max('id'))['latest']
+
+        move_subtree(self.root, project=other)
+
+        moved = {self.root.pk, self.child.pk, self.grandchild.pk}
+        self.assertEqual(set(Task.objects.filter(project=other).values_list('id', flat=True)), moved)
+        through = Task.dependencies.through
+        self.assertEqual(
+            set(through.objects.filter(from_task_id__in=moved | {dependent.pk}).values_list('from_task_id', 'to_task_id')),
+            {(self.grandchild.pk, self.child.pk)}
+        )
+        self.assertEqual(self.counts(self.target), (0, 0))
+        self.assertEqual(self.counts(dependent), (0, 0))
+        self.assertEqual(self.counts(self.child), (0, 1))
+        self.assertEqual(self.counts(self.grandchild), (1, 0))
+        changes = TaskChange.objects.filter(id__gt=cursor)
+        self.assertEqual(
+            set(changes.filter(action=TaskChange.DELETE).values_list('project_id', 'task_id')),
+            {(self.project.pk, task_id) for task_id in moved}
+        )
+        self.assertEqual(
+            set(changes.filter(action=TaskChange.DEPENDENCY_REMOVE).values_list('task_id', 'dependency_id')),
+            {(self.child.pk, self.target.pk), (dependent.pk, self.root.pk)}
+        )
+
+    def test_clone_remaps_the_subtree(self):
+        self.grandchild.dependencies.add(self.child)
+        self.child.dependencies.add(self.target)
+        clone = clone_subtree(self.root, parent=self.target)
+
+        copies = {task.title: task for task in Task.objects.filter(subtree_filter(clone))}
+        self.assertEqual(set(copies), {'Root', 'Child', 'Grandchild'})
+        child, grandchild = copies['Child'], copies['Grandchild']
+        self.assertEqual((clone.parent_task_id, clone.depth), (self.target.pk, 1))
+        self.assertEqual((child.parent_task_id, grandchild.parent_task_id), (clone.pk, child.pk))
+        self.assertEqual(grandchild.path, f'/{self.target.pk}/{clone.pk}/{child.pk}/')
+        self.assertEqual(set(grandchild.dependencies.values_list('id', flat=True)), {child.pk})
+        # The predecessor outside the subtree is shared within the project
+        self.assertEqual(set(child.dependencies.values_list('id', flat=True)), {self.target.pk})
+        self.assertEqual(self.counts(self.target), (0, 2))
+        self.assertEqual(len({task.task_number for task in Task.objects.filter(project=self.project)}), 7)
+
+        other = Project.objects.create(name='Clone target', key='CLT', owner=self.user)
+        copy = clone_subtree(self.root, project=other)
+        copied_child = Task.objects.get(project=other, title='Child')
+        self.assertEqual((copy.project_id, copy.parent_task_id), (other.pk, None))
+        self.assertFalse(copied_child.dependencies.exists())
+
+    def test_soft_delete_and_restore_round_trip(self):
+        dependent = Task.objects.create(title='Dependent', project=self.project)
+        dependent.dependencies.add(self.child)
+        self.child.dependencies.add(self.target)
+        # Deleted on its own first, so restoring the root leaves it deleted
+        soft_delete_subtree(Task.objects.get(pk=self.grandchild.pk))
+
+        self.assertEqual(soft_delete_subtree(Task.objects.get(pk=self.root.pk)), 2)
+        self.assertFalse(Task.objects.filter(pk__in=[self.root.pk, self.child.pk, self.grandchild.pk]).exists())
+        self.assertEqual(self.counts(dependent), (0, 0))
+        self.assertEqual(self.counts(self.target), (0, 0))
+
+        self.assertEqual(restore_subtree(Task.all_objects.get(pk=self.root.pk)), 2)
+        self.assertEqual(
+            set(Task.objects.filter(subtree_filter(self.root)).values_list('id', flat=True)),
+            {self.root.pk, self.child.pk}
+        )
+        self.assertEqual(self.counts(dependent), (1, 0))
+        self.assertEqual(self.counts(self.target), (0, 1))
+        self.assertEqual(self.counts(self.child), (1, 1))
+        # A subtask only comes back under a live parent
+        soft_delete_subtree(Task.objects.get(pk=self.child.pk))
+        with self.assertRaises(ValueError):
+            restore_subtree(Task.all_objects.get(pk=self.grandchild.pk))
+
+    def test_reparent_through_save_logs_every_moved_task(self):
+        cursor = TaskChange.objects.aggregate(latest=Max('id'))['latest']
+        self.child.parent_task = self.target
+        self.child.save()
+
+        grandchild = Task.objects.get(pk=self.grandchild.pk)
+        self.assertEqual((grandchild.path, grandchild.depth), (f'/{self.target.pk}/{self.child.pk}/', 2))
+        self.assertEqual(self.changes_since(cursor), {
+            (self.child.pk, TaskChange.UPSERT), (self.grandchild.pk, TaskChange.UPSERT)
+        })
+
+
+class ArchiveAccessTests(TestCase):
+    def setUp(self):
+        self.owner = CustomUser.objects.create(username='archive-owner', email='archive-owner@example.com')
+        self.outsider = CustomUser.objects.create(username='archive-outsider', email='archive-outsider@example.com')
+        self.project = Project.objects.create(name='Archive', key='ARC', owner=self.owner, status='Completed')
+        self.archived = Task.objects.create(title='Archived', project=self.project)
+        archive_tasks(archivable_tasks([self.project.pk]))
+        self.deleted = Task.objects.create(title='Deleted', project=self.project)
+        soft_delete_subtree(self.deleted)
+
+    def client_for(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def test_outsiders_cannot_browse_or_restore(self):
+        client = self.client_for(self.outsider)
+        self.assertEqual(client.get(f'/api/tasks/archived/?project_id={self.project.pk}').status_code, 404)
+        self.assertEqual(client.post('/api/tasks/restore_archived/', {'project_id': self.project.pk}, format='json').status_code, 404)
+        self.assertEqual(client.post('/api/tasks/restore_archived/', {'task_ids': [self.archived.pk]}, format='json').status_code, 404)
+        self.assertEqual(client.post(f'/api/tasks/{self.deleted.pk}/restore/').status_code, 404)
+        self.assertTrue(ArchivedTask.objects.filter(pk=self.archived.pk).exists())
+        self.assertFalse(Task.objects.filter(pk=self.deleted.pk).exists())
+        self.assertEqual(APIClient().get(f'/api/tasks/archived/?project_id={self.project.pk}').status_code, 401)
+
+    def test_owner_can_browse_and_restore(self):
+        client = self.client_for(self.owner)
+        response = client.get(f'/api/tasks/archived/?project_id={self.project.pk}')
+        self.assertEqual([row['id'] for row in response.data['results']], [self.archived.pk])
+        self.assertEqual(client.post('/api/tasks/restore_archived/', {'task_ids': [self.archived.pk]}, format='json').data, {'restored': 1})
+        self.assertEqual(client.post(f'/api/tasks/{self.deleted.pk}/restore/').status_code, 200)
+        self.assertEqual(Task.objects.filter(pk__in=[self.archived.pk, self.deleted.pk]).count(), 2)
+
+
+class ActivityFeedAccessTests(TestCase):
+    def test_feed_only_covers_the_callers_projects(self):
+        user = CustomUser.objects.create(username='feed-user', email='feed@example.com')
+        other = CustomUser.objects.create(username='feed-other', email='feed-other@example.com')
+        shared = Project.objects.create(name='Shared', key='SHR', owner=other)
+        shared.members.add(user)
+        private = Project.objects.create(name='Private', key='PRV', owner=other)
+        for project in (shared, private):
+            TaskActivity.log_created([Task.objects.create(title=project.name, project=project)], actor=other)
+
+        client = APIClient()
+        client.force_authenticate(user)
+        feed = client.get(f'/api/tasks/activity/?user_id={other.pk}').data['results']
+        self.assertEqual({row['project'] for row in feed}, {shared.pk})
+        self.assertEqual(client.get(f'/api/tasks/activity/?project_id={private.pk}').data['results'], [])
+        self.assertEqual(len(client.get(f'/api/tasks/activity/?project_id={shared.pk}').data['results']), 1)
+
+
+class TaskCreateTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create(username='create-user', email='create@example.com')
+        self.project = Project.objects.create(name='Create', key='CRT', owner=self.user)
+        self.parent = Task.objects.create(title='Parent', project=self.project)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_subtask_without_project_joins_its_parent(self):
+        response = self.client.post('/api/tasks/', {'title': 'Child', 'parent_task_id': self.parent.pk}, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        child = Task.objects.get(title='Child')
+        self.assertEqual((child.project_id, child.parent_task_id, child.depth), (self.project.pk, self.parent.pk, 1))
+
+    def test_subtask_in_another_project_is_rejected(self):
+        other = Project.objects.create(name='Other', key='OTH', owner=self.user)
+        response = self.client.post(
+            '/api/tasks/', {'title': 'Child', 'parent_task_id': self.parent.pk, 'project_id': other.pk}, format='json'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('parent_task_id', response.data)
+
+
+class TimelineTests(TestCase):
+    def test_window_tiles_are_capped_and_paged(self):
+        user = CustomUser.objects.create(username='timeline-user', email='timeline@example.com')
+        project = Project.objects.create(name='Timeline', key='TML', owner=user)
+        start = timezone.localdate()
+        tasks = Task.objects.bulk_create([
+            Task(title=f'Task {index}', project=project, task_number=f'TML-{index:04d}',
+                 start_date=start, due_date=start + timedelta(days=index % 3))
+            for index in range(7)
+        ])
+        client = APIClient()
+        client.force_authenticate(user)
+        url = f'/api/tasks/timeline/?project_id={project.pk}&start={start}&end={start + timedelta(days=5)}'
+
+        pages, row_start = [], 0
+        with mock.patch('tasks.views.MAX_TILE_ROWS', 3):
+            while row_start is not None:
+                response = client.get(f'{url}&row_start={row_start}')
+                pages.append([bar['id'] for bar in response.data['tasks']])
+                row_start = response.data['next_row_start']
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        self.assertEqual(sum(pages, []), [task.pk for task in tasks])
+
+
+class ArchiveRoundTripTests(TemporaryMediaMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = CustomUser.objects.create(username='archive-user', email='archive-user@example.com')
+        self.project = Project.objects.create(name='Archive trip', key='ATR', owner=self.user, status='Completed')
+        self.root = Task.objects.create(title='Root', project=self.project)
+        self.child = Task.objects.create(title='Child', project=self.project, parent_task=self.root)
+        self.sibling = Task.objects.create(title='Sibling', project=self.project)
+        self.child.dependencies.add(self.sibling)
+        self.sibling.dependencies.add(self.root)
+
+        client = APIClient()
+        client.force_authenticate(self.user)
+        for task in (self.root, self.child):
+            response = client.post(
+                f'/api/tasks/{task.id}/upload_document/', {'file': ContentFile(b'%PDF-1.4 shared', name='spec.pdf')},
+                format='multipart'
+            )
+            self.assertEqual(response.status_code, 201, response.data)
+        self.documents = list(TaskDocument.objects.order_by('id').values('id', 'task_id', 'blob_id', 'file'))
+
+    def test_archive_and_restore_keep_ids_edges_and_blobs(self):
+        blob = DocumentBlob.objects.get()
+        self.assertEqual(blob.ref_count, 2)
+        ids = {self.root.pk, self.child.pk, self.sibling.pk}
+        edges = {(self.child.pk, self.sibling.pk), (self.sibling.pk, self.root.pk)}
+        through = Task.dependencies.through
+
+        call_command('archive_tasks', project_id=[self.project.pk], stdout=io.StringIO())
+        self.assertFalse(Task.all_objects.filter(pk__in=ids).exists())
+        self.assertFalse(TaskDocument.objects.exists())
+        self.assertEqual(set(ArchivedTask.objects.values_list('id', flat=True)), ids)
+        self.assertEqual(ArchivedTask.objects.get(pk=self.child.pk).dependency_ids, [self.sibling.pk])
+        # Archived documents keep their blob reference and its file
+        recount_references()
+        blob.refresh_from_db()
+        self.assertEqual(blob.ref_count, 2)
+        self.assertTrue(blob.file.storage.exists(blob.file.name))
+
+        call_command('archive_tasks', restore_project=self.project.pk, stdout=io.StringIO())
+        self.assertFalse(ArchivedTask.objects.exists())
+        restored = {task.pk: task for task in Task.objects.filter(project=self.project)}
+        self.assertEqual(set(restored), ids)
+        self.assertEqual(restored[self.child.pk].parent_task_id, self.root.pk)
+        self.assertEqual(restored[self.child.pk].task_number, self.child.task_number)
+        self.assertEqual(set(through.objects.filter(from_task_id__in=ids).values_list('from_task_id', 'to_task_id')), edges)
+        self.assertEqual(
+            (restored[self.sibling.pk].predecessor_count, restored[self.sibling.pk].successor_count), (1, 1)
+        )
+        self.assertEqual(list(TaskDocument.objects.order_by('id').values('id', 'task_id', 'blob_id', 'file')), self.documents)
+        recount_references()
+        blob.refresh_from_db()
+        self.assertEqual(blob.ref_count, 2)
+
+
+class RecurrenceTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create(username='recurring-user', email='recurring@example.com')
+        self.project = Project.objects.create(name='Recurring', key='REC', owner=self.user)
+        self.today = date(2026, 1, 5)  # a Monday
+
+    def template(self, **fields):
+        fields.setdefault('start_date', self.today)
+        return RecurringTaskTemplate.objects.create(project=self.project, title='Standup', **fields)
+
+    def day(self, offset):
+        return self.today + timedelta(days=offset)
+
+    def occurrences(self, template):
+        return dict(Task.objects.filter(recurring_template=template).values_list('occurrence_date', 'task_number'))
+
+    def test_rule_subset(self):
+        daily = self.template(frequency=RecurringTaskTemplate.DAILY, interval=2, until=self.day(6))
+        self.assertEqual(occurrence_dates(daily, self.day(0), self.day(30)), [self.day(0), self.day(2), self.day(4), self.day(6)])
+        # A window starting mid-series stays on the interval
+        self.assertEqual(occurrence_dates(daily, self.day(3), self.day(30)), [self.day(4), self.day(6)])
+
+        weekly = self.template(frequency=RecurringTaskTemplate.WEEKLY, interval=2, weekdays='MO,FR')
+        self.assertEqual(occurrence_dates(weekly, self.day(0), self.day(27)), [self.day(0), self.day(4), self.day(14), self.day(18)])
+        self.assertEqual(occurrence_dates(weekly, self.day(7), self.day(20)), [self.day(14), self.day(18)])
+
+        monthly = self.template(frequency=RecurringTaskTemplate.MONTHLY, start_date=date(2026, 1, 31))
+        self.assertEqual(
+            occurrence_dates(monthly, date(2026, 1, 1), date(2026, 4, 30)),
+            [date(2026, 1, 31), date(2026, 2, 28), date(2026, 3, 31), date(2026, 4, 30)]
+        )
+        with self.assertRaises(ValueError):
+            parse_weekdays('MO,XX')
+
+    def test_materialize_is_idempotent(self):
+        template = self.template(frequency=RecurringTaskTemplate.DAILY)
+        self.assertEqual(materialize_occurrences(horizon_days=9, today=self.today), 10)
+        first = self.occurrences(template)
+        self.assertEqual(sorted(first), [self.day(offset) for offset in range(10)])
+
+        self.assertEqual(materialize_occurrences(horizon_days=9, today=self.today), 0)
+        # Even with the resume point lost, nothing is created twice
+        RecurringTaskTemplate.objects.filter(pk=template.pk).update(materialized_until=None)
+        self.assertEqual(materialize_occurrences(horizon_days=9, today=self.today), 0)
+        self.assertEqual(self.occurrences(template), first)
+        self.assertEqual(TaskChange.objects.filter(task_id__in=Task.objects.values('id'), action=TaskChange.UPSERT).count(), 10)
+
+    def test_existing_occurrences_are_skipped_and_numbers_follow_the_rows(self):
+        standup = self.template(frequency=RecurringTaskTemplate.DAILY)
+        review = self.template(frequency=RecurringTaskTemplate.WEEKLY, weekdays='WE')
+        existing = Task.objects.create(
+            title='Moved standup', project=self.project, recurring_template=standup,
+            occurrence_date=self.day(1)
+        )
+
+        self.assertEqual(materialize_occurrences(horizon_days=6, today=self.today), 7)
+        standups, reviews = self.occurrences(standup), self.occurrences(review)
+        self.assertEqual(standups[existing.occurrence_date], existing.task_number)
+        self.assertEqual(list(reviews), [self.day(2)])
+        # Numbers are handed out template by template, dates in order
+        new_numbers = [number for day, number in sorted(standups.items()) if day != existing.occurrence_date]
+        self.assertEqual(new_numbers + list(reviews.values()), [f'REC-{index:04d}' for index in range(2, 9)])
+        self.assertEqual(Task.objects.get(task_number=reviews[self.day(2)]).title, 'Standup')
+
+    def test_insert_skips_only_occurrence_clashes(self):
+        template = self.template(frequency=RecurringTaskTemplate.DAILY)
+        taken = Task.objects.create(title='Taken', project=self.project, recurring_template=template, occurrence_date=self.today)
+        _insert_occurrences([(template, self.today, 'REC-0100'), (template, self.day(1), 'REC-0101')])
+        self.assertEqual(self.occurrences(template), {self.today: taken.task_number, self.day(1): 'REC-0101'})
+
+        # A task_number clash is not an occurrence clash: the batch fails instead of losing the row
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            _insert_occurrences([(template, self.day(2), taken.task_number)])
+        self.assertEqual(len(self.occurrences(template)), 2)
+
+
+class BlobStoreTests(TemporaryMediaMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = CustomUser.objects.create(username='blob-user', email='blob@example.com')
+        self.project = Project.objects.create(name='Blobs', key='BLB', owner=self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def upload(self, task, content=b'same bytes', name='notes.txt'):
+        response = self.client.post(
+            f'/api/tasks/{task.id}/upload_document/', {'file': ContentFile(content, name=name)}, format='multipart'
+        )
+        self.assertEqual(response.status_code, 201, response.data)
+        return TaskDocument.objects.get(pk=response.data['id'])
+
+    def blob_state(self, blob):
+        """(ref_count or None once the row is gone, whether the file is still stored)"""
+        ref_count = DocumentBlob.objects.filter(pk=blob.pk).values_list('ref_count', flat=True).first()
+        return ref_count, blob.file.storage.exists(blob.file.name)
+
+    def test_identical_uploads_share_one_blob(self):
+        first = self.upload(Task.objects.create(title='One', project=self.project))
+        second = self.upload(Task.objects.create(title='Two', project=self.project), name='copy.txt')
+        other = self.upload(Task.objects.create(title='Three', project=self.project), content=b'other bytes')
+
+        self.assertEqual(first.blob_id, second.blob_id)
+        self.assertNotEqual(first.blob_id, other.blob_id)
+        self.assertEqual(self.blob_state(first.blob), (2, True))
+        self.assertEqual(first.file.name, second.file.name)
+        self.assertEqual(storage_report()['saved_bytes'], len(b'same bytes'))
+
+    def test_every_delete_path_releases_the_blob(self):
+        tasks = [Task.objects.create(title=f'Task {index}', project=self.project) for index in range(3)]
+        documents = [self.upload(task) for task in tasks]
+        blob = documents[0].blob
+        self.assertEqual(self.blob_state(blob), (3, True))
+
+        response = self.client.delete(f'/api/tasks/{tasks[0].id}/delete_document/{documents[0].id}/')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.blob_state(blob), (2, True))
+
+        # Task cascade (hard delete; the API's soft delete keeps documents for a restore)
+        Task.all_objects.get(pk=tasks[1].pk).delete()
+        self.assertEqual(self.blob_state(blob), (1, True))
+
+        # Project cascade takes the last reference, and the file goes on commit
+        with self.captureOnCommitCallbacks(execute=True):
+            self.project.delete()
+        self.assertEqual(self.blob_state(blob), (None, False))
+
+    def test_recount_repairs_drifted_counts(self):
+        document = self.upload(Task.objects.create(title='Drift', project=self.project))
+        DocumentBlob.objects.filter(pk=document.blob_id).update(ref_count=5)
+        recount_references()
+        self.assertEqual(self.blob_state(document.blob), (1, True))
+
+        TaskDocument.objects.filter(pk=document.pk).update(blob=None)
+        with self.captureOnCommitCallbacks(execute=True):
+            recount_references()
+        self.assertEqual(self.blob_state(document.blob), (None, False))
+
+
+class TaskImportTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create(username='import-user', email='import@example.com')
+        self.project = Project.objects.create(name='Import', key='IMP', owner=self.user)
+
+    def sheet(self, *rows, key_column=False):
+        """An .xlsx file with the import headers; rows are {header: value} dicts"""
+        headers = TASK_IMPORT_HEADERS + ([KEY_HEADER] if key_column else [])
+        workbook = Workbook()
+        workbook.active.append(headers)
+        for row in rows:
+            workbook.active.append([row.get(header) for header in headers])
+        file = io.BytesIO()
+        workbook.save(file)
+        file.seek(0)
+        return file
+
+    def import_sheet(self, file):
+        rows, errors = parse_task_sheet(file, self.project.pk)
+        created = create_tasks(self.project, rows, actor=self.user)
+        return {task.title: task for task in created}, errors
+
+    def test_forward_references_by_row_and_key(self):
+        tasks, errors = self.import_sheet(self.sheet(
+            {'Title': 'Build', 'Parent Task ID': '#4', 'Dependencies (IDs)': 'design'},
+            {'Title': 'Ship', 'Dependencies (IDs)': '#2, design'},
+            {'Title': 'Design', 'Key': 'design'},
+            key_column=True,
+        ))
+        self.assertEqual(errors, [])
+        build, ship, design = tasks['Build'], tasks['Ship'], tasks['Design']
+        build.refresh_from_db()
+        self.assertEqual((build.parent_task_id, build.path, build.depth), (design.pk, f'/{design.pk}/', 1))
+        self.assertEqual(set(build.dependencies.values_list('id', flat=True)), {design.pk})
+        self.assertEqual(set(ship.dependencies.values_list('id', flat=True)), {build.pk, design.pk})
+        self.assertEqual(Task.objects.get(pk=design.pk).successor_count, 2)
+        self.assertEqual(
+            TaskChange.objects.filter(action=TaskChange.DEPENDENCY_ADD, project_id=self.project.pk).count(), 3
+        )
+        self.assertEqual(TaskActivity.objects.filter(verb=TaskActivity.CREATED, actor=self.user).count(), 3)
+
+    def test_cycles_are_reported_per_row(self):
+        tasks, errors = self.import_sheet(self.sheet(
+            {'Title': 'Loop A', 'Parent Task ID': '#3'},
+            {'Title': 'Loop B', 'Parent Task ID': '#2'},
+            {'Title': 'Under loop', 'Parent Task ID': '#2'},
+            {'Title': 'First', 'Dependencies (IDs)': '#6'},
+            {'Title': 'Second', 'Dependencies (IDs)': '#5'},
+        ))
+        self.assertEqual(set(tasks), {'First', 'Second'})
+        self.assertEqual([error.split(':')[0] for error in errors], ['Row 2', 'Row 3', 'Row 4', 'Row 6'])
+        self.assertIn('Parent rows form a cycle', errors[0])
+        self.assertIn('Parent row 2 was not imported', errors[2])
+        self.assertIn('dependency on row 5 dropped', errors[3])
+        self.assertFalse(Task.objects.filter(title__startswith='Loop').exists())
+        # The edge declared furthest down the sheet is the one dropped
+        self.assertEqual(set(tasks['First'].dependencies.values_list('id', flat=True)), {tasks['Second'].pk})
+        self.assertFalse(tasks['Second'].dependencies.exists())
+
+    def test_failed_insert_leaves_nothing_behind(self):
+        rows, _ = parse_task_sheet(self.sheet({'Title': 'Parent'}, {'Title': 'Child', 'Parent Task ID': '#2'}), self.project.pk)
+
+        def cancel(done, total):
+            if done == total:
+                raise RuntimeError('cancelled')
+
+        with self.assertRaises(RuntimeError):
+            create_tasks(self.project, rows, actor=self.user, progress=cancel)
+        self.assertFalse(Task.all_objects.exists())
+        self.assertFalse(TaskChange.objects.exists())
+
+    def test_export_reimports_with_its_id_column(self):
+        parent = Task.objects.create(title='Parent', project=self.project, assignee=self.user, priority='High')
+        child = Task.objects.create(title='Child', project=self.project, parent_task=parent, status='In Progress')
+        child.dependencies.add(parent)
+        export = io.BytesIO()
+        write_tasks_xlsx(Task.objects.filter(project=self.project), export)
+        export.seek(0)
+
+        tasks, errors = self.import_sheet(export)
+        self.assertEqual(errors, [])
+        copies = Task.objects.filter(pk__in=[task.pk for task in tasks.values()])
+        fields = ('title', 'status', 'priority', 'start_date', 'due_date', 'progress', 'assignee_id', 'parent_task_id')
+        self.assertEqual(
+            sorted(copies.values_list(*fields)),
+            sorted(Task.objects.filter(pk__in=[parent.pk, child.pk]).values_list(*fields))
+        )
+        # Exported ids refer to the existing tasks
+        self.assertEqual(set(tasks['Child'].dependencies.values_list('id', flat=True)), {parent.pk})
+
+
+class ProjectVersionTests(TemporaryMediaMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = CustomUser.objects.create(username='version-user', email='version@example.com')
+        self.member = CustomUser.objects.create(username='version-member', email='member@example.com')
+        self.project = Project.objects.create(name='Versions', key='VER', owner=self.user)
+        self.task = Task.objects.create(title='Task', project=self.project)
+        self.other = Task.objects.create(title='Other', project=self.project)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def etag(self):
+        response = self.client.get('/api/tasks/all_tasks/', {'project_id': self.project.pk})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['ETag'], get_project_version(self.project.pk).etag)
+        return response['ETag']
+
+    def assertETagChanges(self, change):
+        before = self.etag()
+        change()
+        after = self.etag()
+        self.assertNotEqual(before, after)
+        response = self.client.get('/api/tasks/all_tasks/', {'project_id': self.project.pk}, HTTP_IF_NONE_MATCH=before)
+        self.assertEqual(response.status_code, 200)
+
+    def test_unchanged_project_answers_304(self):
+        etag = self.etag()
+        response = self.client.get('/api/tasks/all_tasks/', {'project_id': self.project.pk}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        stats = self.client.get(f'/api/projects/{self.project.pk}/stats/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(stats.status_code, 304)
+        # Changes elsewhere leave this project's version alone
+        Task.objects.create(title='Elsewhere', project=Project.objects.create(name='Other', key='OTH', owner=self.user))
+        self.assertEqual(self.etag(), etag)
+
+    def test_task_changes_move_the_etag(self):
+        self.assertETagChanges(lambda: self.client.patch(f'/api/tasks/{self.task.pk}/', {'title': 'Renamed'}, format='json'))
+        self.assertETagChanges(lambda: Task.objects.create(title='New', project=self.project))
+        self.assertETagChanges(lambda: self.client.delete(f'/api/tasks/{self.other.pk}/'))
+
+    def test_dependency_changes_move_the_etag(self):
+        self.assertETagChanges(lambda: self.task.dependencies.add(self.other))
+        self.assertETagChanges(lambda: self.task.dependencies.remove(self.other))
+
+    def test_member_changes_move_the_etag(self):
+        path = f'/api/projects/{self.project.pk}/'
+        self.assertETagChanges(lambda: self.client.post(path + 'add_member/', {'user_id': self.member.pk}, format='json'))
+        self.assertETagChanges(lambda: self.client.post(path + 'remove_member/', {'user_id': self.member.pk}, format='json'))
+
+    def test_document_changes_move_the_etag(self):
+        def upload():
+            response = self.client.post(
+                f'/api/tasks/{self.task.pk}/upload_document/',
+                {'file': ContentFile(b'notes', name='notes.txt')}, format='multipart'
+            )
+            self.assertEqual(response.status_code, 201)
+
+        self.assertETagChanges(upload)
+        self.assertETagChanges(lambda: TaskDocument.objects.get(task=self.task).delete())
+
+    def test_changes_feed_collapses_to_the_latest_state(self):
+        snapshot = self.client.get('/api/tasks/changes/', {'project_id': self.project.pk}).data
+        self.assertTrue(snapshot['full'])
+        self.assertEqual({task['id'] for task in snapshot['tasks']}, {self.task.pk, self.other.pk})
+
+        doomed = Task.objects.create(title='Doomed', project=self.project)
+        self.client.patch(f'/api/tasks/{self.task.pk}/', {'title': 'Renamed'}, format='json')
+        self.client.patch(f'/api/tasks/{self.task.pk}/', {'title': 'Renamed again'}, format='json')
+        self.task.dependencies.add(self.other)
+        self.other.dependencies.add(doomed)
+        self.client.delete(f'/api/tasks/{doomed.pk}/')
+        delta = self.client.get('/api/tasks/changes/', {'project_id': self.project.pk, 'since': snapshot['cursor']}).data
+        self.assertFalse(delta['full'])
+        self.assertEqual([(task['id'], task['title']) for task in delta['tasks']], [(self.task.pk, 'Renamed again')])
+        self.assertEqual(delta['deleted'], [doomed.pk])
+        # The edge to the deleted task was added and removed within the page, so only its removal is sent
+        self.assertEqual(delta['dependencies']['added'], [[self.task.pk, self.other.pk]])
+        self.assertEqual(delta['dependencies']['removed'], [[self.other.pk, doomed.pk]])
+        self.assertEqual(delta['cursor'], get_project_version(self.project.pk).change_id)
+
+        caught_up = self.client.get('/api/tasks/changes/', {'project_id': self.project.pk, 'since': delta['cursor']}).data
+        self.assertEqual((caught_up['cursor'], caught_up['tasks'], caught_up['deleted']), (delta['cursor'], [], []))
@@ -0,0 +1,229 @@
+"""
+Background thumbnails for image and PDF documents.
+
+Thumbnails belong to the DocumentBlob, so identical files are rendered
+once. queue_thumbnail() hands a new blob to a small process pool once the
+upload commits; a worker process downscales images with Pillow (decoding
+JPEGs at reduced size via draft()) or renders the first PDF page with
+poppler's pdftoppm, and the parent stores the result and marks the blob.
+Both tools are optional: without them blobs are marked unsupported and the
+frontend falls back to the original file.
+
+The pool is bounded in workers and in queued jobs; jobs that do not fit are
+dropped and picked up later by `manage.py generate_document_thumbnails`.
+
+The worker functions must not touch Django models: the pool uses the spawn
+start method (forking a threaded web server is unsafe), so workers import
+this module without a configured app registry.
+"""
+import io
+import multiprocessing
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from django.conf import settings
+
+THUMBNAIL_SIZE = getattr(settings, 'TASK_THUMBNAIL_SIZE', 320)
+
+THUMBNAIL_WORKERS = getattr(settings, 'TASK_THUMBNAIL_WORKERS', 2)
+
+# Jobs waiting for or running in the pool before new ones are left to the backfill command
+MAX_QUEUED = getattr(settings, 'TASK_THUMBNAIL_MAX_QUEUED', 64)
+
+PDF_RENDER_TIMEOUT = 30
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp')
+
+_executor = None
+_executor_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(MAX_QUEUED)
+
+
+def _kind(file_name):
+    extension = os.path.splitext(file_name)[1].lower()
+    if extension in IMAGE_EXTENSIONS:
+        return 'image'
+    if extension == '.pdf':
+        return 'pdf'
+    return None
+
+
+def _encode(image):
+    """Downscale a Pillow image to fit THUMBNAIL_SIZE and encode it as WebP (PNG without WebP support)"""
+    from PIL import ImageOps, features
+
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail((THUMBNAIL_SIZE, THUMBNAIL_SIZE))
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info or image.mode in ('LA', 'P') else 'RGB')
+    output = io.BytesIO()
+    if features.check('webp'):
+        image.save(output, 'WEBP', quality=80, method=4)
+        return output.getvalue(), '.webp'
+    image.save(output, 'PNG', optimize=True)
+    return output.getvalue(), '.png'
+
+
+def render_thumbnail(path, kind):
+    """
+    Worker process entry point.
+
+    Returns:
+        tuple: (bytes, extension), or None if the needed tool is not installed
+    """
+    if kind == 'image':
+        try:
+            from PIL import Image
+        except ImportError:
+            return None
+        with Image.open(path) as image:
+            # Let the JPEG decoder skip most of the pixels
+            image.draft('RGB', (THUMBNAIL_SIZE * 2, THUMBNAIL_SIZE * 2))
+            image.load()
+            return _encode(image)
+
+    pdftoppm = shutil.which('pdftoppm')
+    if pdftoppm is None:
+        return None
+    with tempfile.TemporaryDirectory() as directory:
+        subprocess.run(
+            [pdftoppm, '-png', '-singlefile', '-f', '1', '-l', '1', '-scale-to', str(THUMBNAIL_SIZE),
+             path, os.path.join(directory, 'page')],
+            check=True, capture_output=True, timeout=PDF_RENDER_TIMEOUT,
+        )
+        with open(os.path.join(directory, 'page.png'), 'rb') as page:
+            data = page.read()
+    try:
+        from PIL import Image
+    except ImportError:
+        return data, '.png'
+    with Image.open(io.BytesIO(data)) as image:
+        image.load()
+        return _encode(image)
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=THUMBNAIL_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+                max_tasks_per_child=100,
+            )
+        return _executor
+
+
+def thumbnail_job(blob):
+    """(path, kind) to render for a blob, or None if it cannot have a thumbnail"""
+    kind = _kind(blob.file.name)
+    if kind is None:
+        return None
+    try:
+        return blob.file.storage.path(blob.file.name), kind
+    except NotImplementedError:
+        # Remote storage: workers only read local files
+        return None
+
+
+def save_thumbnail(blob_id, result, error=None):
+    """Store a worker's result on the blob"""
+    from django.core.files.base import ContentFile
+    from .models import DocumentBlob
+
+    blob = DocumentBlob.objects.filter(pk=blob_id).first()
+    if blob is None:
+        return
+    if error is not None:
+        print(f"❌ Failed to render thumbnail for blob {blob_id}: {error}")
+        blob.thumbnail_status = DocumentBlob.THUMBNAIL_FAILED
+    elif result is None:
+        blob.thumbnail_status = DocumentBlob.THUMBNAIL_UNSUPPORTED
+    else:
+        data, extension = result
+        storage = blob.thumbnail.field.storage
+        if blob.thumbnail:
+            storage.delete(blob.thumbnail.name)
+        blob.thumbnail.name = storage.save(
+            f"task_documents/thumbnails/{blob.sha256[:2]}/{blob.sha256}{extension}", ContentFile(data)
+        )
+        blob.thumbnail_status = DocumentBlob.THUMBNAIL_READY
+    blob.save(update_fields=['thumbnail', 'thumbnail_status'])
+
+
+def _reset_executor():
+    # A worker died (e.g. out of memory) and took the pool with it; start a fresh one next time
+    global _executor
+    with _executor_lock:
+        _executor = None
+
+
+def _store_result(blob_id, future):
+    from django.db import connection
+
+    try:
+        error = future.exception()
+        if isinstance(error, BrokenProcessPool):
+            _reset_executor()
+        save_thumbnail(blob_id, None if error else future.result(), error)
+    except Exception as e:
+        print(f"❌ Failed to store thumbnail for blob {blob_id}: {str(e)}")
+    finally:
+        _slots.release()
+        # Done callbacks run on the pool's management thread; don't leak its connection
+        connection.close()
+
+
+def queue_thumbnail(blob):
+    """Render a blob's thumbnail in the background once the current transaction commits"""
+    from django.db import transaction
+    from .models import DocumentBlob
+
+    job = thumbnail_job(blob)
+    if job is None:
+        DocumentBlob.objects.filter(pk=blob.pk).update(thumbnail_status=DocumentBlob.THUMBNAIL_UNSUPPORTED)
+        return
+
+    def dispatch():
+        # A full queue leaves the blob pending for the backfill command
+        if not _slots.acquire(blocking=False):
+            return
+        try:
+            future = _get_executor().submit(render_thumbnail, *job)
+        except Exception as e:
+            _slots.release()
+            if isinstance(e, BrokenProcessPool):
+                _reset_executor()
+            print(f"❌ Failed to queue thumbnail for blob {blob.pk}: {str(e)}")
+            return
+        future.add_done_callback(partial(_store_result, blob.pk))
+    transaction.on_commit(dispatch)
+
+
+def generate_thumbnails(blobs, progress=None):
+    """
+    Render thumbnails for a DocumentBlob queryset in the foreground, using the pool.
+
+    Returns:
+        int: Number of blobs processed
+    """
+    blob_ids = list(blobs.values_list('pk', flat=True))
+    for start in range(0, len(blob_ids), MAX_QUEUED):
+        jobs = []
+        for blob in blobs.model.objects.filter(pk__in=blob_ids[start:start + MAX_QUEUED]):
+            job = thumbnail_job(blob)
+            if job is None:
+                save_thumbnail(blob.pk, None)
+            else:
+                jobs.append((blob.pk, _get_executor().submit(render_thumbnail, *job)))
+        for blob_id, future in jobs:
+            error = future.exception()
+            save_thumbnail(blob_id, None if error else future.result(), error)
+        if progress:
+            progress(min(start + MAX_QUEUED, len(blob_ids)), len(blob_ids))
+    return len(blob_ids)
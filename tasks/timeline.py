@@ -0,0 +1,109 @@
+"""
+Gantt timeline tiles: the tasks of a project that fall inside a date window
+and / or a range of chart rows.
+
+Rows follow the hierarchy (each task directly followed by its subtasks,
+siblings by id). The row layout for a project is computed from one
+(id, path) query and cached under the project's version, so it is rebuilt
+only after the project's tasks change. Date windows are answered with an
+interval-overlap query on the (project, start_date, due_date) index.
+"""
+from django.core.cache import cache
+from django.db.models import Max, Min
+from .models import Task
+
+LAYOUT_CACHE_SECONDS = 60 * 60
+
+MAX_TILE_ROWS = 500
+
+BAR_FIELDS = (
+    'id', 'task_number', 'title', 'status', 'priority', 'progress', 'start_date', 'due_date',
+    'duration', 'parent_task_id', 'depth', 'is_critical', 'total_float',
+)
+
+
+def _row_key(path, task_id):
+    return [int(part) for part in path.strip('/').split('/') if part] + [task_id]
+
+
+def get_row_layout(project_id, version=None):
+    """
+    Row order and date span of a project's timeline.
+
+    Args:
+        project_id: Project
+        version: ProjectVersion to key the cache on (no caching without one)
+
+    Returns:
+        dict: {'ids': [task_id in row order], 'start': date, 'end': date}
+    """
+    cache_key = 'task-timeline-layout:' + version.etag.strip('"') if version else None
+    layout = cache.get(cache_key) if cache_key else None
+    if layout is not None:
+        return layout
+
+    tasks = Task.objects.filter(project_id=project_id)
+    ordered = sorted(tasks.values_list('path', 'id'), key=lambda row: _row_key(*row))
+    span = tasks.aggregate(start=Min('start_date'), end=Max('due_date'))
+    layout = {
+        'ids': [task_id for _, task_id in ordered],
+        'start': span['start'],
+        'end': span['end'],
+    }
+    if cache_key:
+        cache.set(cache_key, layout, LAYOUT_CACHE_SECONDS)
+    return layout
+
+
+def get_tile(project_id, layout, window_start=None, window_end=None, row_start=0, row_end=None, limit=None):
+    """
+    Tasks overlapping a date window and / or a row range.
+
+    Without row_end, `limit` caps the tile at the first `limit` matching rows
+    from row_start on; the caller continues from the returned row.
+
+    Returns:
+        tuple: (bar dicts (BAR_FIELDS plus 'row' and 'dependencies') ordered
+            by row, row_start of the next tile or None after the last one)
+    """
+    tasks = Task.objects.filter(project_id=project_id)
+    if window_start:
+        tasks = tasks.filter(due_date__gte=window_start)
+    if window_end:
+        tasks = tasks.filter(start_date__lte=window_end)
+
+    next_row = None
+    if row_end is None and limit is not None:
+        # Rank the matching ids by row first so only one page of bars is loaded
+        positions = {task_id: row for row, task_id in enumerate(layout['ids'])}
+        matching = sorted(
+            row for row in map(positions.get, tasks.values_list('id', flat=True))
+            if row is not None and row >= row_start
+        )
+        if len(matching) > limit:
+            next_row, matching = matching[limit], matching[:limit]
+        rows = {layout['ids'][row]: row for row in matching}
+        tasks = tasks.filter(id__in=list(rows))
+    elif row_start or row_end is not None:
+        row_ids = layout['ids'][row_start:row_end]
+        rows = {task_id: row for row, task_id in enumerate(row_ids, start=row_start)}
+        tasks = tasks.filter(id__in=row_ids)
+        if row_end is not None and row_end < len(layout['ids']):
+            next_row = row_end
+    else:
+        rows = {task_id: row for row, task_id in enumerate(layout['ids'])}
+
+    bars = list(tasks.order_by().values(*BAR_FIELDS))
+    # Predecessors of the visible bars, for the dependency arrows
+    dependencies = {}
+    for task_id, dependency_id in Task.dependencies.through.objects.filter(
+        from_task_id__in=[bar['id'] for bar in bars], to_task__deleted_at__isnull=True
+    ).values_list('from_task_id', 'to_task_id'):
+        dependencies.setdefault(task_id, []).append(dependency_id)
+
+    for bar in bars:
+        bar['parent_task'] = bar.pop('parent_task_id')
+        bar['row'] = rows.get(bar['id'])
+        bar['dependencies'] = dependencies.get(bar['id'], [])
+    bars.sort(key=lambda bar: (bar['row'] is None, bar['row']))
+    return bars, next_row
@@ -0,0 +1,263 @@
+"""
+Resumable chunked uploads for task documents.
+
+    POST   /api/tasks/<id>/uploads/                          start (file_name, file_size, file_type, checksum)
+    PUT    /api/tasks/<id>/uploads/<upload_id>/chunks/<n>/   raw chunk body, optional X-Chunk-SHA256 header
+    GET    /api/tasks/<id>/uploads/<upload_id>/              progress, to resume after a failure
+    POST   /api/tasks/<id>/uploads/<upload_id>/complete/     verify and turn into a TaskDocument
+    DELETE /api/tasks/<id>/uploads/<upload_id>/              abort
+
+Chunks are read from the request stream in small blocks and appended to a
+staging file, so memory stays bounded whatever the file size. On completion
+the staging file is checked against the expected size and SHA-256 and handed
+to the content-addressed blob store (tasks/blobs.py), which moves it into
+storage with os.replace() unless the same content is already stored, before
+the TaskDocument row is created.
+"""
+import hashlib
+import os
+import uuid
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler
+from django.db import transaction
+from django.utils import timezone
+from .blobs import BLOCK_SIZE, store_blob, stream_sha256
+from .models import DocumentUpload, TaskDocument
+from .thumbnails import queue_thumbnail
+
+DEFAULT_CHUNK_SIZE = getattr(settings, 'TASK_UPLOAD_CHUNK_SIZE', 5 * 1024 * 1024)
+MAX_CHUNK_SIZE = getattr(settings, 'TASK_UPLOAD_MAX_CHUNK_SIZE', 16 * 1024 * 1024)
+MAX_FILE_SIZE = getattr(settings, 'TASK_UPLOAD_MAX_FILE_SIZE', 2 * 1024 * 1024 * 1024 - 1)
+
+
+class UploadError(Exception):
+    """A chunk or completion request that cannot be applied (message is client-facing)"""
+
+    def __init__(self, message, status=400, **details):
+        super().__init__(message)
+        self.status = status
+        self.details = details
+
+
+def staging_dir():
+    # Inside MEDIA_ROOT by default so the final os.replace() stays on one filesystem
+    return getattr(settings, 'TASK_UPLOAD_STAGING_DIR', os.path.join(settings.MEDIA_ROOT, 'uploads', 'staging'))
+
+
+def staging_path(upload):
+    return os.path.join(staging_dir(), f"{upload.pk}.part")
+
+
+def start_upload(task, user, file_name, file_size, file_type, checksum='', chunk_size=None):
+    """
+    Open a chunked upload and create its empty staging file.
+
+    Raises:
+        UploadError: On an invalid size, chunk size or checksum
+    """
+    if file_size < 0 or file_size > MAX_FILE_SIZE:
+        raise UploadError(f'file_size must be between 0 and {MAX_FILE_SIZE} bytes')
+    chunk_size = chunk_size or DEFAULT_CHUNK_SIZE
+    if not 0 < chunk_size <= MAX_CHUNK_SIZE:
+        raise UploadError(f'chunk_size must be between 1 and {MAX_CHUNK_SIZE} bytes')
+    checksum = (checksum or '').lower()
+    if checksum and (len(checksum) != 64 or any(c not in '0123456789abcdef' for c in checksum)):
+        raise UploadError('checksum must be a hex SHA-256 digest')
+
+    upload = DocumentUpload.objects.create(
+        task=task,
+        uploaded_by=user,
+        file_name=os.path.basename(file_name)[:255],
+        file_type=file_type or 'application/octet-stream',
+        file_size=file_size,
+        checksum=checksum,
+        chunk_size=chunk_size,
+    )
+    os.makedirs(staging_dir(), exist_ok=True)
+    open(staging_path(upload), 'wb').close()
+    return upload
+
+
+def append_chunk(upload_id, index, stream, length, chunk_checksum=''):
+    """
+    Append chunk `index` of an upload from a file-like stream.
+
+    Chunks must arrive in order. Re-sending a chunk that was already stored
+    is accepted and ignored, so clients can retry blindly after a timeout.
+
+    Args:
+        upload_id: DocumentUpload id
+        index: Zero-based chunk number
+        stream: Object with read(n) (the request body)
+        length: Content-Length of the chunk
+        chunk_checksum: Optional hex SHA-256 of this chunk
+
+    Returns:
+        DocumentUpload: The upload with its new progress
+
+    Raises:
+        UploadError: On out-of-order, oversized or corrupt chunks
+    """
+    with transaction.atomic():
+        # Row lock: two requests for the same upload must not append at once
+        upload = DocumentUpload.objects.select_for_update().get(pk=upload_id)
+        if index < upload.next_chunk:
+            return upload
+        if index > upload.next_chunk:
+            raise UploadError('Chunk out of order', status=409, next_chunk=upload.next_chunk)
+
+        last = index == upload.total_chunks - 1
+        expected = upload.file_size - upload.received_bytes if last else upload.chunk_size
+        if length != expected:
+            raise UploadError(f'Chunk {index} must be {expected} bytes', next_chunk=upload.next_chunk)
+
+        digest = hashlib.sha256()
+        with open(staging_path(upload), 'r+b') as staging:
+            # Drop whatever an interrupted attempt left behind
+            staging.seek(upload.received_bytes)
+            staging.truncate()
+            remaining = length
+            while remaining:
+                block = stream.read(min(BLOCK_SIZE, remaining))
+                if not block:
+                    break
+                staging.write(block)
+                digest.update(block)
+                remaining -= len(block)
+            if remaining:
+                staging.truncate(upload.received_bytes)
+                raise UploadError('Chunk body ended early', next_chunk=upload.next_chunk)
+            if chunk_checksum and digest.hexdigest() != chunk_checksum.lower():
+                staging.truncate(upload.received_bytes)
+                raise UploadError(f'Chunk {index} checksum mismatch', next_chunk=upload.next_chunk)
+            staging.flush()
+            os.fsync(staging.fileno())
+
+        upload.next_chunk += 1
+        upload.received_bytes += length
+        upload.save(update_fields=['next_chunk', 'received_bytes', 'updated_at'])
+    return upload
+
+
+def file_sha256(path):
+    with open(path, 'rb') as source:
+        return stream_sha256(source)
+
+
+def complete_upload(upload_id):
+    """
+    Verify a fully received upload and turn it into a TaskDocument.
+
+    Raises:
+        UploadError: If chunks are missing or the checksum does not match
+    """
+    with transaction.atomic():
+        upload = DocumentUpload.objects.select_for_update().select_related('task').get(pk=upload_id)
+        path = staging_path(upload)
+        if upload.received_bytes != upload.file_size or os.path.getsize(path) != upload.file_size:
+            raise UploadError('Upload is incomplete', next_chunk=upload.next_chunk)
+
+        # The digest doubles as the blob key, so it is computed even without a checksum
+        sha256 = file_sha256(path)
+        if not upload.checksum or sha256 == upload.checksum:
+            document = create_document(
+                upload.task, path, sha256, upload.file_size,
+                file_name=upload.file_name, file_type=upload.file_type, uploaded_by_id=upload.uploaded_by_id,
+            )
+            upload.delete()
+            return document
+
+        # The data cannot be trusted; the client has to start over
+        discard_uploads(DocumentUpload.objects.filter(pk=upload.pk))
+    raise UploadError('Checksum mismatch, upload discarded', status=422)
+
+
+def create_document(task, path, sha256, size, **fields):
+    """TaskDocument for a verified staging file, stored through its content blob"""
+    with transaction.atomic():
+        blob, created = store_blob(path, sha256, size, fields['file_name'])
+        document = TaskDocument(task=task, blob=blob, file=blob.file.name, file_size=size, **fields)
+        try:
+            document.save()
+        except Exception:
+            if created:
+                blob.file.storage.delete(blob.file.name)
+            raise
+        if created:
+            queue_thumbnail(blob)
+    return document
+
+
+class StagedUploadedFile(UploadedFile):
+    """A multipart file already written to the staging directory, with its SHA-256"""
+
+    def __init__(self, file, name, content_type, size, charset, sha256):
+        super().__init__(file, name, content_type, size, charset)
+        self.sha256 = sha256
+
+    def temporary_file_path(self):
+        return self.file.name
+
+    def close(self):
+        try:
+            return self.file.close()
+        except FileNotFoundError:
+            # Already moved into storage
+            pass
+
+
+class StagingUploadHandler(FileUploadHandler):
+    """
+    Upload handler for single-request uploads: writes each multipart file
+    straight into the staging directory and hashes it on the way, so the
+    file is never held in memory or read a second time.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        os.makedirs(staging_dir(), exist_ok=True)
+        self.staging = open(os.path.join(staging_dir(), f"{uuid.uuid4()}.part"), 'w+b')
+        self.digest = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.staging.write(raw_data)
+        self.digest.update(raw_data)
+
+    def file_complete(self, file_size):
+        self.staging.flush()
+        self.staging.seek(0)
+        return StagedUploadedFile(
+            self.staging, self.file_name, self.content_type, file_size, self.charset, self.digest.hexdigest()
+        )
+
+
+def discard_staged(file):
+    """Remove a StagedUploadedFile's staging file if it was never stored"""
+    file.close()
+    try:
+        os.remove(file.temporary_file_path())
+    except FileNotFoundError:
+        pass
+
+
+def discard_uploads(uploads):
+    """Delete upload rows and, once committed, their staging files"""
+    paths = [staging_path(upload) for upload in uploads.only('pk')]
+    uploads.delete()
+
+    def remove():
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+    transaction.on_commit(remove)
+
+
+def purge_stale_uploads(older_than):
+    """Discard uploads with no chunk received since `older_than` (a timedelta)"""
+    stale = DocumentUpload.objects.filter(updated_at__lt=timezone.now() - older_than)
+    count = stale.count()
+    discard_uploads(stale)
+    return count
@@ -1,9 +1,10 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import TaskViewSet
+from .views import TaskViewSet, RecurringTaskTemplateViewSet
 
 router = DefaultRouter()
 router.register(r'tasks', TaskViewSet)
+router.register(r'recurring-tasks', RecurringTaskTemplateViewSet, basename='recurring-task')
 
 urlpatterns = [
     path('', include(router.urls)),
@@ -0,0 +1,121 @@
+"""
+Cheap project-level versions for conditional GET (ETag / Last-Modified).
+
+The version of a project's task data is the id of the newest TaskChange row
+for that project (a counter maintained by the change log) combined with the
+project's own updated_at, so it can be read with a single indexed query.
+"""
+from functools import wraps
+from django.db.models import OuterRef, Subquery
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+from django.utils import timezone
+from .filters import DATE_RELATIVE_FILTERS
+from .models import TaskChange
+
+
+class ProjectVersion:
+    """Version token for the task data of one project (or of all tasks)"""
+
+    def __init__(self, project_id, change_id, last_modified, project_updated_at=None):
+        self.project_id = project_id
+        self.change_id = change_id or 0
+        self.last_modified = last_modified
+        self.project_updated_at = project_updated_at
+        self.as_of = None
+
+    @property
+    def etag(self):
+        # Microsecond precision so two project edits within a second differ
+        project_stamp = int(self.project_updated_at.timestamp() * 1000000) if self.project_updated_at else 0
+        token = f"p{self.project_id or 'all'}-{self.change_id}-{project_stamp}"
+        if self.as_of:
+            token += f"-{self.as_of:%Y%m%d}"
+        return quote_etag(token)
+
+    def not_modified_response(self, request):
+        """Return a 304 response if the client already has this version, else None"""
+        # Last-Modified cannot express date-relative results, so rely on the ETag alone
+        last_modified = int(self.last_modified.timestamp()) if self.last_modified and not self.as_of else None
+        return get_conditional_response(request, etag=self.etag, last_modified=last_modified)
+
+    def apply_headers(self, response):
+        """Attach ETag / Last-Modified to a successful or 304 response"""
+        if response.status_code in (200, 304):
+            response['ETag'] = self.etag
+            if self.last_modified:
+                response['Last-Modified'] = http_date(self.last_modified.timestamp())
+            # Always revalidate; the version check is cheaper than the payload
+            response['Cache-Control'] = 'private, no-cache'
+            patch_vary_headers(response, ('Authorization',))
+        return response
+
+
+def get_project_version(project_id=None):
+    """
+    Read the current version of a project's task data in one query.
+
+    Args:
+        project_id: Project id, or None for the version of all tasks
+
+    Returns:
+        ProjectVersion
+    """
+    if project_id is None:
+        latest = TaskChange.objects.order_by('-id').values('id', 'created_at').first() or {}
+        return ProjectVersion(None, latest.get('id'), latest.get('created_at'))
+
+    from project.models import Project
+
+    changes = TaskChange.objects.filter(project_id=OuterRef('pk')).order_by('-id')
+    row = Project.objects.filter(pk=project_id).annotate(
+        change_id=Subquery(changes.values('id')[:1]),
+        changed_at=Subquery(changes.values('created_at')[:1]),
+    ).values('updated_at', 'change_id', 'changed_at').first()
+
+    if row is None:
+        # Tasks can still reference a project id that no longer exists
+        latest = TaskChange.objects.filter(project_id=project_id).order_by('-id').values('id', 'created_at').first() or {}
+        return ProjectVersion(project_id, latest.get('id'), latest.get('created_at'))
+
+    timestamps = [value for value in (row['updated_at'], row['changed_at']) if value]
+    return ProjectVersion(
+        project_id,
+        row['change_id'],
+        max(timestamps) if timestamps else None,
+        project_updated_at=row['updated_at'],
+    )
+
+
+def conditional_on_project(allow_all=False):
+    """
+    Decorator for read-only viewset actions keyed by the project_id query param.
+
+    Answers with 304 Not Modified before the wrapped action runs when the
+    client's ETag / Last-Modified matches the project's current version.
+    Requests without a usable project_id are passed through untouched unless
+    allow_all is set, in which case the version of all tasks is used.
+    """
+    def decorator(view_method):
+        @wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            project_id = request.query_params.get('project_id') or None
+            if project_id is not None and not str(project_id).isdigit():
+                return view_method(self, request, *args, **kwargs)
+            if project_id is None and not allow_all:
+                return view_method(self, request, *args, **kwargs)
+
+            version = get_project_version(int(project_id) if project_id else None)
+            if any(request.query_params.get(name) for name in DATE_RELATIVE_FILTERS):
+                # "overdue" / "due this week" results change at midnight, not only with the data
+                version.as_of = timezone.localdate()
+            # Actions can reuse the version, e.g. as a cache key
+            request.project_version = version
+            not_modified = version.not_modified_response(request)
+            if not_modified is not None:
+                return version.apply_headers(not_modified)
+
+            response = view_method(self, request, *args, **kwargs)
+            return version.apply_headers(response)
+        return wrapper
+    return decorator
@@ -1,195 +1,702 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.exceptions import ValidationError
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
+from rest_framework.permissions import IsAuthenticated
 from django.http import HttpResponse
-from .models import Task, TaskDocument
+from django.db import transaction
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Max, Q
+from .models import Task, TaskDocument, TaskChange, TaskActivity, ArchivedTask, RecurringTaskTemplate, DocumentUpload, ImportJob
 from .serializers import (
     TaskSerializer,
     TaskCreateUpdateSerializer,
     TaskDocumentSerializer,
+    TaskSearchResultSerializer,
+    TaskActivitySerializer,
+    TaskCardSerializer,
+    ArchivedTaskSerializer,
+    RecurringTaskTemplateSerializer,
+    document_prefetch,
 )
-from openpyxl import Workbook, load_workbook
+from openpyxl import Workbook
 from openpyxl.styles import Font, Alignment, PatternFill
 from io import BytesIO
 from datetime import datetime
+from functools import partial
 from .critical_path import calculate_critical_path
+from .versioning import conditional_on_project
+from .search import search_tasks
+from .filters import apply_task_filters
+from .notifications import snapshot_task, diff_task, diff_dependencies, queue_task_notifications
+from .pagination import keyset_page, page_size_from
+from .events import publish_on_commit
+from .hierarchy import clone_subtree, move_subtree, soft_delete_subtree, restore_subtree
+from .archive import archived_subtrees, restore_archived
+from .recurrence import DEFAULT_HORIZON_DAYS, MAX_HORIZON_DAYS, materialize_occurrences
+from .uploads import (
+    UploadError, StagingUploadHandler, start_upload, append_chunk, complete_upload, create_document,
+    discard_staged, discard_uploads,
+)
+from .blobs import delete_documents
+from .downloads import can_access_task, document_response, thumbnail_response, token_user_id
+from .exports import (
+    EXPORT_FORMATS, EXPORT_RENDERERS, TASK_EXPORT_COLUMNS, XLSX_CONTENT_TYPE, ExportContentNegotiation,
+    export_lookups, export_response, parquet_available, streaming_file_response, task_export_records,
+    write_tasks_xlsx,
+)
+from .jobs import cancel_import, get_import_job, import_job_data, queue_import
+from .board import COLUMNS, get_board, get_column_page
+from .timeline import MAX_TILE_ROWS, get_row_layout, get_tile
 
 class TaskViewSet(viewsets.ModelViewSet):
     queryset = Task.objects.all()
     parser_classes = (MultiPartParser, FormParser, JSONParser)
+    CHANGES_PAGE_SIZE = 1000
 
     def get_serializer_class(self):
         if self.action in ['create', 'update', 'partial_update']:
             return TaskCreateUpdateSerializer
         return TaskSerializer
 
-    def get_queryset(self):
-        queryset = Task.objects.all()
+    def _dependency_mode(self):
+        # ?dependency_mode=counts swaps dependency id lists for the stored counts
+        dependency_mode = self.request.query_params.get('dependency_mode', 'ids')
+        if dependency_mode not in ('ids', 'counts'):
+            raise ValidationError({'dependency_mode': 'Must be "ids" or "counts"'})
+        return dependency_mode
+    
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['dependency_mode'] = self._dependency_mode()
+        # Lists get per-task document summaries; the full document list is for the detail view
+        context['document_mode'] = 'full' if self.action == 'retrieve' else 'summary'
+        return context
+    
+    def _accessible_projects(self):
+        """Projects the user owns or belongs to (every project for admins), as a pk subquery"""
+        from project.models import Project
         
-        # Filter by project if project_id is provided
-        project_id = self.request.query_params.get('project_id', None)
-        if project_id:
-            queryset = queryset.filter(project_id=project_id)
+        user = self.request.user
+        projects = Project.objects.all()
+        if user.designation != 'admin':
+            projects = projects.filter(Q(owner=user) | Q(members=user))
+        return projects.values('pk')
+    
+    def _accessible_tasks(self):
+        """Q for the tasks (live or archived) in those projects, plus project-less ones the user created or is assigned"""
+        user = self.request.user
+        return Q(project_id__in=self._accessible_projects()) | (
+            Q(project_id__isnull=True) & (Q(created_by_id=user.pk) | Q(assignee_id=user.pk))
+        )
+    
+    def get_queryset(self):
+        # Filter by project, status, priority, assignee and due dates
+        queryset = apply_task_filters(Task.objects.all(), self.request.query_params)
         
-        # Filter to show only main tasks (not subtasks) unless showing all
-        if self.action not in ['all_tasks']:
-            queryset = queryset.filter(parent_task__isnull=True)
+        # Only the list shows main tasks alone; detail routes must reach subtasks too
+        if self.action == 'list':
+            queryset = queryset.filter(parent_task__isnull=True).select_related('assignee', 'created_by', 'project')
+            if self._dependency_mode() == 'ids':
+                queryset = queryset.prefetch_related('dependencies')
+        elif self.action == 'retrieve':
+            queryset = queryset.prefetch_related(document_prefetch())
         
         return queryset
     
+    @conditional_on_project()
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+    
     def perform_create(self, serializer):
         """Send email notification when task is created with an assignee"""
         # Set created_by to the current user
         task = serializer.save(created_by=self.request.user)
         
-        # Send email if task has an assignee
-        if task.assignee and task.assignee.email:
-            try:
-                from utils.email_service import email_service
-                from utils.email_templates.templates import task_assignment_email_template
-                
-                html_content = task_assignment_email_template(
-                    user=task.assignee,
-                    task=task,
-                    project=task.project,
-                    assigned_by=self.request.user
-                )
-                
-                email_service.send_email(
-                    to_email=task.assignee.email,
-                    subject=f'New Task Assigned: [{task.task_number}] {task.title}' if task.task_number else f'New Task Assigned: {task.title}',
-                    html_content=html_content
-                )
-                print(f"✅ Task assignment email sent to {task.assignee.email}")
-            except Exception as e:
-                print(f"❌ Failed to send task assignment email: {str(e)}")
+        TaskActivity.log_created([task], actor=self.request.user)
+        
+        # Email is sent in the background once the task is committed
+        if task.assignee_id:
+            queue_task_notifications(task.id, {}, actor_id=self.request.user.id, created=True)
     
     def perform_update(self, serializer):
         """Send email notifications when task assignee or status is changed"""
-        # Get the old task before update
-        old_task = self.get_object()
-        old_assignee = old_task.assignee
-        old_status = old_task.status
+        # Snapshot the instance update() already loaded instead of fetching it again
+        task = serializer.instance
+        before = snapshot_task(task)
+        dependencies_changing = 'dependencies' in serializer.validated_data
+        if dependencies_changing:
+            old_dependency_ids = list(task.dependencies.values_list('pk', flat=True))
         
-        # Save the updated task
         task = serializer.save()
-        new_assignee = task.assignee
-        new_status = task.status
-        
-        # Send email if assignee was added or changed
-        if new_assignee and new_assignee != old_assignee and new_assignee.email:
-            try:
-                from utils.email_service import email_service
-                from utils.email_templates.templates import task_assignment_email_template
-                
-                html_content = task_assignment_email_template(
-                    user=new_assignee,
-                    task=task,
-                    project=task.project,
-                    assigned_by=self.request.user
-                )
-                
-                email_service.send_email(
-                    to_email=new_assignee.email,
-                    subject=f'Task Assigned: [{task.task_number}] {task.title}' if task.task_number else f'Task Assigned: {task.title}',
-                    html_content=html_content
-                )
-                print(f"✅ Task assignment email sent to {new_assignee.email}")
-            except Exception as e:
-                print(f"❌ Failed to send task assignment email: {str(e)}")
-        
-        # Send email if status was changed
-        if new_status != old_status:
-            try:
-                from utils.email_service import email_service
-                from utils.email_templates.templates import task_status_change_email_template
-                
-                # Collect recipients (created_by and assignee)
-                recipients = []
-                
-                # Add created_by user
-                if task.created_by and task.created_by.email and task.created_by.email_verified:
-                    recipients.append({
-                        'email': task.created_by.email,
-                        'name': task.created_by.get_full_name() or task.created_by.username
-                    })
-                
-                # Add assignee if different from created_by
-                if task.assignee and task.assignee.email and task.assignee.email_verified:
-                    if not task.created_by or task.assignee.id != task.created_by.id:
-                        recipients.append({
-                            'email': task.assignee.email,
-                            'name': task.assignee.get_full_name() or task.assignee.username
-                        })
-                
-                # Send email to all recipients
-                html_content = task_status_change_email_template(
-                    task=task,
-                    old_status=old_status,
-                    new_status=new_status,
-                    changed_by_user=self.request.user
-                )
-                
-                for recipient in recipients:
-                    email_service.send_email(
-                        to_email=recipient['email'],
-                        subject=f'Task Status Changed: [{task.task_number}] {task.title}' if task.task_number else f'Task Status Changed: {task.title}',
-                        html_content=html_content
-                    )
-                    print(f"✅ Status change email sent to {recipient['name']} ({recipient['email']})")
-                    
-            except Exception as e:
-                print(f"❌ Failed to send status change email: {str(e)}")
+        changes = diff_task(before, snapshot_task(task))
+        if dependencies_changing:
+            dependency_changes = diff_dependencies(old_dependency_ids, serializer.validated_data['dependencies'])
+            if dependency_changes:
+                changes['dependencies'] = dependency_changes
+        
+        if changes:
+            # The same diff feeds the activity log and the email notifications
+            TaskActivity.log_changes(task, changes, actor=self.request.user)
+            queue_task_notifications(task.id, changes, actor_id=self.request.user.id)
+    
+    def perform_destroy(self, instance):
+        # Soft delete: subtasks go with the task and POST .../restore/ brings them back
+        soft_delete_subtree(instance, actor=self.request.user)
     
     @action(detail=True, methods=['get'])
     def subtasks(self, request, pk=None):
         """Get all subtasks for a specific task"""
         task = self.get_object()
         subtasks = task.subtasks.all()
-        serializer = TaskSerializer(subtasks, many=True)
+        serializer = TaskSerializer(subtasks, many=True, context={'dependency_mode': self._dependency_mode()})
         return Response(serializer.data)
     
+    def _subtree_target(self, request):
+        """Resolve parent_task_id / project_id from the request body"""
+        from project.models import Project
+        
+        parent = project = None
+        parent_task_id = request.data.get('parent_task_id')
+        project_id = request.data.get('project_id')
+        
+        if parent_task_id:
+            parent = Task.objects.filter(pk=parent_task_id).first()
+            if parent is None:
+                raise ValidationError({'parent_task_id': 'Parent task not found'})
+        if project_id:
+            project = Project.objects.filter(pk=project_id).first()
+            if project is None:
+                raise ValidationError({'project_id': 'Project not found'})
+            if parent is not None and parent.project_id != project.pk:
+                raise ValidationError({'parent_task_id': 'Parent task must belong to the same project'})
+        return parent, project
+    
+    @action(detail=True, methods=['post'])
+    def clone_subtree(self, request, pk=None):
+        """Clone a task with all of its subtasks (optional parent_task_id / project_id)"""
+        task = self.get_object()
+        parent, project = self._subtree_target(request)
+        
+        clone = clone_subtree(task, parent=parent, project=project, actor=request.user)
+        # Keep the response slim: the full serializer nests every subtask
+        return Response({
+            'id': clone.id,
+            'task_number': clone.task_number,
+            'parent_task': clone.parent_task_id,
+            'project': clone.project_id,
+        }, status=status.HTTP_201_CREATED)
+    
+    @action(detail=True, methods=['post'])
+    def move_subtree(self, request, pk=None):
+        """Move a task with all of its subtasks under parent_task_id (or to the top level of project_id)"""
+        task = self.get_object()
+        parent, project = self._subtree_target(request)
+        
+        try:
+            task = move_subtree(task, parent=parent, project=project, actor=request.user)
+        except ValueError as e:
+            return Response(
+                {'error': str(e)}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response({
+            'id': task.id,
+            'task_number': task.task_number,
+            'parent_task': task.parent_task_id,
+            'project': task.project_id,
+        })
+    
+    @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
+    def restore(self, request, pk=None):
+        """Restore a deleted task and the subtasks deleted with it"""
+        task = Task.all_objects.filter(self._accessible_tasks(), pk=pk).first()
+        if task is None:
+            return Response({'error': 'Task not found'}, status=status.HTTP_404_NOT_FOUND)
+        if task.deleted_at is None:
+            return Response({'error': 'Task is not deleted'}, status=status.HTTP_400_BAD_REQUEST)
+    
+        try:
+            restored = restore_subtree(task, actor=request.user)
+        except ValueError as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response({
+            'id': task.id,
+            'task_number': task.task_number,
+            'parent_task': task.parent_task_id,
+            'project': task.project_id,
+            'restored': restored,
+        })
+    
+    @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
+    def archived(self, request):
+        """Browse the archived tasks of a project (read-only, paged by ?after=<id>)"""
+        project_id = request.query_params.get('project_id')
+        if not project_id or not project_id.isdigit():
+            return Response(
+                {'error': 'project_id is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not self._accessible_projects().filter(pk=project_id).exists():
+            return Response({'error': 'Project not found'}, status=status.HTTP_404_NOT_FOUND)
+    
+        try:
+            after = int(request.query_params.get('after') or 0)
+        except ValueError:
+            return Response(
+                {'error': 'after must be a task id'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        limit = page_size_from(request.query_params)
+    
+        archived = ArchivedTask.objects.filter(project_id=project_id, id__gt=after)
+        if request.query_params.get('search'):
+            archived = archived.filter(title__icontains=request.query_params['search'])
+        rows = list(archived.order_by('id')[:limit + 1])
+        return Response({
+            'results': ArchivedTaskSerializer(rows[:limit], many=True).data,
+            'next_after': rows[limit - 1].id if len(rows) > limit else None,
+        })
+    
+    @action(detail=False, methods=['post'], permission_classes=[IsAuthenticated])
+    def restore_archived(self, request):
+        """Move archived tasks back: a whole project (project_id) or tasks with their subtasks (task_ids)"""
+        project_id = request.data.get('project_id')
+        task_ids = request.data.get('task_ids')
+    
+        if task_ids:
+            if not isinstance(task_ids, list) or not all(isinstance(task_id, int) for task_id in task_ids):
+                raise ValidationError({'task_ids': 'Must be a list of task ids'})
+            # Tasks picked one by one come back live even if they were deleted before archiving
+            archived = archived_subtrees(task_ids).filter(self._accessible_tasks())
+            restored = restore_archived(archived, undelete=True, actor=request.user)
+        elif project_id:
+            if not str(project_id).isdigit() or not self._accessible_projects().filter(pk=project_id).exists():
+                return Response({'error': 'Project not found'}, status=status.HTTP_404_NOT_FOUND)
+            restored = restore_archived(ArchivedTask.objects.filter(project_id=project_id), actor=request.user)
+        else:
+            return Response(
+                {'error': 'project_id or task_ids is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+    
+        if not restored:
+            return Response({'error': 'No archived tasks found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response({'restored': restored})
+    
     @action(detail=False, methods=['get'])
+    @conditional_on_project(allow_all=True)
     def all_tasks(self, request):
         """Get all tasks including subtasks for Gantt chart"""
         # Get base queryset (without parent_task filter)
-        queryset = Task.objects.all()
+        queryset = self.get_queryset().select_related('assignee', 'created_by', 'project')
+        if self._dependency_mode() == 'ids':
+            queryset = queryset.prefetch_related('dependencies')
         
-        # Filter by project if project_id is provided
-        project_id = self.request.query_params.get('project_id', None)
-        if project_id:
-            queryset = queryset.filter(project_id=project_id)
-        
-        serializer = TaskSerializer(queryset, many=True)
+        serializer = TaskSerializer(queryset, many=True, context={'dependency_mode': self._dependency_mode()})
         return Response(serializer.data)
     
+    @action(detail=False, methods=['get'])
+    @conditional_on_project()
+    def board(self, request):
+        """
+        Kanban board of a project's main tasks grouped by status.
+        
+        Without `column` every column is returned with its count and first
+        `limit` cards; with `column` (and `after`, the last card id seen) only
+        the next page of that column is returned.
+        """
+        project_id = request.query_params.get('project_id')
+        
+        if not project_id or not project_id.isdigit():
+            return Response(
+                {'error': 'project_id is required'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            limit = max(1, min(int(request.query_params.get('limit', 20)), 100))
+            after = int(request.query_params.get('after') or 0)
+        except ValueError:
+            return Response(
+                {'error': 'limit and after must be integers'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        column = request.query_params.get('column')
+        if column is not None:
+            if column not in COLUMNS:
+                return Response(
+                    {'error': f"column must be one of: {', '.join(COLUMNS)}"}, 
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            cards, has_more = get_column_page(project_id, column, after=after, limit=limit)
+            return Response({
+                'status': column,
+                'cards': TaskCardSerializer(cards, many=True).data,
+                'has_more': has_more,
+            })
+        
+        columns = get_board(project_id, limit)
+        return Response({
+            'project_id': int(project_id),
+            'columns': [
+                dict(column, cards=TaskCardSerializer(column['cards'], many=True).data)
+                for column in columns
+            ],
+        })
+    
+    @action(detail=False, methods=['get'])
+    @conditional_on_project()
+    def timeline(self, request):
+        """
+        Gantt tile: tasks overlapping [start, end] and / or rows [row_start, row_end).
+        
+        Every task carries its chart row; `rows` and the project span let the
+        client size the chart without loading all tasks. No tile holds more
+        than MAX_TILE_ROWS rows; `next_row_start` is where the next one starts.
+        """
+        project_id = request.query_params.get('project_id')
+        
+        if not project_id or not project_id.isdigit():
+            return Response(
+                {'error': 'project_id is required'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        window = {}
+        for name in ('start', 'end'):
+            value = request.query_params.get(name)
+            if value:
+                try:
+                    window[name] = datetime.strptime(value, '%Y-%m-%d').date()
+                except ValueError:
+                    return Response(
+                        {'error': f'{name} must use the YYYY-MM-DD format'}, 
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+        
+        try:
+            row_start = int(request.query_params.get('row_start') or 0)
+            row_end = request.query_params.get('row_end')
+            row_end = int(row_end) if row_end else None
+        except ValueError:
+            return Response(
+                {'error': 'row_start and row_end must be integers'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if row_end is None and not window:
+            # Without any window, send one tile of rows rather than everything
+            row_end = row_start + MAX_TILE_ROWS
+        if row_start < 0 or (row_end is not None and row_end <= row_start):
+            return Response(
+                {'error': 'Rows must satisfy 0 <= row_start < row_end'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if row_end is not None and row_end - row_start > MAX_TILE_ROWS:
+            return Response(
+                {'error': f'At most {MAX_TILE_ROWS} rows per tile'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        layout = get_row_layout(project_id, getattr(request, 'project_version', None))
+        # A window without rows is paged too: at most MAX_TILE_ROWS tasks, continue from next_row_start
+        tasks, next_row_start = get_tile(
+            project_id, layout,
+            window_start=window.get('start'), window_end=window.get('end'),
+            row_start=row_start, row_end=row_end, limit=MAX_TILE_ROWS,
+        )
+        return Response({
+            'project_id': int(project_id),
+            'rows': len(layout['ids']),
+            'project_start': layout['start'],
+            'project_end': layout['end'],
+            'tasks': tasks,
+            'next_row_start': next_row_start,
+        })
+    
+    @action(detail=False, methods=['get'])
+    def changes(self, request):
+        """Get task changes for a project since a cursor (delta sync)"""
+        project_id = request.query_params.get('project_id')
+        
+        if not project_id:
+            return Response(
+                {'error': 'project_id is required'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            since = int(request.query_params.get('since') or 0)
+        except ValueError:
+            return Response(
+                {'error': 'since must be an integer cursor'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # No cursor yet: send a full snapshot plus the cursor to continue from
+        if since <= 0:
+            latest = TaskChange.objects.filter(project_id=project_id).aggregate(latest=Max('id'))['latest'] or 0
+            tasks = Task.objects.filter(project_id=project_id)
+            return Response({
+                'cursor': latest,
+                'full': True,
+                'has_more': False,
+                'tasks': TaskSerializer(tasks, many=True, context={'dependency_mode': self._dependency_mode()}).data,
+                'deleted': [],
+                'dependencies': {'added': [], 'removed': []},
+            })
+        
+        page = list(
+            TaskChange.objects.filter(project_id=project_id, id__gt=since)
+            .order_by('id')
+            .values_list('id', 'task_id', 'dependency_id', 'action')[:self.CHANGES_PAGE_SIZE + 1]
+        )
+        has_more = len(page) > self.CHANGES_PAGE_SIZE
+        page = page[:self.CHANGES_PAGE_SIZE]
+        
+        # Collapse the page so only the last change per task / edge wins
+        task_actions = {}
+        edge_actions = {}
+        for change_id, task_id, dependency_id, change_action in page:
+            if change_action in (TaskChange.UPSERT, TaskChange.DELETE):
+                task_actions[task_id] = change_action
+            else:
+                edge_actions[(task_id, dependency_id)] = change_action
+        
+        upserted_ids = [task_id for task_id, change_action in task_actions.items() if change_action == TaskChange.UPSERT]
+        tasks = Task.objects.filter(id__in=upserted_ids, project_id=project_id)
+        tasks_data = TaskSerializer(tasks, many=True, context={'dependency_mode': self._dependency_mode()}).data
+        
+        # Anything that no longer lives in this project is a tombstone for the client
+        found_ids = {task['id'] for task in tasks_data}
+        deleted = sorted(task_id for task_id in task_actions if task_id not in found_ids)
+        
+        return Response({
+            'cursor': page[-1][0] if page else since,
+            'full': False,
+            'has_more': has_more,
+            'tasks': tasks_data,
+            'deleted': deleted,
+            'dependencies': {
+                'added': [list(edge) for edge, change_action in edge_actions.items() if change_action == TaskChange.DEPENDENCY_ADD],
+                'removed': [list(edge) for edge, change_action in edge_actions.items() if change_action == TaskChange.DEPENDENCY_REMOVE],
+            },
+        })
+    
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """Full-text search over task titles and descriptions"""
+        query = request.query_params.get('q', '').strip()
+        
+        if not query:
+            return Response(
+                {'error': 'q is required'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            project_id = request.query_params.get('project_id')
+            project_id = int(project_id) if project_id else None
+            limit = max(1, min(int(request.query_params.get('limit', 20)), 100))
+            offset = max(int(request.query_params.get('offset', 0)), 0)
+        except ValueError:
+            return Response(
+                {'error': 'project_id, limit and offset must be integers'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        ranked = search_tasks(query, project_id=project_id, limit=limit, offset=offset)
+        scores = dict(ranked)
+        tasks = Task.objects.filter(id__in=scores.keys()).select_related('project', 'assignee')
+        
+        # Keep the ranking order from the search index
+        tasks = sorted(tasks, key=lambda task: -scores[task.id])
+        serializer = TaskSearchResultSerializer(tasks, many=True, context={'scores': scores})
+        return Response({
+            'query': query,
+            'results': serializer.data,
+            'limit': limit,
+            'offset': offset,
+        })
+    
+    @action(detail=True, methods=['get'])
+    def activity(self, request, pk=None):
+        """Get the activity feed of a task (newest first, keyset paginated)"""
+        task = self.get_object()
+        return self._activity_page(TaskActivity.objects.filter(task=task), request)
+    
+    @action(detail=False, methods=['get'], url_path='activity', url_name='activity-feed',
+            permission_classes=[IsAuthenticated])
+    def activity_feed(self, request):
+        """Get the activity feed of a project or of a user (only in projects the caller can see)"""
+        project_id = request.query_params.get('project_id')
+        user_id = request.query_params.get('user_id')
+        
+        if project_id:
+            activity = TaskActivity.objects.filter(project_id=project_id)
+        elif user_id:
+            activity = TaskActivity.objects.filter(actor_id=user_id)
+        else:
+            return Response(
+                {'error': 'project_id or user_id is required'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        activity = activity.filter(project_id__in=self._accessible_projects())
+        return self._activity_page(activity, request)
+    
+    def _activity_page(self, activity, request):
+        rows, next_cursor = keyset_page(
+            activity.select_related('actor'),
+            cursor=request.query_params.get('cursor'),
+            limit=page_size_from(request.query_params),
+        )
+        return Response({
+            'results': TaskActivitySerializer(rows, many=True).data,
+            'next_cursor': next_cursor,
+        })
+    
     @action(detail=True, methods=['post'])
     def upload_document(self, request, pk=None):
         """Upload a document for a task"""
         task = self.get_object()
+        # Stream the file to the staging directory, hashing it for the blob store
+        request._request.upload_handlers = [StagingUploadHandler(request._request)]
         file = request.FILES.get('file')
         
-        if not file:
+        try:
+            if not file:
+                return Response(
+                    {'error': 'No file provided'}, 
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            
+            # Create document
+            document = create_document(
+                task, file.temporary_file_path(), file.sha256, file.size,
+                file_name=file.name,
+                file_type=file.content_type,
+                uploaded_by=request.user
+            )
+        finally:
+            # Every file in the body was staged; only `file` is kept
+            for _, staged_files in request.FILES.lists():
+                for staged in staged_files:
+                    discard_staged(staged)
+        
+        serializer = TaskDocumentSerializer(document, context={'request': request})
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    def _upload_response(self, upload, status_code=status.HTTP_200_OK):
+        return Response({
+            'upload_id': str(upload.pk),
+            'file_name': upload.file_name,
+            'file_size': upload.file_size,
+            'chunk_size': upload.chunk_size,
+            'total_chunks': upload.total_chunks,
+            'next_chunk': upload.next_chunk,
+            'received_bytes': upload.received_bytes,
+        }, status=status_code)
+
+    def _upload_error(self, error):
+        return Response({'error': str(error), **error.details}, status=error.status)
+
+    def _get_upload(self, task, upload_id):
+        try:
+            return DocumentUpload.objects.get(pk=upload_id, task=task)
+        except (DocumentUpload.DoesNotExist, DjangoValidationError):
+            return None
+
+    @action(detail=True, methods=['post'], url_path='uploads')
+    def start_upload(self, request, pk=None):
+        """Start a resumable chunked upload (file_name, file_size, file_type, optional checksum / chunk_size)"""
+        task = self.get_object()
+        file_name = request.data.get('file_name')
+
+        try:
+            file_size = int(request.data.get('file_size'))
+            chunk_size = int(request.data['chunk_size']) if request.data.get('chunk_size') else None
+        except (TypeError, ValueError):
             return Response(
-                {'error': 'No file provided'}, 
+                {'error': 'file_size and chunk_size must be integers'},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        
-        # Create document
-        document = TaskDocument(
-            task=task,
-            file=file,
-            file_name=file.name,
-            file_size=file.size,
-            file_type=file.content_type,
-            uploaded_by=request.user
-        )
-        document.save()
-        
-        serializer = TaskDocumentSerializer(document)
+        if not file_name:
+            return Response(
+                {'error': 'file_name is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            upload = start_upload(
+                task, request.user, file_name, file_size, request.data.get('file_type'),
+                checksum=request.data.get('checksum', ''), chunk_size=chunk_size
+            )
+        except UploadError as e:
+            return self._upload_error(e)
+        return self._upload_response(upload, status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=['get', 'delete'], url_path=r'uploads/(?P<upload_id>[0-9a-f-]+)')
+    def upload_status(self, request, pk=None, upload_id=None):
+        """Progress of a chunked upload (to resume from next_chunk), or DELETE to abort it"""
+        task = self.get_object()
+        upload = self._get_upload(task, upload_id)
+        if upload is None:
+            return Response({'error': 'Upload not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        if request.method == 'DELETE':
+            discard_uploads(DocumentUpload.objects.filter(pk=upload.pk))
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        return self._upload_response(upload)
+
+    @action(detail=True, methods=['put'], url_path=r'uploads/(?P<upload_id>[0-9a-f-]+)/chunks/(?P<index>\d+)')
+    def upload_chunk(self, request, pk=None, upload_id=None, index=None):
+        """Append one chunk; the raw request body is the chunk (optional X-Chunk-SHA256 header)"""
+        task = self.get_object()
+        upload = self._get_upload(task, upload_id)
+        if upload is None:
+            return Response({'error': 'Upload not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        try:
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            length = -1
+        if length < 0 or length > upload.chunk_size:
+            return Response(
+                {'error': f'Chunks must send a Content-Length of at most {upload.chunk_size} bytes'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            # Read the body as a stream; request.data would buffer it through a parser
+            upload = append_chunk(
+                upload.pk, int(index), request.stream, length,
+                chunk_checksum=request.META.get('HTTP_X_CHUNK_SHA256', '')
+            )
+        except UploadError as e:
+            return self._upload_error(e)
+        return self._upload_response(upload)
+
+    @action(detail=True, methods=['post'], url_path=r'uploads/(?P<upload_id>[0-9a-f-]+)/complete')
+    def complete_upload(self, request, pk=None, upload_id=None):
+        """Verify a fully uploaded file and attach it to the task as a document"""
+        task = self.get_object()
+        upload = self._get_upload(task, upload_id)
+        if upload is None:
+            return Response({'error': 'Upload not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        try:
+            document = complete_upload(upload.pk)
+        except UploadError as e:
+            return self._upload_error(e)
+
+        serializer = TaskDocumentSerializer(document, context={'request': request})
         return Response(serializer.data, status=status.HTTP_201_CREATED)
-    
+
     @action(detail=True, methods=['delete'], url_path='delete_document/(?P<document_id>[^/.]+)')
     def delete_document(self, request, pk=None, document_id=None):
         """Delete a document from a task"""
@@ -197,8 +704,8 @@ class TaskViewSet(viewsets.ModelViewSet):
         
         try:
             document = TaskDocument.objects.get(id=document_id, task=task)
-            document.file.delete()  # Delete the actual file
-            document.delete()  # Delete the database record
+            # The file goes with its last reference
+            delete_documents(TaskDocument.objects.filter(pk=document.pk))
             return Response(status=status.HTTP_204_NO_CONTENT)
         except TaskDocument.DoesNotExist:
             return Response(
@@ -206,17 +713,62 @@ class TaskViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
     
+    def _readable_document(self, request, document_id):
+        """The task's document if the caller may read it, else an error Response"""
+        task = self.get_object()
+        document = TaskDocument.objects.filter(id=document_id, task=task).select_related('blob').first()
+        if document is None or not document.file:
+            return None, Response(
+                {'error': 'Document not found'}, 
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        token = request.query_params.get('token')
+        if token:
+            from users.models import CustomUser
+            user = CustomUser.objects.filter(pk=token_user_id(token, document)).first()
+        else:
+            user = request.user
+        if not can_access_task(user, task):
+            return None, Response(
+                {'error': 'You do not have access to this document'}, 
+                status=status.HTTP_403_FORBIDDEN
+            )
+        return document, None
+    
+    @action(detail=True, methods=['get'], url_path=r'documents/(?P<document_id>\d+)/download', url_name='download-document')
+    def download_document(self, request, pk=None, document_id=None):
+        """Stream a document (Range requests supported); JWT or the signed ?token= from download_url"""
+        document, error = self._readable_document(request, document_id)
+        if error:
+            return error
+        return document_response(request, document)
+    
+    @action(detail=True, methods=['get'], url_path=r'documents/(?P<document_id>\d+)/thumbnail', url_name='document-thumbnail')
+    def document_thumbnail(self, request, pk=None, document_id=None):
+        """Small preview image of an image / PDF document (see thumbnail_url)"""
+        document, error = self._readable_document(request, document_id)
+        if error:
+            return error
+        if not document.blob_id or not document.blob.thumbnail:
+            return Response(
+                {'error': 'No thumbnail for this document'}, 
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return thumbnail_response(document.blob)
+    
     @action(detail=True, methods=['get'])
     def documents(self, request, pk=None):
         """Get all documents for a task"""
         task = self.get_object()
-        documents = task.documents.all()
-        serializer = TaskDocumentSerializer(documents, many=True)
+        documents = task.documents.select_related('uploaded_by', 'blob')
+        serializer = TaskDocumentSerializer(documents, many=True, context={'request': request})
         return Response(serializer.data)
     
-    @action(detail=False, methods=['get'])
+    @action(detail=False, methods=['get'], renderer_classes=EXPORT_RENDERERS,
+            content_negotiation_class=ExportContentNegotiation)
     def export_excel(self, request):
-        """Export tasks to Excel file"""
+        """Export tasks to Excel file, or as csv / ndjson / parquet with ?format="""
         # Get project_id from query params
         project_id = request.query_params.get('project_id')
         
@@ -226,77 +778,30 @@ class TaskViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Filter tasks by project
-        tasks = Task.objects.filter(project_id=project_id).order_by('id')
-        
-        # Create workbook
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Tasks"
-        
-        # Define headers
-        headers = [
-            'ID', 'Title', 'Description', 'Status', 'Priority',
-            'Start Date', 'Due Date', 'Duration (days)', 'Progress (%)',
-            'Parent Task ID', 'Assignee Email', 'Dependencies (IDs)'
-        ]
-        
-        # Style headers
-        header_fill = PatternFill(start_color='4472C4', end_color='4472C4', fill_type='solid')
-        header_font = Font(bold=True, color='FFFFFF')
-        header_alignment = Alignment(horizontal='center', vertical='center')
-        
-        # Write headers
-        for col_num, header in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=col_num, value=header)
-            cell.fill = header_fill
-            cell.font = header_font
-            cell.alignment = header_alignment
-        
-        # Write data
-        for row_num, task in enumerate(tasks, 2):
-            ws.cell(row=row_num, column=1, value=task.id)
-            ws.cell(row=row_num, column=2, value=task.title)
-            ws.cell(row=row_num, column=3, value=task.description or '')
-            ws.cell(row=row_num, column=4, value=task.status)
-            ws.cell(row=row_num, column=5, value=task.priority)
-            ws.cell(row=row_num, column=6, value=task.start_date.strftime('%Y-%m-%d') if task.start_date else '')
-            ws.cell(row=row_num, column=7, value=task.due_date.strftime('%Y-%m-%d') if task.due_date else '')
-            ws.cell(row=row_num, column=8, value=task.duration or '')
-            ws.cell(row=row_num, column=9, value=task.progress or 0)
-            ws.cell(row=row_num, column=10, value=task.parent_task_id or '')
-            ws.cell(row=row_num, column=11, value=task.assignee.email if task.assignee else '')
-            
-            # Dependencies as comma-separated IDs
-            dep_ids = ','.join(str(dep.id) for dep in task.dependencies.all()) if task.dependencies.exists() else ''
-            ws.cell(row=row_num, column=12, value=dep_ids)
-        
-        # Adjust column widths
-        for col in ws.columns:
-            max_length = 0
-            column = col[0].column_letter
-            for cell in col:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            adjusted_width = min(max_length + 2, 50)
-            ws.column_dimensions[column].width = adjusted_width
+        export_format = request.query_params.get('format', 'xlsx')
+        if export_format not in EXPORT_FORMATS:
+            return Response(
+                {'error': f"format must be one of: {', '.join(EXPORT_FORMATS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if export_format == 'parquet' and not parquet_available():
+            return Response(
+                {'error': 'Parquet export needs pyarrow installed on the server'},
+                status=status.HTTP_501_NOT_IMPLEMENTED
+            )
         
-        # Save to BytesIO
-        excel_file = BytesIO()
-        wb.save(excel_file)
-        excel_file.seek(0)
+        # Filter tasks by project
+        tasks = Task.objects.filter(project_id=project_id)
+        filename = f'tasks_project_{project_id}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.{export_format}'
         
-        # Create response
-        response = HttpResponse(
-            excel_file.read(),
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        )
-        response['Content-Disposition'] = f'attachment; filename=tasks_project_{project_id}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx'
+        if export_format != 'xlsx':
+            # Records stream straight from the database cursor
+            emails, dependencies = export_lookups(tasks)
+            records = task_export_records(tasks, emails, dependencies)
+            return export_response(export_format, TASK_EXPORT_COLUMNS, records, filename)
         
-        return response
+        # Rows are written as they are read and the file is streamed back in blocks
+        return streaming_file_response(partial(write_tasks_xlsx, tasks), XLSX_CONTENT_TYPE, filename)
     
     @action(detail=False, methods=['get'])
     def download_sample(self, request):
@@ -309,7 +814,7 @@ class TaskViewSet(viewsets.ModelViewSet):
         headers = [
             'Title', 'Description', 'Status', 'Priority',
             'Start Date', 'Due Date', 'Duration (days)', 'Progress (%)',
-            'Parent Task ID', 'Assignee Email', 'Dependencies (IDs)'
+            'Parent Task ID', 'Assignee Email', 'Dependencies (IDs)', 'Key'
         ]
         
         # Style headers
@@ -326,8 +831,9 @@ class TaskViewSet(viewsets.ModelViewSet):
         
         # Add sample data with emails instead of usernames
         sample_data = [
-            ['Sample Task 1', 'This is a sample task', 'To Do', 'High', '2025-01-01', '2025-01-10', 10, 0, '', 'admin@example.com', ''],
-            ['Sample Task 2', 'Another sample task', 'In Progress', 'Medium', '2025-01-05', '2025-01-15', 10, 50, '', 'user@example.com', ''],
+            ['Sample Task 1', 'This is a sample task', 'To Do', 'High', '2025-01-01', '2025-01-10', 10, 0, '', 'admin@example.com', '', 'design'],
+            ['Sample Task 2', 'Another sample task', 'In Progress', 'Medium', '2025-01-05', '2025-01-15', 10, 50, '', 'user@example.com', 'design', ''],
+            ['Sample Subtask', 'A subtask of Sample Task 2', 'To Do', 'Low', '2025-01-05', '2025-01-07', 3, 0, '#3', '', '', ''],
         ]
         
         for row_num, data in enumerate(sample_data, 2):
@@ -349,6 +855,11 @@ class TaskViewSet(viewsets.ModelViewSet):
             "8. Parent Task ID: Leave empty for main tasks, enter task ID for subtasks",
             "9. Assignee Email: Must match existing user email (e.g., admin@example.com)",
             "10. Dependencies: Comma-separated task IDs (e.g., 1,2,3)",
+            "11. Key (optional): A short name for the row, such as 'design' (not a plain number)",
+            "12. Parent Task ID and Dependencies can also point at tasks in this sheet:",
+            "    #5 is the task on row 5, and a key refers to the row with that Key",
+            "    (e.g., 'design, #4' or '12, #4'). Plain numbers are existing task IDs",
+            "13. Circular parents or dependencies within the sheet are reported and skipped",
             "",
             "Note: Do not modify the header row in the Tasks sheet"
         ]
@@ -385,9 +896,9 @@ class TaskViewSet(viewsets.ModelViewSet):
         
         return response
     
-    @action(detail=False, methods=['post'])
+    @action(detail=False, methods=['post'], permission_classes=[IsAuthenticated])
     def import_excel(self, request):
-        """Import tasks from Excel file"""
+        """Queue an Excel task import; answers 202 with the import job"""
         project_id = request.data.get('project_id')
         
         if not project_id:
@@ -403,134 +914,40 @@ class TaskViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        try:
-            # Load workbook
-            wb = load_workbook(file)
-            ws = wb.active
-            
-            # Validate headers
-            expected_headers = [
-                'Title', 'Description', 'Status', 'Priority',
-                'Start Date', 'Due Date', 'Duration (days)', 'Progress (%)',
-                'Parent Task ID', 'Assignee Email', 'Dependencies (IDs)'
-            ]
-            
-            actual_headers = [cell.value for cell in ws[1]]
-            
-            # Skip validation if first column is 'ID' (exported file)
-            if actual_headers[0] == 'ID':
-                actual_headers = actual_headers[1:]  # Remove ID column
-                start_col = 2
-            else:
-                start_col = 1
-            
-            created_tasks = []
-            errors = []
-            
-            # Process each row
-            for row_num, row in enumerate(ws.iter_rows(min_row=2, values_only=False), 2):
-                try:
-                    # Get values based on start column
-                    if start_col == 2:
-                        values = [cell.value for cell in row[1:]]  # Skip ID column
-                    else:
-                        values = [cell.value for cell in row]
-                    
-                    if not values[0]:  # Skip if title is empty
-                        continue
-                    
-                    # Parse data
-                    title = str(values[0]).strip()
-                    description = str(values[1]).strip() if values[1] else ''
-                    status_val = str(values[2]).strip().lower() if values[2] else 'pending'
-                    priority = str(values[3]).strip().lower() if values[3] else 'medium'
-                    
-                    # Parse dates
-                    start_date = None
-                    if values[4]:
-                        if isinstance(values[4], datetime):
-                            start_date = values[4].date()
-                        elif isinstance(values[4], str):
-                            try:
-                                start_date = datetime.strptime(values[4], '%Y-%m-%d').date()
-                            except:
-                                pass
-                    
-                    due_date = None
-                    if values[5]:
-                        if isinstance(values[5], datetime):
-                            due_date = values[5].date()
-                        elif isinstance(values[5], str):
-                            try:
-                                due_date = datetime.strptime(values[5], '%Y-%m-%d').date()
-                            except:
-                                pass
-                    
-                    duration = int(values[6]) if values[6] else None
-                    progress = int(values[7]) if values[7] else 0
-                    parent_task_id = int(values[8]) if values[8] else None
-                    assignee_email = str(values[9]).strip() if values[9] else None
-                    dependency_ids = str(values[10]).strip() if values[10] else ''
-                    
-                    # Get assignee by email (more robust than username)
-                    assignee = None
-                    if assignee_email:
-                        from users.models import CustomUser
-                        try:
-                            assignee = CustomUser.objects.get(email=assignee_email)
-                        except CustomUser.DoesNotExist:
-                            errors.append(f"Row {row_num}: User with email '{assignee_email}' not found")
-                            # Don't skip - create task without assignee
-                            assignee = None
-                        except CustomUser.MultipleObjectsReturned:
-                            # If multiple users have same email (shouldn't happen), take the first
-                            assignee = CustomUser.objects.filter(email=assignee_email).first()
-                            errors.append(f"Row {row_num}: Warning - Multiple users found with email '{assignee_email}', using first match")
-                    
-                    # Create task
-                    task = Task.objects.create(
-                        title=title,
-                        description=description,
-                        status=status_val,
-                        priority=priority,
-                        start_date=start_date,
-                        due_date=due_date,
-                        duration=duration,
-                        progress=progress,
-                        parent_task_id=parent_task_id,
-                        assignee=assignee,
-                        project_id=project_id
-                    )
-                    
-                    # Add dependencies
-                    if dependency_ids:
-                        dep_ids = [int(dep_id.strip()) for dep_id in dependency_ids.split(',') if dep_id.strip().isdigit()]
-                        for dep_id in dep_ids:
-                            try:
-                                dep_task = Task.objects.get(id=dep_id, project_id=project_id)
-                                task.dependencies.add(dep_task)
-                            except Task.DoesNotExist:
-                                errors.append(f"Row {row_num}: Dependency task {dep_id} not found")
-                    
-                    created_tasks.append(task.id)
-                    
-                except Exception as e:
-                    errors.append(f"Row {row_num}: {str(e)}")
-            
-            return Response({
-                'success': True,
-                'created_count': len(created_tasks),
-                'created_task_ids': created_tasks,
-                'errors': errors
-            }, status=status.HTTP_201_CREATED)
-            
-        except Exception as e:
+        from project.models import Project
+        project = Project.objects.filter(pk=project_id).first()
+        if project is None:
             return Response(
-                {'error': f'Failed to process Excel file: {str(e)}'}, 
-                status=status.HTTP_400_BAD_REQUEST
+                {'error': 'Project not found'}, 
+                status=status.HTTP_404_NOT_FOUND
             )
-    
+        
+        # Parsing and inserting run on an import worker; poll status_url for progress
+        job = queue_import(ImportJob.TASKS, file, request.user, project=project)
+        return Response(import_job_data(job, request), status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=False, methods=['get'], url_path=r'import_jobs/(?P<job_id>[0-9a-f-]+)', url_name='import-job',
+            permission_classes=[IsAuthenticated])
+    def import_job(self, request, job_id=None):
+        """Progress of a background import; `result` holds the created tasks once it succeeds"""
+        job = get_import_job(ImportJob.TASKS, job_id, request.user)
+        if job is None:
+            return Response({'error': 'Import job not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(import_job_data(job, request))
+
+    @action(detail=False, methods=['post'], url_path=r'import_jobs/(?P<job_id>[0-9a-f-]+)/cancel',
+            permission_classes=[IsAuthenticated])
+    def cancel_import_job(self, request, job_id=None):
+        """Stop a background import; nothing it inserted is kept"""
+        job = get_import_job(ImportJob.TASKS, job_id, request.user)
+        if job is None:
+            return Response({'error': 'Import job not found'}, status=status.HTTP_404_NOT_FOUND)
+        if job.is_finished:
+            return Response({'error': f'Import job already {job.status}'}, status=status.HTTP_409_CONFLICT)
+        return Response(import_job_data(cancel_import(job), request), status=status.HTTP_202_ACCEPTED)
+
     @action(detail=False, methods=['get'])
+    @conditional_on_project()
     def critical_path(self, request):
         """Get critical path analysis for a project"""
         project_id = request.query_params.get('project_id')
@@ -623,13 +1040,32 @@ class TaskViewSet(viewsets.ModelViewSet):
             # Calculate critical path
             result = calculate_critical_path(tasks)
             
-            # Save the calculated values to database
-            for task in tasks:
-                task.save(update_fields=[
+            # Save the calculated values in one batch; the bulk path skips the
+            # per-task signals, so log the changes and publish a single event
+            with transaction.atomic():
+                Task.objects.bulk_update(tasks, [
                     'early_start_day', 'early_finish_day',
                     'late_start_day', 'late_finish_day',
                     'total_float', 'is_critical'
-                ])
+                ], batch_size=500)
+                changes = TaskChange.record(TaskChange.UPSERT, tasks)
+                publish_on_commit(int(project_id), 'cpm.recalculated', {
+                    'project_duration': result['project_duration'],
+                    'critical_tasks_count': result['critical_tasks_count'],
+                    'risk_level': result['risk_level'],
+                    'tasks': [
+                        {
+                            'id': task.pk,
+                            'early_start_day': task.early_start_day,
+                            'early_finish_day': task.early_finish_day,
+                            'late_start_day': task.late_start_day,
+                            'late_finish_day': task.late_finish_day,
+                            'total_float': task.total_float,
+                            'is_critical': task.is_critical,
+                        }
+                        for task in tasks
+                    ],
+                }, event_id=changes[-1].pk)
             
             return Response({
                 'success': True,
@@ -651,6 +1087,7 @@ class TaskViewSet(viewsets.ModelViewSet):
             )
     
     @action(detail=False, methods=['get'])
+    @conditional_on_project()
     def float_analysis(self, request):
         """Get float/slack analysis for all tasks in a project"""
         project_id = request.query_params.get('project_id')
@@ -721,3 +1158,61 @@ class TaskViewSet(viewsets.ModelViewSet):
                 {'error': f'Failed to analyze float: {str(e)}'}, 
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
+
+
+class RecurringTaskTemplateViewSet(viewsets.ModelViewSet):
+    """Recurring task definitions of the projects the user owns or belongs to"""
+    serializer_class = RecurringTaskTemplateSerializer
+    permission_classes = [IsAuthenticated]
+    
+    def _projects(self):
+        from project.models import Project
+        
+        user = self.request.user
+        return Project.objects.filter(Q(owner=user) | Q(members=user)).values('pk')
+    
+    def get_queryset(self):
+        queryset = RecurringTaskTemplate.objects.filter(project__in=self._projects()).select_related('assignee')
+        project_id = self.request.query_params.get('project_id')
+        if project_id:
+            queryset = queryset.filter(project_id=project_id)
+        return queryset
+    
+    def _check_project(self, serializer):
+        project = serializer.validated_data.get('project')
+        if project is not None and not self._projects().filter(pk=project.pk).exists():
+            raise ValidationError({'project': 'Project not found'})
+    
+    def perform_create(self, serializer):
+        self._check_project(serializer)
+        serializer.save(created_by=self.request.user)
+    
+    def perform_update(self, serializer):
+        self._check_project(serializer)
+        serializer.save()
+    
+    @action(detail=True, methods=['post'])
+    def materialize(self, request, pk=None):
+        """Create this template's tasks now instead of waiting for the scheduled run (?days=)"""
+        template = self.get_object()
+        try:
+            horizon_days = int(request.data.get('days') or DEFAULT_HORIZON_DAYS)
+        except (TypeError, ValueError):
+            return Response(
+                {'error': 'days must be an integer'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not 0 < horizon_days <= MAX_HORIZON_DAYS:
+            return Response(
+                {'error': f'days must be between 1 and {MAX_HORIZON_DAYS}'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        created = materialize_occurrences(
+            RecurringTaskTemplate.objects.filter(pk=template.pk), horizon_days=horizon_days
+        )
+        template.refresh_from_db()
+        return Response({
+            'created': created,
+            'materialized_until': template.materialized_until,
+        })
@@ -0,0 +1,53 @@
+"""
+User export, streamed like the task export (see tasks/exports.py).
+
+Rows are read with a chunked values_list() iterator and written to a
+write-only workbook, or encoded as csv/ndjson/parquet records.
+"""
+from openpyxl import Workbook
+from openpyxl.utils import get_column_letter
+from tasks.exports import ITERATOR_CHUNK_SIZE, header_cells
+
+USER_EXPORT_HEADERS = ['Username', 'First Name', 'Last Name', 'Email', 'Designation', 'Date Joined', 'Is Active']
+
+USER_EXPORT_FIELDS = ('username', 'first_name', 'last_name', 'email', 'designation', 'date_joined', 'is_active')
+
+# (name, type) per column of the csv/ndjson/parquet user export
+USER_EXPORT_COLUMNS = (
+    ('username', 'string'), ('first_name', 'string'), ('last_name', 'string'), ('email', 'string'),
+    ('designation', 'string'), ('date_joined', 'timestamp'), ('is_active', 'bool'),
+)
+
+COLUMN_WIDTH = 20
+
+
+def user_export_records(users):
+    """Typed export records (in USER_EXPORT_COLUMNS order) streamed from a values_list() iterator"""
+    return users.values_list(*USER_EXPORT_FIELDS).iterator(chunk_size=ITERATOR_CHUNK_SIZE)
+
+
+def write_users_xlsx(users, output):
+    """
+    Write a user queryset as an XLSX workbook into a binary file object.
+
+    Args:
+        users: CustomUser queryset
+        output: Writable binary file (e.g. a temporary file)
+    """
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title='Users')
+    for index in range(1, len(USER_EXPORT_HEADERS) + 1):
+        ws.column_dimensions[get_column_letter(index)].width = COLUMN_WIDTH
+
+    ws.append(header_cells(ws, USER_EXPORT_HEADERS))
+    for username, first_name, last_name, email, designation, date_joined, is_active in user_export_records(users):
+        ws.append([
+            username,
+            first_name,
+            last_name,
+            email,
+            designation,
+            date_joined.strftime('%Y-%m-%d %H:%M:%S') if date_joined else '',
+            'Yes' if is_active else 'No',
+        ])
+    wb.save(output)
@@ -0,0 +1,147 @@
+"""
+User import from Excel, run in the background by tasks/jobs.py.
+
+Expected columns: Username, First Name, Last Name, Email, Password (optional).
+Users with a password are created verified; the others get a verification
+email.
+"""
+from openpyxl import load_workbook
+from .models import CustomUser
+
+REQUIRED_HEADERS = ['Username', 'First Name', 'Last Name', 'Email']
+
+# Rows between progress callbacks
+PROGRESS_EVERY = 100
+
+
+def import_users(file, progress=None):
+    """
+    Create users from an Excel sheet, row by row.
+
+    Args:
+        file: Uploaded .xlsx file
+        progress: Optional callback(rows_done, rows_total); an exception
+            raised from it stops the import (users created so far stay)
+
+    Returns:
+        dict: created_count, skipped_count and the row errors
+
+    Raises:
+        ValueError: If a required column is missing
+    """
+    wb = load_workbook(file, read_only=True)
+    try:
+        ws = wb.active
+        rows = ws.iter_rows(values_only=True)
+
+        # Read headers
+        headers = list(next(rows, None) or ())
+
+        # Validate headers
+        for header in REQUIRED_HEADERS:
+            if header not in headers:
+                raise ValueError(f'Missing required column: {header}')
+
+        # Get column indices
+        username_idx = headers.index('Username')
+        first_name_idx = headers.index('First Name')
+        last_name_idx = headers.index('Last Name')
+        email_idx = headers.index('Email')
+        password_idx = headers.index('Password') if 'Password' in headers else None
+        total = max((ws.max_row or 1) - 1, 0)
+
+        created_count = 0
+        skipped_count = 0
+        errors = []
+
+        # Process each row (skip header)
+        row_num = 1
+        for row_num, row in enumerate(rows, start=2):
+            if progress and (row_num - 2) % PROGRESS_EVERY == 0:
+                progress(row_num - 2, max(total, row_num - 2))
+            row = list(row) + [None] * (len(headers) - len(row))
+            if not any(row):  # Skip empty rows
+                continue
+
+            username = row[username_idx]
+            first_name = row[first_name_idx]
+            last_name = row[last_name_idx]
+            email = row[email_idx]
+            password = row[password_idx] if password_idx is not None and row[password_idx] else None
+
+            # Validate required fields
+            if not username or not email:
+                errors.append(f'Row {row_num}: Username and Email are required')
+                skipped_count += 1
+                continue
+
+            # Check if user already exists
+            if CustomUser.objects.filter(username=username).exists():
+                errors.append(f'Row {row_num}: User "{username}" already exists')
+                skipped_count += 1
+                continue
+
+            if CustomUser.objects.filter(email=email).exists():
+                errors.append(f'Row {row_num}: Email "{email}" already exists')
+                skipped_count += 1
+                continue
+
+            try:
+                # Create user
+                user = CustomUser.objects.create(
+                    username=username,
+                    email=email,
+                    first_name=first_name or '',
+                    last_name=last_name or '',
+                    designation='user',  # Default designation
+                    email_verified=False
+                )
+
+                # If password provided, set it and mark as verified
+                if password:
+                    user.set_password(password)
+                    user.email_verified = True
+                    user.save()
+                else:
+                    # No password provided, send verification email
+                    user.set_unusable_password()
+                    user.save()
+                    _send_verification_email(user)
+
+                created_count += 1
+
+            except Exception as e:
+                errors.append(f'Row {row_num}: {str(e)}')
+                skipped_count += 1
+    finally:
+        wb.close()
+
+    if progress:
+        progress(row_num - 1, row_num - 1)
+    return {
+        'message': 'Import completed',
+        'created_count': created_count,
+        'skipped_count': skipped_count,
+        'errors': errors,
+    }
+
+
+def _send_verification_email(user):
+    # Generate verification token
+    token = user.generate_verification_token()
+
+    try:
+        from utils.email_service import email_service
+        from utils.email_templates.templates import verification_email_template
+        from django.conf import settings
+
+        verification_link = f"{settings.FRONTEND_URL}/verify-email?token={token}"
+        html_content = verification_email_template(user, verification_link)
+
+        email_service.send_email(
+            to_email=user.email,
+            subject='Welcome to Task Management System - Verify Your Email',
+            html_content=html_content
+        )
+    except Exception as email_error:
+        print(f"❌ Error sending verification email to {user.email}: {str(email_error)}")
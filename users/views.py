@@ -4,6 +4,7 @@ from rest_framework.response import Response
 from rest_framework.decorators import action
 from .serializers import UserSerializer, UserListSerializer, AvailablePermissionsSerializer, CustomTokenObtainPairSerializer
 from .models import CustomUser
+from tasks.exports import EXPORT_RENDERERS, ExportContentNegotiation
 from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework import permissions
@@ -13,7 +14,7 @@ from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import Permission
 from django.contrib.contenttypes.models import ContentType
 from django.http import HttpResponse
-from openpyxl import Workbook, load_workbook
+from openpyxl import Workbook
 from openpyxl.styles import Font, PatternFill, Alignment
 from io import BytesIO
 from datetime import datetime
@@ -355,7 +356,7 @@ class UserManagementViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['post'], url_path='import-excel')
     def import_excel(self, request):
         """
-        Import users from Excel file
+        Queue a user import from an Excel file (runs on an import worker, see tasks/jobs.py)
         Expected columns: Username, First Name, Last Name, Email, Password (optional)
         """
         if 'file' not in request.FILES:
@@ -364,178 +365,68 @@ class UserManagementViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        excel_file = request.FILES['file']
+        from tasks.jobs import queue_import, import_job_data
+        from tasks.models import ImportJob
         
-        try:
-            # Load the workbook
-            wb = load_workbook(excel_file)
-            ws = wb.active
-            
-            # Read headers
-            headers = [cell.value for cell in ws[1]]
-            
-            # Validate headers
-            required_headers = ['Username', 'First Name', 'Last Name', 'Email']
-            for header in required_headers:
-                if header not in headers:
-                    return Response(
-                        {'error': f'Missing required column: {header}'},
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-            
-            # Get column indices
-            username_idx = headers.index('Username')
-            first_name_idx = headers.index('First Name')
-            last_name_idx = headers.index('Last Name')
-            email_idx = headers.index('Email')
-            password_idx = headers.index('Password') if 'Password' in headers else None
-            
-            created_count = 0
-            skipped_count = 0
-            errors = []
-            
-            # Process each row (skip header)
-            for row_num, row in enumerate(ws.iter_rows(min_row=2, values_only=True), start=2):
-                if not any(row):  # Skip empty rows
-                    continue
-                
-                username = row[username_idx]
-                first_name = row[first_name_idx]
-                last_name = row[last_name_idx]
-                email = row[email_idx]
-                password = row[password_idx] if password_idx is not None and row[password_idx] else None
-                
-                # Validate required fields
-                if not username or not email:
-                    errors.append(f'Row {row_num}: Username and Email are required')
-                    skipped_count += 1
-                    continue
-                
-                # Check if user already exists
-                if CustomUser.objects.filter(username=username).exists():
-                    errors.append(f'Row {row_num}: User "{username}" already exists')
-                    skipped_count += 1
-                    continue
-                
-                if CustomUser.objects.filter(email=email).exists():
-                    errors.append(f'Row {row_num}: Email "{email}" already exists')
-                    skipped_count += 1
-                    continue
-                
-                try:
-                    # Create user
-                    user = CustomUser.objects.create(
-                        username=username,
-                        email=email,
-                        first_name=first_name or '',
-                        last_name=last_name or '',
-                        designation='user',  # Default designation
-                        email_verified=False
-                    )
-                    
-                    # If password provided, set it and mark as verified
-                    if password:
-                        user.set_password(password)
-                        user.email_verified = True
-                        user.save()
-                    else:
-                        # No password provided, send verification email
-                        user.set_unusable_password()
-                        user.save()
-                        
-                        # Generate verification token
-                        token = user.generate_verification_token()
-                        
-                        # Send verification email
-                        try:
-                            from utils.email_service import email_service
-                            from utils.email_templates.templates import verification_email_template
-                            from django.conf import settings
-                            
-                            verification_link = f"{settings.FRONTEND_URL}/verify-email?token={token}"
-                            html_content = verification_email_template(user, verification_link)
-                            
-                            email_service.send_email(
-                                to_email=user.email,
-                                subject='Welcome to Task Management System - Verify Your Email',
-                                html_content=html_content
-                            )
-                        except Exception as email_error:
-                            print(f"❌ Error sending verification email to {user.email}: {str(email_error)}")
-                    
-                    created_count += 1
-                    
-                except Exception as e:
-                    errors.append(f'Row {row_num}: {str(e)}')
-                    skipped_count += 1
-            
-            return Response({
-                'message': 'Import completed',
-                'created_count': created_count,
-                'skipped_count': skipped_count,
-                'errors': errors[:20] if errors else []  # Limit errors to first 20
-            })
-            
-        except Exception as e:
-            return Response(
-                {'error': f'Failed to process Excel file: {str(e)}'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+        job = queue_import(ImportJob.USERS, request.FILES['file'], request.user)
+        return Response(import_job_data(job, request), status=status.HTTP_202_ACCEPTED)
     
-    @action(detail=False, methods=['get'], url_path='export-excel')
+    @action(detail=False, methods=['get'], url_path=r'import-jobs/(?P<job_id>[0-9a-f-]+)', url_name='import-job')
+    def import_job(self, request, job_id=None):
+        """Progress of a background user import; `result` holds the counts once it succeeds"""
+        from tasks.jobs import get_import_job, import_job_data
+        from tasks.models import ImportJob
+        
+        job = get_import_job(ImportJob.USERS, job_id, request.user)
+        if job is None:
+            return Response({'error': 'Import job not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(import_job_data(job, request))
+    
+    @action(detail=False, methods=['post'], url_path=r'import-jobs/(?P<job_id>[0-9a-f-]+)/cancel', url_name='cancel-import-job')
+    def cancel_import_job(self, request, job_id=None):
+        """Stop a background user import; users created before the cancel are kept"""
+        from tasks.jobs import cancel_import, get_import_job, import_job_data
+        from tasks.models import ImportJob
+        
+        job = get_import_job(ImportJob.USERS, job_id, request.user)
+        if job is None:
+            return Response({'error': 'Import job not found'}, status=status.HTTP_404_NOT_FOUND)
+        if job.is_finished:
+            return Response({'error': f'Import job already {job.status}'}, status=status.HTTP_409_CONFLICT)
+        return Response(import_job_data(cancel_import(job), request), status=status.HTTP_202_ACCEPTED)
+    
+    @action(detail=False, methods=['get'], url_path='export-excel', renderer_classes=EXPORT_RENDERERS,
+            content_negotiation_class=ExportContentNegotiation)
     def export_excel(self, request):
         """
-        Export all users to Excel file
+        Export all users to Excel file, or as csv / ndjson / parquet with ?format=
         """
-        # Create workbook
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Users"
-        
-        # Define headers
-        headers = ['Username', 'First Name', 'Last Name', 'Email', 'Designation', 'Date Joined', 'Is Active']
-        
-        # Style for headers
-        header_fill = PatternFill(start_color='4472C4', end_color='4472C4', fill_type='solid')
-        header_font = Font(bold=True, color='FFFFFF')
+        from functools import partial
+        from .exports import USER_EXPORT_COLUMNS, user_export_records, write_users_xlsx
+        from tasks.exports import (
+            EXPORT_FORMATS, XLSX_CONTENT_TYPE, export_response, parquet_available, streaming_file_response
+        )
         
-        # Write headers
-        for col, header in enumerate(headers, start=1):
-            cell = ws.cell(row=1, column=col, value=header)
-            cell.fill = header_fill
-            cell.font = header_font
-            cell.alignment = Alignment(horizontal='center', vertical='center')
+        export_format = request.query_params.get('format', 'xlsx')
+        if export_format not in EXPORT_FORMATS:
+            return Response(
+                {'error': f"format must be one of: {', '.join(EXPORT_FORMATS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if export_format == 'parquet' and not parquet_available():
+            return Response(
+                {'error': 'Parquet export needs pyarrow installed on the server'},
+                status=status.HTTP_501_NOT_IMPLEMENTED
+            )
         
-        # Get all users
         users = self.get_queryset()
+        filename = f'users_export_{datetime.now().strftime("%Y%m%d_%H%M%S")}.{export_format}'
         
-        # Write data
-        for row, user in enumerate(users, start=2):
-            ws.cell(row=row, column=1, value=user.username)
-            ws.cell(row=row, column=2, value=user.first_name)
-            ws.cell(row=row, column=3, value=user.last_name)
-            ws.cell(row=row, column=4, value=user.email)
-            ws.cell(row=row, column=5, value=user.designation)
-            ws.cell(row=row, column=6, value=user.date_joined.strftime('%Y-%m-%d %H:%M:%S') if user.date_joined else '')
-            ws.cell(row=row, column=7, value='Yes' if user.is_active else 'No')
+        if export_format != 'xlsx':
+            return export_response(export_format, USER_EXPORT_COLUMNS, user_export_records(users), filename)
         
-        # Adjust column widths
-        for col in range(1, len(headers) + 1):
-            ws.column_dimensions[chr(64 + col)].width = 20
-        
-        # Save to BytesIO
-        excel_file = BytesIO()
-        wb.save(excel_file)
-        excel_file.seek(0)
-        
-        # Create response
-        response = HttpResponse(
-            excel_file.read(),
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        )
-        response['Content-Disposition'] = f'attachment; filename=users_export_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx'
-        
-        return response
+        # Write-only workbook in a temporary file, streamed back in blocks
+        return streaming_file_response(partial(write_users_xlsx, users), XLSX_CONTENT_TYPE, filename)
     
     @action(detail=False, methods=['get'], url_path='download-sample')
     def download_sample(self, request):